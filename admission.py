@@ -0,0 +1,217 @@
+# admission.py
+# Admission control for serving mode. Instead of letting a spike queue up in front of the pipeline,
+# each request is admitted, degraded or shed up front:
+#   - a bounded number of requests may be in flight; past DEGRADE_AT of that they take the cheap
+#     regex-only path, and past the limit they get a canned "high volume" reply immediately;
+#   - each session has a token bucket, so one noisy client cannot starve the others;
+#   - messages that look like forced-escalation intents (disputed charges, locked accounts) skip the
+#     session limit and may use a reserve of extra slots, so they are the last to be shed.
+# Usage (overload test, open-loop arrivals at 3x measured capacity):
+#   python admission.py --multiplier 3 --seconds 5
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from nlu import INTENT_PATTERNS, canonicalize
+
+MAX_IN_FLIGHT = 64           # requests processed at once before new ones are shed
+DEGRADE_AT = 0.5             # fraction of MAX_IN_FLIGHT above which requests take the cheap path
+PRIORITY_RESERVE = 16        # extra slots only priority messages may use
+SESSION_RATE = 5.0           # sustained messages per second per session
+SESSION_BURST = 20           # messages a session may send back-to-back
+MAX_SESSIONS = 100000        # token buckets kept (least recently seen are dropped)
+PRIORITY_INTENTS = ('payment_dispute', 'account_locked')
+
+FULL, DEGRADED, SHED = 'full', 'degraded', 'shed'
+
+HIGH_VOLUME_REPLY = ("We're experiencing unusually high volume right now. Please try again in a few "
+                     "minutes - if this is about a charge or a locked account, tell us and we'll prioritize it.")
+RATE_LIMIT_REPLY = "You're sending messages faster than we can answer them. Please wait a moment and try again."
+
+
+class Ticket:
+    __slots__ = ('mode', 'priority', 'reason')
+
+    def __init__(self, mode: str, priority: bool, reason: Optional[str] = None):
+        self.mode = mode
+        self.priority = priority
+        self.reason = reason          # why a request was shed: 'overload' or 'rate_limited'
+
+    @property
+    def reply(self) -> Optional[str]:
+        if self.mode != SHED:
+            return None
+        return RATE_LIMIT_REPLY if self.reason == 'rate_limited' else HIGH_VOLUME_REPLY
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, degrade_at: float = DEGRADE_AT,
+                 priority_reserve: int = PRIORITY_RESERVE, session_rate: float = SESSION_RATE,
+                 session_burst: int = SESSION_BURST, max_sessions: int = MAX_SESSIONS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_in_flight = max_in_flight
+        self.degrade_above = int(max_in_flight * degrade_at)
+        self.priority_reserve = priority_reserve
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._priority_re = re.compile("|".join(p for i in PRIORITY_INTENTS for p in INTENT_PATTERNS[i]))
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()   # session -> [tokens, last refill]
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self._stats = {'admitted': 0, 'degraded': 0, 'priority': 0, 'shed_overload': 0,
+                       'shed_rate_limited': 0, 'peak_in_flight': 0}
+
+    def is_priority(self, text: str) -> bool:
+        """Cheap pre-check: does the message match a forced-escalation intent pattern?"""
+        return self._priority_re.search(canonicalize(text)) is not None
+
+    def _take_token(self, session: str, now: float) -> bool:
+        bucket = self._buckets.get(session)
+        if bucket is None:
+            bucket = self._buckets[session] = [float(self.session_burst), now]
+            if len(self._buckets) > self.max_sessions:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(session)
+            bucket[0] = min(self.session_burst, bucket[0] + (now - bucket[1]) * self.session_rate)
+            bucket[1] = now
+        if bucket[0] < 1.0:
+            return False
+        bucket[0] -= 1.0
+        return True
+
+    def admit(self, text: str, session: Optional[str] = None) -> Ticket:
+        """Decide how to serve a request. Every non-shed ticket must be passed to release()."""
+        priority = self.is_priority(text)
+        with self._lock:
+            if not priority and session is not None and not self._take_token(session, self.clock()):
+                self._stats['shed_rate_limited'] += 1
+                return Ticket(SHED, priority, 'rate_limited')
+            limit = self.max_in_flight + (self.priority_reserve if priority else 0)
+            if self.in_flight >= limit:
+                self._stats['shed_overload'] += 1
+                return Ticket(SHED, priority, 'overload')
+            self.in_flight += 1
+            self._stats['admitted'] += 1
+            if self.in_flight > self._stats['peak_in_flight']:
+                self._stats['peak_in_flight'] = self.in_flight
+            if priority:
+                self._stats['priority'] += 1
+                return Ticket(FULL, True)
+            if self.in_flight > self.degrade_above:
+                self._stats['degraded'] += 1
+                return Ticket(DEGRADED, False)
+            return Ticket(FULL, False)
+
+    def release(self, ticket: Ticket):
+        if ticket.mode == SHED:
+            return
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            s['in_flight'] = self.in_flight
+            s['sessions'] = len(self._buckets)
+        return s
+
+
+# --- overload test ---
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+def overload(multiplier: float = 3.0, seconds: float = 5.0, controller: Optional[AdmissionController] = None,
+             workers: int = 4, sessions: int = 1000, seed: int = 0) -> Dict[str, Any]:
+    """Offer `multiplier` x measured capacity as open-loop arrivals and report reply latencies.
+
+    Without a controller every request is queued for the worker pool, as a plain server would;
+    with one, requests are admitted, degraded or shed on arrival.
+    """
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    import chatbot
+    from loadgen import next_message
+
+    rng = random.Random(seed)
+
+    def message(i: int) -> str:
+        # a unique reference keeps every request a cache miss, i.e. real pipeline work
+        return f"{next_message(rng)} (ref {i})"
+
+    # capacity: serial full-pipeline throughput on the same mix
+    warmup = [message(i) for i in range(300)]
+    start = time.perf_counter()
+    for text in warmup:
+        chatbot.process(text)
+    capacity = len(warmup) / (time.perf_counter() - start)
+
+    latencies, shed_latencies = [], []
+    counts = {'served': 0, 'degraded': 0, 'shed': 0}
+    lock = threading.Lock()
+
+    def serve(text: str, session: str, arrived: float, ticket: Optional[Ticket]):
+        try:
+            chatbot.process(text, session, cheap=ticket is not None and ticket.mode == DEGRADED)
+        finally:
+            if ticket is not None:
+                controller.release(ticket)
+        with lock:
+            latencies.append(time.perf_counter() - arrived)
+            counts['served'] += 1
+            if ticket is not None and ticket.mode == DEGRADED:
+                counts['degraded'] += 1
+
+    rate = capacity * multiplier
+    pool = ThreadPoolExecutor(workers)
+    start = time.perf_counter()
+    i = 0
+    while True:
+        due = start + i / rate
+        now = time.perf_counter()
+        if due - start >= seconds:
+            break
+        if due > now:
+            time.sleep(due - now)
+        text, session, arrived = message(i), f"s{rng.randrange(sessions)}", time.perf_counter()
+        ticket = None
+        if controller is not None:
+            ticket = controller.admit(text, session)
+            if ticket.mode == SHED:
+                shed_latencies.append(time.perf_counter() - arrived)
+                counts['shed'] += 1
+                i += 1
+                continue
+        pool.submit(serve, text, session, arrived, ticket)
+        i += 1
+    pool.shutdown(wait=True)
+    latencies.sort()
+    replies = sorted(latencies + shed_latencies)
+    return {'capacity_rps': round(capacity), 'offered_rps': round(rate), 'offered': i, **counts,
+            'p50_ms': round(_percentile(latencies, 0.5) * 1000, 2),
+            'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+            'p99_all_replies_ms': round(_percentile(replies, 0.99) * 1000, 2)}
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Overload test: queueing vs admission control")
+    parser.add_argument("--multiplier", type=float, default=3.0, help="offered load as a multiple of capacity")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-in-flight", type=int, default=32)
+    args = parser.parse_args()
+
+    for label, controller in (("unbounded queue", None),
+                              ("admission control", AdmissionController(max_in_flight=args.max_in_flight))):
+        r = overload(args.multiplier, args.seconds, controller, workers=args.workers)
+        print(f"{label:<18} capacity {r['capacity_rps']:>6}/s  offered {r['offered_rps']:>6}/s  "
+              f"served {r['served']:>6} (degraded {r['degraded']})  shed {r['shed']:>6}  "
+              f"p50 {r['p50_ms']:>8.1f} ms  p99 {r['p99_ms']:>8.1f} ms")
@@ -0,0 +1,269 @@
+# analytics.py
+# Columnar, memory-mapped analytics over decision logs.
+# `compact` turns decisions-*.jsonl files into append-only fixed-width columns (raw little-endian
+# binaries) plus a string dictionary; `DecisionStore` memory-maps those columns and computes
+# aggregates with NumPy in fixed-size chunks, so memory stays flat regardless of history length.
+# dictionary.json (replaced atomically) holds the committed record count and, per log file, the byte
+# offset compacted so far: a log still being written is picked up where the last run stopped, and
+# column bytes past the committed count (an interrupted append) are dropped before the next append.
+# Usage:
+#   python analytics.py compact logs/ store/
+#   python analytics.py report store/
+#   python analytics.py bench store/ --records 100000000
+import glob
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+COLUMNS = {
+    'ts': np.dtype('<i8'),          # unix seconds
+    'intent': np.dtype('<u2'),      # id into dictionary['intents']
+    'reason': np.dtype('u1'),       # id into dictionary['reasons']
+    'confidence': np.dtype('<f4'),
+}
+CHUNK = 10_000_000                  # records aggregated per pass
+NONE = '(none)'                     # dictionary entry 0 for a missing intent/reason
+
+
+class DecisionStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'dictionary.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        else:
+            meta = {'intents': [NONE], 'reasons': [NONE], 'compacted': {}}
+        self.intents: List[str] = meta['intents']
+        self.reasons: List[str] = meta['reasons']
+        # log file name -> bytes compacted; older stores listed fully compacted names (offset unknown)
+        compacted = meta['compacted']
+        self.compacted: Dict[str, Optional[int]] = (dict.fromkeys(compacted) if isinstance(compacted, list)
+                                                    else compacted)
+        self.rows: int = meta['rows'] if 'rows' in meta else self._column_rows('ts')
+        for name in COLUMNS:
+            if self._column_rows(name) < self.rows:
+                raise ValueError(f"column {name!r} holds fewer than the {self.rows} committed records")
+
+    # --- writing ---
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.{COLUMNS[name].str.lstrip('<|')}.bin")
+
+    def _column_rows(self, name: str) -> int:
+        path = self._column_path(name)
+        return os.path.getsize(path) // COLUMNS[name].itemsize if os.path.exists(path) else 0
+
+    def _save_dictionary(self):
+        tmp = os.path.join(self.path, 'dictionary.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'intents': self.intents, 'reasons': self.reasons, 'rows': self.rows,
+                       'compacted': self.compacted}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, 'dictionary.json'))
+
+    def append(self, columns: Dict[str, np.ndarray], offsets: Optional[Dict[str, int]] = None):
+        """Append equal-length arrays (one per column) and commit them, together with the log
+        offsets (file name -> bytes compacted) they were read up to."""
+        arrays = {name: np.ascontiguousarray(columns[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+        n = len(arrays['ts'])
+        if any(len(a) != n for a in arrays.values()):
+            raise ValueError("columns must have the same length")
+        for name, a in arrays.items():
+            with open(self._column_path(name), 'ab') as f:
+                f.truncate(self.rows * a.itemsize)   # drop what an interrupted append left behind
+                f.write(a.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self.rows += n
+        self.compacted.update(offsets or {})
+        self._save_dictionary()   # the commit point
+
+    def compact(self, log_paths: Iterable[str], batch: int = 1_000_000) -> int:
+        """Convert decision-log JSONL into columns, from where the last run stopped in each file.
+
+        A file still being written is read up to its last complete line."""
+        intent_ids = {s: i for i, s in enumerate(self.intents)}
+        reason_ids = {s: i for i, s in enumerate(self.reasons)}
+
+        def intern(table, ids, value):
+            value = value or NONE
+            if value not in ids:
+                ids[value] = len(table)
+                table.append(value)
+            return ids[value]
+
+        total = 0
+        for path in sorted(log_paths):
+            name = os.path.basename(path)
+            offset = self.compacted.get(name, 0)
+            if offset is None:   # compacted by an older version that kept no offset
+                continue
+            if os.path.getsize(path) == offset:
+                continue
+            cols = {name_: [] for name_ in COLUMNS}
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break   # the writer is mid-line; the next run picks it up
+                    offset += len(line)
+                    r = json.loads(line)
+                    cols['ts'].append(int(r['ts']))
+                    cols['intent'].append(intern(self.intents, intent_ids, r['intent']))
+                    cols['reason'].append(intern(self.reasons, reason_ids, r['escalation']))
+                    cols['confidence'].append(r['score'])
+                    if len(cols['ts']) >= batch:
+                        self.append(cols, {name: offset})
+                        total += len(cols['ts'])
+                        cols = {name_: [] for name_ in COLUMNS}
+            self.append(cols, {name: offset})
+            total += len(cols['ts'])
+        return total
+
+    # --- reading ---
+    def __len__(self) -> int:
+        return self.rows
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only memory map of a whole column."""
+        if not len(self):
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(self._column_path(name), dtype=COLUMNS[name], mode='r', shape=(len(self),))
+
+    def _chunks(self, names, since: Optional[float] = None, until: Optional[float] = None):
+        cols = {n: self.column(n) for n in set(names) | {'ts'}}
+        for start in range(0, len(self), CHUNK):
+            chunk = {n: c[start:start + CHUNK] for n, c in cols.items()}
+            if since is not None or until is not None:
+                ts = chunk['ts']
+                mask = np.ones(len(ts), dtype=bool)
+                if since is not None:
+                    mask &= ts >= since
+                if until is not None:
+                    mask &= ts < until
+                chunk = {n: c[mask] for n, c in chunk.items()}
+            yield chunk
+
+    # --- aggregates ---
+    def daily_intent_counts(self, since=None, until=None) -> Dict[str, object]:
+        """Counts per UTC day and intent: {'days': [...], 'intents': [...], 'counts': days x intents}."""
+        n_intents = len(self.intents)
+        per_day: Dict[int, np.ndarray] = {}
+        for c in self._chunks(('intent',), since, until):
+            day = c['ts'] // 86400
+            if not len(day):
+                continue
+            first = int(day.min())
+            span = int(day.max()) - first + 1
+            grid = np.bincount((day - first) * n_intents + c['intent'],
+                               minlength=span * n_intents).reshape(span, n_intents)
+            for offset in np.flatnonzero(grid.sum(axis=1)):
+                key = first + int(offset)
+                per_day[key] = per_day.get(key, 0) + grid[offset]
+        days = sorted(per_day)
+        counts = np.array([per_day[d] for d in days]) if days else np.zeros((0, n_intents), dtype=np.int64)
+        return {'days': [time.strftime('%Y-%m-%d', time.gmtime(d * 86400)) for d in days],
+                'intents': list(self.intents), 'counts': counts}
+
+    def escalation_counts(self, since=None, until=None) -> np.ndarray:
+        """intents x reasons matrix of decision counts (reason 0 = not escalated)."""
+        n_i, n_r = len(self.intents), len(self.reasons)
+        total = np.zeros(n_i * n_r, dtype=np.int64)
+        for c in self._chunks(('intent', 'reason'), since, until):
+            total += np.bincount(c['intent'].astype(np.int64) * n_r + c['reason'], minlength=n_i * n_r)
+        return total.reshape(n_i, n_r)
+
+    def escalation_rates(self, since=None, until=None) -> Dict[str, Dict[str, float]]:
+        """Per intent: total decisions, overall escalation rate and rate per reason."""
+        m = self.escalation_counts(since, until)
+        out = {}
+        for i, intent in enumerate(self.intents):
+            total = int(m[i].sum())
+            if not total:
+                continue
+            row = {'total': total, 'escalated': round(1 - m[i, 0] / total, 4)}
+            for r, reason in enumerate(self.reasons[1:], start=1):
+                row[reason] = round(m[i, r] / total, 4)
+            out[intent] = row
+        return out
+
+    def confidence_histogram(self, bins: int = 20, intent: Optional[str] = None,
+                             since=None, until=None) -> Dict[str, np.ndarray]:
+        edges = np.linspace(0.0, 1.0, bins + 1)
+        counts = np.zeros(bins, dtype=np.int64)
+        intent_id = self.intents.index(intent) if intent is not None else None
+        for c in self._chunks(('confidence', 'intent'), since, until):
+            values = c['confidence'] if intent_id is None else c['confidence'][c['intent'] == intent_id]
+            counts += np.histogram(values, bins=edges)[0]
+        return {'edges': edges, 'counts': counts}
+
+
+def synthesize(store: DecisionStore, records: int, days: int = 90, seed: int = 0):
+    """Fill a store with random decisions (for benchmarking at scale)."""
+    from nlu import INTENT_PATTERNS
+    for name in INTENT_PATTERNS:
+        if name not in store.intents:
+            store.intents.append(name)
+    for name in ('low_confidence', 'policy'):
+        if name not in store.reasons:
+            store.reasons.append(name)
+    store._save_dictionary()
+    rng = np.random.default_rng(seed)
+    start = int(time.time()) - days * 86400
+    for offset in range(0, records, CHUNK):
+        n = min(CHUNK, records - offset)
+        store.append({
+            'ts': np.sort(rng.integers(start, start + days * 86400, n)),
+            'intent': rng.integers(0, len(store.intents), n),
+            'reason': rng.choice(3, n, p=[0.8, 0.12, 0.08]),
+            'confidence': rng.choice(np.array([0.0, 0.4, 0.5, 0.8, 1.0], dtype=np.float32), n),
+        })
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Decision-log analytics")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p = sub.add_parser('compact', help="convert decision logs into the columnar store")
+    p.add_argument('logs', help="directory with decisions-*.jsonl")
+    p.add_argument('store')
+    p = sub.add_parser('report', help="print aggregates")
+    p.add_argument('store')
+    p = sub.add_parser('bench', help="time aggregates over synthetic records")
+    p.add_argument('store')
+    p.add_argument('--records', type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    store = DecisionStore(args.store)
+    if args.cmd == 'compact':
+        n = store.compact(glob.glob(os.path.join(args.logs, 'decisions-*.jsonl')))
+        print(f"compacted {n} records; store now holds {len(store)}")
+    elif args.cmd == 'report':
+        daily = store.daily_intent_counts()
+        print(f"{len(store)} decisions over {len(daily['days'])} days")
+        for day, row in zip(daily['days'][-7:], daily['counts'][-7:]):
+            top = sorted(zip(row, daily['intents']), reverse=True)[:3]
+            print(f"  {day}: {int(row.sum()):>8}  top: " + ", ".join(f"{i} {int(n)}" for n, i in top))
+        print("Escalation rate per intent:")
+        for intent, row in sorted(store.escalation_rates().items(), key=lambda kv: -kv[1]['escalated']):
+            print(f"  {intent:<24} {row['total']:>9} {row['escalated']:>7.1%}")
+        hist = store.confidence_histogram(bins=10)
+        print("Confidence histogram:")
+        for lo, n in zip(hist['edges'][:-1], hist['counts']):
+            print(f"  {lo:.1f}-{lo + 0.1:.1f} {int(n):>10}")
+    else:
+        if len(store) < args.records:
+            t = time.perf_counter()
+            synthesize(store, args.records - len(store))
+            print(f"synthesized to {len(store):,} records in {time.perf_counter() - t:.1f} s")
+        for label, fn in (("daily intent counts", store.daily_intent_counts),
+                          ("escalation rates", store.escalation_rates),
+                          ("confidence histogram", store.confidence_histogram)):
+            t = time.perf_counter()
+            fn()
+            print(f"{label:<22} {time.perf_counter() - t:6.2f} s over {len(store):,} records")
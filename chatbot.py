@@ -0,0 +1,390 @@
+# chatbot.py
+# Orchestration: NLU (intent + entities) -> pyDatalog rules (escalation, responses) -> reply text
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+
+import logic_layer
+from deadline import Deadline
+from decision_log import DecisionLog, LOG_DIR
+from escalation import EscalationQueue, ESCALATION_DB
+from languages import DEFAULT_LANGUAGE, LanguageRouter
+from orders import ORDERS_DB, OrderLookup, format_status, normalize_id
+from urgency import score_message
+from intents import NO_INTENT, intent_id, intent_name
+from nlu import (SPACY_ENTITY_TYPES, extract_entities, entity_types_for_id, canonicalize, dedupe, has_ner,
+                 has_unknown_words, ner_stage)
+from segments import analyze
+from shared_cache import ResponseCache
+
+ESCALATION_REPLIES = {
+    'policy': "This request needs a specialist, so I'm escalating it to our human support team. "
+              "Someone will follow up with you shortly.",
+    'low_confidence': "I'm not completely sure I understood that. I'm escalating to human support "
+                      "so a specialist can take a look.",
+    'urgent': "I can tell this is urgent, so I'm passing it to our human support team right away. "
+              "A specialist will follow up with you as soon as possible.",
+}
+FALLBACK_REPLY = "I couldn't find a direct answer — escalating to a human specialist."
+
+# Decisions are cached by canonical query key, so "Where's my order??" and "where is my order"
+# share one entry. Entities of the first variant seen are reused for the others.
+CACHE_SIZE = 4096
+
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_hits = 0
+_cache_misses = 0
+_warm_keys = set()     # keys cached ahead of traffic by prime()
+_warm_hits = 0         # live lookups answered from a primed entry
+# Host-wide cache shared by all worker processes; when set it replaces the in-process LRU
+_shared: Optional[ResponseCache] = None
+
+# Escalated cases are handed to this queue (when started) for agents to pick up
+_escalations: Optional[EscalationQueue] = None
+# Every decision is buffered to this audit log (when started)
+_decision_log: Optional[DecisionLog] = None
+# Routes messages to language packs; None (English only) costs nothing
+_languages: Optional[LanguageRouter] = None
+# Live order statuses for order_status messages that name an order (when started)
+_orders: Optional[OrderLookup] = None
+
+
+def _escalation_reason(iid: int, confidence: float, urgency: Optional[float] = None) -> Optional[str]:
+    reasons = logic_layer.snapshot().escalate_id(iid, confidence, urgency)
+    # A forced policy outranks a low-confidence guess, which outranks urgency
+    for reason in ('policy', 'low_confidence', 'urgent'):
+        if reason in reasons:
+            return reason
+    return None
+
+
+def _response_text(iid: int) -> Optional[str]:
+    return None if iid == NO_INTENT else logic_layer.snapshot().response_by_id[iid]
+
+
+def _decide(text: str, cheap: bool = False, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Run the pipeline stages. Optional stages are skipped on the cheap path or when the deadline
+    leaves too little budget for them; skipped stages are listed in the decision's 'degraded'
+    (typo correction only when the exact match is low-confidence and the text has unknown words).
+    Normalization, regex intent matching and rule evaluation always run (they cost microseconds and
+    the escalation decision must not be skipped). Intents are registry IDs until the record is built.
+    Messages are classified per sentence/clause (segments.py): the decision's intent is the
+    top-ranked one, or the first with a forced-escalation policy, and 'intents' lists all of them.
+    """
+    degraded = []
+
+    def allowed(stage: str) -> bool:
+        if cheap or (deadline is not None and not deadline.allows(stage)):
+            degraded.append(stage)
+            return False
+        return True
+
+    key = canonicalize(text)
+    language, pack, iid = DEFAULT_LANGUAGE, None, NO_INTENT
+    if _languages is not None:
+        language = _languages.detect(text)
+        pack = _languages.pack(language)
+    if pack is not None:
+        analysis = analyze(text, table=pack.table)
+        iid, confidence = analysis.best()
+    if iid == NO_INTENT:
+        # English gets a look too: short messages can be misdetected
+        fuzzy = not cheap and (deadline is None or deadline.allows('typo_correction'))
+        english = analyze(text, fuzzy=fuzzy)
+        if (not fuzzy and logic_layer.snapshot().is_low_confidence(english.best()[1])
+                and has_unknown_words(key)):
+            degraded.append('typo_correction')   # only when correcting could have changed the answer
+        if pack is None or english.best()[0] != NO_INTENT:
+            analysis, language, pack = english, DEFAULT_LANGUAGE, None
+            iid, confidence = analysis.best()
+    types = entity_types_for_id(iid)
+    if deadline is not None and not deadline.allows('entities'):
+        degraded.append('entities')
+        entities = {}
+    else:
+        nlp, patterns = (pack.nlp, pack.entity_patterns) if pack is not None else (None, None)
+        has_model = nlp is not None if pack is not None else has_ner()
+        if types & SPACY_ENTITY_TYPES and (not has_model or not allowed(ner_stage(nlp))):
+            types = types - SPACY_ENTITY_TYPES   # regex entities only, no model parse
+        entities = extract_entities(text, types, nlp, patterns)
+    reason = _escalation_reason(iid, confidence)
+    if pack is not None:
+        if reason:
+            response = pack.replies.get(reason, ESCALATION_REPLIES[reason])
+        else:
+            response = (iid != NO_INTENT and pack.responses[iid]) or pack.replies.get('fallback', FALLBACK_REPLY)
+    elif reason:
+        # Some policy-escalated intents (trial extensions) carry their own hand-off wording
+        response = _response_text(iid) if reason == 'policy' else None
+        if not response or 'escalat' not in response.lower():
+            response = ESCALATION_REPLIES[reason]
+    else:
+        response = _response_text(iid) or FALLBACK_REPLY
+    return {
+        'text': text,
+        'key': key,
+        'language': language,
+        'intent': intent_name(iid),
+        'confidence': confidence,
+        'intents': [[intent_name(i), c] for i, c in analysis.ranked()],
+        'entities': entities,
+        'escalation': reason,
+        'response': response,
+        'degraded': degraded,
+    }
+
+
+def _prioritize(decision: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Score urgency/sentiment of this exact message (casing and punctuation are not part of the
+    cache key) and escalate it as 'urgent' when the KB says so and nothing else escalated it."""
+    urgency, sentiment = score_message(text)
+    decision['urgency'], decision['sentiment'] = urgency, sentiment
+    if decision['escalation'] is None:
+        # the cached decision had no reason; only the urgency can add one
+        decision['escalation'] = _escalation_reason(intent_id(decision['intent']), decision['confidence'], urgency)
+    if decision['escalation'] == 'urgent':
+        pack = _languages.pack(decision['language']) if _languages is not None else None
+        decision['response'] = (pack.replies if pack is not None else {}).get('urgent', ESCALATION_REPLIES['urgent'])
+    return decision
+
+
+def _order_id(decision: Dict[str, Any]) -> Optional[str]:
+    """The order to look up for this decision, if it is an answered English order_status one."""
+    if (_orders is None or decision['intent'] != 'order_status' or decision['escalation'] is not None
+            or decision.get('language', DEFAULT_LANGUAGE) != DEFAULT_LANGUAGE):
+        return None
+    return decision['entities'].get('order_id')
+
+
+def _attach_order(decision: Dict[str, Any], found: Optional[Dict[str, Optional[Dict[str, Any]]]] = None
+                  ) -> Dict[str, Any]:
+    """Answer with the order's current status (never cached: statuses change). `found` holds
+    results already fetched by a batch lookup. A busy order store leaves the generic reply."""
+    order_id = _order_id(decision)
+    if order_id is None:
+        return decision
+    key = normalize_id(order_id)
+    try:
+        order = found[key] if found is not None and key in found else _orders.lookup(key)
+    except TimeoutError:
+        decision['degraded'] = decision['degraded'] + ['order_lookup']
+        return decision
+    decision['order'] = order
+    decision['response'] = format_status(order_id, order)
+    return decision
+
+
+def process(text: str, session: Optional[str] = None, cheap: bool = False,
+            deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Run the full pipeline and return the decision record for `text`.
+
+    Rule evaluation reads the immutable KB snapshot, so this is safe to call from many threads.
+    `cheap=True` is the overload path: regex matching only (no typo correction, no entity model).
+    With a `deadline`, optional stages are skipped when the remaining budget is short. A cached
+    full decision is used when there is one, but degraded decisions are never cached.
+    """
+    decision = _attach_order(_prioritize(_cached_decision(text, cheap, deadline), text))
+    if decision['escalation'] and _escalations is not None:
+        _escalations.submit(text, decision['intent'], decision['confidence'], decision['escalation'],
+                            decision['entities'], session=session, urgency=decision['urgency'],
+                            sentiment=decision['sentiment'])
+    if _decision_log is not None:
+        _decision_log.log(decision, session)
+    return decision
+
+
+def _lookup(key: str, count: bool = True) -> Optional[Dict[str, Any]]:
+    global _cache_hits, _cache_misses, _warm_hits
+    if _shared is not None:
+        cached = _shared.get(key, count)
+    else:
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is not None:
+                _cache.move_to_end(key)
+    if count:
+        with _cache_lock:
+            if cached is not None:
+                _cache_hits += 1
+                _warm_hits += key in _warm_keys
+            else:
+                _cache_misses += 1
+    return cached
+
+
+def _store(key: str, decision: Dict[str, Any]):
+    if _shared is not None:
+        _shared.put(key, decision)
+        return
+    with _cache_lock:
+        _cache[key] = decision
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _cached_decision(text: str, cheap: bool = False, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    key = canonicalize(text)
+    cached = _lookup(key)
+    if cached is not None:
+        return dict(cached, text=text, entities=dict(cached['entities']), degraded=[])
+    decision = _decide(text, cheap, deadline)
+    if decision['degraded']:
+        return decision
+    _store(key, decision)
+    return dict(decision, entities=dict(decision['entities']), degraded=[])
+
+
+def prime(text: str) -> bool:
+    """Compute and cache the decision for `text` ahead of traffic, without recording it.
+
+    Returns False if it was already cached. Priming does not count towards the hit/miss stats.
+    """
+    key = canonicalize(text)
+    if _lookup(key, count=False) is not None:
+        with _cache_lock:
+            _warm_keys.add(key)
+        return False
+    _store(key, _decide(text))
+    with _cache_lock:
+        _warm_keys.add(key)
+    return True
+
+
+def handle_query(text: str, session: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
+    return process(text, session, deadline=deadline)['response']
+
+
+def handle_batch(texts: List[str], session: Optional[str] = None) -> List[str]:
+    """Answer many messages, running the pipeline once per distinct canonical query."""
+    keys, index = dedupe(texts)
+    decisions: Dict[int, Dict[str, Any]] = {}
+    prioritized = []
+    for t, i in zip(texts, index):
+        if i not in decisions:
+            decisions[i] = _cached_decision(t)
+        prioritized.append(_prioritize(dict(decisions[i], text=t), t))
+    # one round trip to the order store for every order named in the batch
+    found = None
+    order_ids = [order_id for order_id in map(_order_id, prioritized) if order_id is not None]
+    if order_ids:
+        try:
+            found = _orders.lookup_many(order_ids)
+        except TimeoutError:
+            found = None   # each message then tries on its own
+    replies = []
+    for t, d in zip(texts, prioritized):
+        d = _attach_order(d, found)
+        # every escalated message is its own case, even when the decision was shared
+        if d['escalation'] and _escalations is not None:
+            _escalations.submit(t, d['intent'], d['confidence'], d['escalation'], d['entities'], session=session,
+                                urgency=d['urgency'], sentiment=d['sentiment'])
+        if _decision_log is not None:
+            _decision_log.log(d, session)
+        replies.append(d['response'])
+    return replies
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        lookups = _cache_hits + _cache_misses
+        return {'size': len(_cache), 'capacity': CACHE_SIZE, 'hits': _cache_hits,
+                'misses': _cache_misses, 'hit_rate': _cache_hits / lookups if lookups else 0.0,
+                'warm_keys': len(_warm_keys), 'warm_hits': _warm_hits,
+                'warm_coverage': _warm_hits / lookups if lookups else 0.0,
+                'host': _shared.stats() if _shared is not None else None}
+
+
+def start_escalations(db_path: str = ESCALATION_DB) -> EscalationQueue:
+    """Start recording escalated cases to the local store."""
+    global _escalations
+    if _escalations is None:
+        _escalations = EscalationQueue(db_path)
+    return _escalations
+
+
+def stop_escalations():
+    """Flush pending cases and stop the writer."""
+    global _escalations
+    if _escalations is not None:
+        _escalations.close()
+        _escalations = None
+
+
+def start_decision_log(directory: str = LOG_DIR, **options) -> DecisionLog:
+    """Start the structured decision log (options are passed to DecisionLog)."""
+    global _decision_log
+    if _decision_log is None:
+        _decision_log = DecisionLog(directory, **options)
+    return _decision_log
+
+
+def stop_decision_log():
+    global _decision_log
+    if _decision_log is not None:
+        _decision_log.close()
+        _decision_log = None
+
+
+def start_orders(db_path: str = ORDERS_DB, **options) -> OrderLookup:
+    """Answer order_status messages from the order store (options are passed to OrderLookup)."""
+    global _orders
+    if _orders is None:
+        _orders = OrderLookup(db_path, **options)
+    return _orders
+
+
+def stop_orders():
+    global _orders
+    if _orders is not None:
+        _orders.close()
+        _orders = None
+
+
+def order_stats() -> Optional[Dict[str, Any]]:
+    return _orders.stats() if _orders is not None else None
+
+
+def set_languages(codes: List[str], **options) -> Optional[LanguageRouter]:
+    """Serve these languages (options are passed to LanguageRouter). English alone needs no router."""
+    global _languages
+    codes = list(codes)
+    _languages = LanguageRouter(codes, **options) if set(codes) - {DEFAULT_LANGUAGE} else None
+    clear_cache()   # cached decisions were routed under the old setting
+    return _languages
+
+
+def set_shared_cache(cache: Optional[ResponseCache]) -> Optional[ResponseCache]:
+    """Cache decisions in `cache` (shared by the processes forked after this) instead of in-process;
+    None goes back to the in-process LRU."""
+    global _shared
+    clear_cache()
+    _shared = cache
+    return _shared
+
+
+def clear_cache():
+    global _cache_hits, _cache_misses, _warm_hits
+    with _cache_lock:
+        _cache.clear()
+        _warm_keys.clear()
+        _cache_hits = _cache_misses = _warm_hits = 0
+    if _shared is not None:
+        _shared.clear()
+
+
+if __name__ == "__main__":
+    print("Support Chatbot (type 'quit' to exit)")
+    start_escalations()
+    start_decision_log()
+    while True:
+        try:
+            user_text = input("You: ").strip()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if user_text.lower() in ('quit', 'exit'):
+            break
+        if user_text:
+            print(f"Bot: {handle_query(user_text, session='cli')}")
+    stop_escalations()
+    stop_decision_log()
@@ -1,11 +1,27 @@
 # chatbot_gui.py
 # Pink & purple themed chat GUI, canvas-based message area (PACK inside messages frame)
 # Place beside chatbot.py, logic_layer.py, nlu.py
-
+# The backend (spaCy model + pyDatalog KB) is imported in a background thread after the window
+# is shown; run with --eager for the old synchronous startup, --profile-startup to time it.
+# --memprofile snapshots memory/widget counts periodically and writes memory_report.txt on close.
+# Messages are kept in transcripts/<session>.jsonl; older pages load when scrolling to the top.
+# While typing, a debounced background preview shows the likely intent and its answer (preview.py).
+# Warm-up also pre-caches answers for the quick suggestions and top historical queries (warmup.py).
+
+import time
+_T0 = time.perf_counter()
+
+import argparse
+import os
+import threading
+from functools import partial
 import tkinter as tk
 import customtkinter as ctk
 from datetime import datetime
-from chatbot import handle_query
+from startup_profile import StartupTimer, import_profile, summarize, format_summary
+from memprofile import MemoryProfiler
+from transcript import Transcript
+from warmup import QUICK_REPLIES, TOP_N, BUDGET_S, CacheWarmer, warm_texts, format_report
 
 # -----------------------
 # Appearance / theme
@@ -27,18 +43,33 @@ STATUS_GRAY = "#cdb3cd"
 # Timing
 TYPING_INTERVAL_MS = 200
 FAST_REPLY_DELAY_MS = 10    # tiny delay so typing bubble is drawn before backend runs
+BACKEND_POLL_MS = 50        # how often the UI checks whether background warm-up finished
+MEMPROFILE_INTERVAL_S = 60  # snapshot period for --memprofile
+PREVIEW_DEBOUNCE_MS = 120   # pause in typing before the intent preview is refreshed
+PREVIEW_POLL_MS = 30        # how often the UI checks for a finished preview
 
 # -----------------------
 # Chat GUI
 # -----------------------
 class ChatBotGUI:
-    def __init__(self):
+    def __init__(self, eager=False, profile_startup=False, memprofile=False, session="default",
+                 warm_top=TOP_N, warm_budget=BUDGET_S, languages=(), entities="rules",
+                 orders_db="orders.db"):
+        self.timer = StartupTimer(_T0)
+        self.profile_startup = profile_startup
+        self.warm_top = warm_top
+        self.warm_budget = warm_budget
+        self.languages = list(languages or ())
+        self.entities = entities
+        self.orders_db = orders_db
+        self.warmup_report = None
         # root window
         self.root = ctk.CTk()
         self.root.title("Support Chatbot — Pink & Purple")
         self.root.geometry("1100x720")
         self.root.minsize(900, 600)
         self.root.configure(fg_color=BG)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
         # top-level grid layout: left sidebar, right chat area
         self.root.grid_rowconfigure(1, weight=1)
@@ -48,19 +79,111 @@ class ChatBotGUI:
         self.msg_count = 0
         self.typing_active = False
         self._typing_after_id = None
-
-        # build UI
+        self.handle_query = None
+        self._backend_error = None
+        self._backend_done = threading.Event()
+        self.memprofiler = None
+        if memprofile:
+            self.memprofiler = MemoryProfiler(self.root, interval_s=MEMPROFILE_INTERVAL_S)
+            self.memprofiler.start()
+        self.session = session
+        self.backend = None
+        self.transcript = Transcript(session)
+        self._older_offset = None     # byte offset of the oldest loaded message (None = end, 0 = all loaded)
+        self._loading_older = False
+        self._hold_scroll = False      # suppress auto-scroll to bottom while prepending history
+        self.previewer = None          # background as-you-type intent preview (after warm-up)
+        self._preview_after_id = None
+        self._preview_polling = False
+
+        # build UI (sidebar is decorative, so it waits until the first paint)
         self._build_header()
-        self._build_sidebar()
         self._build_chat_area_canvas()
         self._build_input_bar()
+        self._load_older_page()
+        self.timer.mark("widgets_built")
+        self.root.after_idle(self._after_first_paint)
+
+        if eager:
+            self._load_backend()
+            self._on_backend_ready()
+        else:
+            self._set_input_enabled(False)
+            self.status_label.configure(text="Warming up the assistant...")
+            threading.Thread(target=self._load_backend, name="backend-warmup", daemon=True).start()
+            self.root.after(BACKEND_POLL_MS, self._poll_backend)
 
         # focus and initial bot message
         self.input_text.focus_set()
         self.root.after(250, lambda: self.post_bot_message(
-            "Hello! 👋 I'm your support assistant. Ask me about billing, orders, password resets, app issues, subscriptions and more."
+            "Hello! 👋 I'm your support assistant. Ask me about billing, orders, password resets, app issues, subscriptions and more.",
+            persist=False
         ))
 
+    # -----------------------
+    # deferred initialization
+    # -----------------------
+    def _after_first_paint(self):
+        self.timer.mark("first_paint")
+        self._build_sidebar()
+
+    def _load_backend(self):
+        # runs off the Tk thread: importing chatbot loads the NLU (nlu) and builds the KB (logic_layer)
+        try:
+            import chatbot
+            import nlu
+            if self.entities != nlu.DEFAULT_ENTITY_BACKEND:
+                nlu.set_entity_backend(self.entities)
+            chatbot.start_escalations()
+            chatbot.start_decision_log()
+            if self.orders_db and os.path.exists(self.orders_db):
+                chatbot.start_orders(self.orders_db)
+            from preview import PreviewWorker
+            if self.languages:
+                chatbot.set_languages(self.languages)
+            self.backend = chatbot
+            self.previewer = PreviewWorker()
+            # cache common answers before input is enabled, so the first click is already warm
+            self.warmup_report = CacheWarmer(warm_texts(self.warm_top), self.warm_budget).run()
+            self.handle_query = partial(chatbot.handle_query, session=self.session)
+        except Exception as e:
+            self._backend_error = e
+        self._backend_done.set()
+
+    def _poll_backend(self):
+        if self._backend_done.is_set():
+            self._on_backend_ready()
+        else:
+            self.root.after(BACKEND_POLL_MS, self._poll_backend)
+
+    def _on_backend_ready(self):
+        self.timer.mark("backend_ready")
+        if self._backend_error is not None:
+            self.status_label.configure(text=f"Backend failed to load: {self._backend_error}")
+            return
+        self._set_input_enabled(True)
+        self.status_label.configure(text="Ready to help!")
+        self.input_text.focus_set()
+        if self.profile_startup:
+            self._report_startup()
+
+    def _set_input_enabled(self, enabled):
+        state = "normal" if enabled else "disabled"
+        self.input_text.configure(state=state)
+        self.send_btn.configure(state=state)
+        for b in self.quick_buttons:
+            b.configure(state=state)
+
+    def _report_startup(self):
+        print("Startup milestones (since process start):")
+        print(self.timer.report())
+        if self.warmup_report is not None:
+            print(f"Cache warm-up: {format_report(self.warmup_report)}")
+        # import profile runs in a child interpreter; keep it off the Tk thread
+        def profile_imports():
+            print(format_summary(summarize(import_profile("chatbot"))))
+        threading.Thread(target=profile_imports, daemon=True).start()
+
     # -----------------------
     # header
     # -----------------------
@@ -129,8 +252,9 @@ class ChatBotGUI:
         # Vertical scrollbar
         vsb = ctk.CTkScrollbar(container, orientation="vertical", command=self._on_scroll)
         vsb.grid(row=0, column=1, sticky="ns", pady=12, padx=(4,8))
-        # Link canvas to scrollbar
-        self.canvas.configure(yscrollcommand=vsb.set)
+        self.vsb = vsb
+        # Link canvas to scrollbar (via hook that pages in older history at the top)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
 
         # inner frame that will contain messages (we pack inside this)
         self.messages_frame = tk.Frame(self.canvas, bg=BG)
@@ -152,13 +276,43 @@ class ChatBotGUI:
         except Exception:
             pass
 
+    def _on_yscroll(self, first, last):
+        self.vsb.set(first, last)
+        if float(first) <= 0.0 and self._older_offset != 0 and not self._loading_older:
+            self._loading_older = True
+            self.root.after_idle(self._load_older_page)
+
     def _on_frame_configure(self, event=None):
         # update scroll region to match inner frame size
         self.canvas.configure(scrollregion=self.canvas.bbox("all"))
         # auto-scroll to bottom when new message added
         # (we don't automatically force-scroll during user manual scroll; user can scroll)
-        # We'll keep it simple: always move to bottom after small delay
-        self.root.after(40, lambda: self.canvas.yview_moveto(1.0))
+        # We'll keep it simple: always move to bottom after small delay, unless history is being prepended
+        self.root.after(40, lambda: self._hold_scroll or self.canvas.yview_moveto(1.0))
+
+    # -----------------------
+    # transcript history (paged, newest page first)
+    # -----------------------
+    def _load_older_page(self):
+        records, self._older_offset = self.transcript.read_page(self._older_offset)
+        if records:
+            self._hold_scroll = True
+            old_height = self.messages_frame.winfo_height()
+            children = self.messages_frame.winfo_children()
+            anchor = children[0] if children else None
+            for r in records:
+                post = self.post_user_message if r['role'] == 'user' else self.post_bot_message
+                post(r['text'], ts=r['ts'], persist=False, before=anchor)
+            if anchor is not None:
+                # keep the message the user was looking at in place
+                self.messages_frame.update_idletasks()
+                new_height = self.messages_frame.winfo_height()
+                self.canvas.yview_moveto((new_height - old_height) / max(new_height, 1))
+            self.root.after(100, self._release_scroll)
+        self._loading_older = False
+
+    def _release_scroll(self):
+        self._hold_scroll = False
 
     def _on_canvas_configure(self, event):
         # ensure inner frame width matches canvas width
@@ -177,6 +331,7 @@ class ChatBotGUI:
         self.input_text.grid(row=0, column=0, padx=(12,8), pady=10, sticky="ew")
         self.input_text.bind("<Return>", self._on_enter_pressed)
         self.input_text.bind("<Shift-Return>", lambda e: None)  # allow Shift+Enter newline (no-op here)
+        self.input_text.bind("<KeyRelease>", self._on_input_changed)
 
         right = ctk.CTkFrame(footer, fg_color="transparent")
         right.grid(row=0, column=1, padx=(0,12), pady=10)
@@ -185,46 +340,62 @@ class ChatBotGUI:
                                      width=110, height=78, command=self._on_send_clicked)
         self.send_btn.grid(row=0, column=0)
 
+        # as-you-type preview: "looks like: Refund status — <suggested answer>"
+        self.preview_label = ctk.CTkLabel(footer, text="", text_color=STATUS_GRAY, anchor="w",
+                                          justify="left", wraplength=900, font=ctk.CTkFont(size=12))
+        self.preview_label.grid(row=1, column=0, columnspan=2, sticky="ew", padx=14)
+
         # quick suggestion buttons
         qs = ctk.CTkFrame(footer, fg_color="transparent")
-        qs.grid(row=1, column=0, columnspan=2, sticky="ew", padx=12, pady=(0,10))
-        tips = ["Where is my order?", "Refund status", "Reset my password", "Cancel subscription"]
-        for i, t in enumerate(tips):
+        qs.grid(row=2, column=0, columnspan=2, sticky="ew", padx=12, pady=(0,10))
+        self.quick_buttons = []
+        for i, t in enumerate(QUICK_REPLIES):
             b = ctk.CTkButton(qs, text=t, fg_color="#371033", width=170, command=lambda txt=t: self._quick_send(txt))
             b.grid(row=0, column=i, padx=6)
+            self.quick_buttons.append(b)
 
     # -----------------------
     # message posting helpers (PACK inside messages_frame)
     # -----------------------
-    def post_user_message(self, text: str):
+    @staticmethod
+    def _clock(ts):
+        return (datetime.fromisoformat(ts) if ts else datetime.now()).strftime("%H:%M")
+
+    def post_user_message(self, text: str, ts: str = None, persist=True, before=None):
         # wrapper fills width; inside it we place bubble anchored right
         wrapper = tk.Frame(self.messages_frame, bg=BG)
-        wrapper.pack(fill="x", pady=6, padx=8)
+        wrapper.pack(fill="x", pady=6, padx=8, before=before)
 
         # bubble (CTkFrame for consistent styling)
         bubble = ctk.CTkFrame(wrapper, fg_color=USER_PINK, corner_radius=14)
         bubble.pack(anchor="e", padx=(40,8))
         msg_lbl = ctk.CTkLabel(bubble, text=text, wraplength=520, justify="left", text_color=TEXT_WHITE, font=ctk.CTkFont(size=13))
         msg_lbl.grid(row=0, column=0, padx=12, pady=(10,8))
-        time_lbl = ctk.CTkLabel(bubble, text=datetime.now().strftime("%H:%M"), text_color="#ffd8ee", font=ctk.CTkFont(size=9))
+        time_lbl = ctk.CTkLabel(bubble, text=self._clock(ts), text_color="#ffd8ee", font=ctk.CTkFont(size=9))
         time_lbl.grid(row=1, column=0, sticky="e", padx=10, pady=(0,8))
 
         self.msg_count += 1
-        self._maybe_scroll_to_bottom()
+        if persist:
+            self.transcript.append("user", text)
+        if before is None:
+            self._maybe_scroll_to_bottom()
 
-    def post_bot_message(self, text: str):
+    def post_bot_message(self, text: str, ts: str = None, persist=True, before=None):
         wrapper = tk.Frame(self.messages_frame, bg=BG)
-        wrapper.pack(fill="x", pady=6, padx=8)
+        wrapper.pack(fill="x", pady=6, padx=8, before=before)
 
         bubble = ctk.CTkFrame(wrapper, fg_color=BOT_LILAC, corner_radius=14)
         bubble.pack(anchor="w", padx=(8,40))
         msg_lbl = ctk.CTkLabel(bubble, text=text, wraplength=520, justify="left", text_color=TEXT_DARK, font=ctk.CTkFont(size=13))
         msg_lbl.grid(row=0, column=0, padx=12, pady=(10,8))
-        time_lbl = ctk.CTkLabel(bubble, text=datetime.now().strftime("%H:%M"), text_color="#7B6B7B", font=ctk.CTkFont(size=9))
+        time_lbl = ctk.CTkLabel(bubble, text=self._clock(ts), text_color="#7B6B7B", font=ctk.CTkFont(size=9))
         time_lbl.grid(row=1, column=0, sticky="w", padx=10, pady=(0,8))
 
         self.msg_count += 1
-        self._maybe_scroll_to_bottom()
+        if persist:
+            self.transcript.append("bot", text)
+        if before is None:
+            self._maybe_scroll_to_bottom()
 
     # -----------------------
     # typing animation (in same messages_frame)
@@ -281,12 +452,53 @@ class ChatBotGUI:
             return "break"
         return None
 
+    def _on_input_changed(self, event=None):
+        # debounce: only the last keystroke of a burst asks for a preview
+        if self.previewer is None:
+            return
+        if self._preview_after_id:
+            self.root.after_cancel(self._preview_after_id)
+        self._preview_after_id = self.root.after(PREVIEW_DEBOUNCE_MS, self._request_preview)
+
+    def _request_preview(self):
+        self._preview_after_id = None
+        self.previewer.submit(self.input_text.get("1.0", "end-1c"))
+        if not self._preview_polling:
+            self._preview_polling = True
+            self.root.after(PREVIEW_POLL_MS, self._poll_preview)
+
+    def _poll_preview(self):
+        result = self.previewer.poll()
+        if result is not None:
+            self._show_preview(result)
+        if self.previewer.pending:
+            self.root.after(PREVIEW_POLL_MS, self._poll_preview)
+        else:
+            self._preview_polling = False
+
+    def _show_preview(self, result=None):
+        if not result or result['intent'] is None:
+            self.preview_label.configure(text="")
+            return
+        text = f"looks like: {result['label']}"
+        if result['suggestion']:
+            text += f" — {result['suggestion']}"
+        self.preview_label.configure(text=text)
+
     def _on_send_clicked(self):
+        if self.handle_query is None:
+            return
         user_text = self.input_text.get("1.0", "end-1c").strip()
         if not user_text:
             return
         # clear input
         self.input_text.delete("1.0", "end")
+        if self._preview_after_id:
+            self.root.after_cancel(self._preview_after_id)
+        self._preview_after_id = None
+        self._show_preview(None)
+        if self.previewer is not None:
+            self.previewer.submit("")   # supersede any preview still running for the sent text
         # show user message immediately
         self.post_user_message(user_text)
         # show typing, then call backend shortly after so typing shows up
@@ -300,7 +512,7 @@ class ChatBotGUI:
 
     def _call_backend(self, user_text):
         try:
-            reply = handle_query(user_text)
+            reply = self.handle_query(user_text)
             if not reply:
                 reply = "I couldn't find a direct answer — escalating to a human specialist."
         except Exception as e:
@@ -321,10 +533,14 @@ class ChatBotGUI:
     # utilities
     # -----------------------
     def clear_chat(self):
+        # only the view is cleared; the transcript file keeps everything. History from before the
+        # clear is not paged back in (the emptied canvas sits at the top, which would reload it)
         for w in self.messages_frame.winfo_children():
             w.destroy()
         self.msg_count = 0
-        self.post_bot_message("Chat cleared! How can I help you today?")
+        self.transcript.flush()
+        self._older_offset = 0
+        self.post_bot_message("Chat cleared! How can I help you today?", persist=False)
 
     def _toggle_theme(self):
         cur = ctk.get_appearance_mode()
@@ -347,6 +563,18 @@ class ChatBotGUI:
         ctk.CTkLabel(f, text="Version 1.0\nPowered by pyDatalog logic and a regex+spaCy NLU.", justify="center").pack(pady=(6,8))
         ctk.CTkButton(f, text="Close", width=120, command=top.destroy).pack(pady=8)
 
+    def _on_close(self):
+        if self.memprofiler is not None:
+            print(f"Memory report written to {self.memprofiler.write_report()}")
+        self.transcript.close()
+        if self.previewer is not None:
+            self.previewer.close()
+        if self.backend is not None:
+            self.backend.stop_escalations()
+            self.backend.stop_decision_log()
+            self.backend.stop_orders()
+        self.root.destroy()
+
     def run(self):
         self.root.mainloop()
 
@@ -354,5 +582,22 @@ class ChatBotGUI:
 # Run
 # -----------------------
 if __name__ == "__main__":
-    app = ChatBotGUI()
+    parser = argparse.ArgumentParser(description="Support Chatbot GUI")
+    parser.add_argument("--eager", action="store_true", help="load the backend before showing the window")
+    parser.add_argument("--profile-startup", action="store_true", help="print startup milestones and import costs")
+    parser.add_argument("--memprofile", action="store_true", help="write memory_report.txt on close")
+    parser.add_argument("--session", default="default", help="transcript session name")
+    parser.add_argument("--warm-top", type=int, default=TOP_N, help="historical queries to pre-cache")
+    parser.add_argument("--warm-budget", type=float, default=BUDGET_S, help="seconds allowed for pre-caching")
+    parser.add_argument("--languages", nargs="+", default=(), help="language packs to serve, e.g. en es fr")
+    # same names as nlu.ENTITY_BACKENDS (not imported here, so the window can show before the NLU loads)
+    parser.add_argument("--entities", choices=("rules", "spacy", "none"), default="rules",
+                        help="date/time/money entities: regex grammar, en_core_web_sm, or none")
+    parser.add_argument("--orders-db", default="orders.db",
+                        help="order store for live order statuses (skipped when the file does not exist)")
+    args = parser.parse_args()
+    app = ChatBotGUI(eager=args.eager, profile_startup=args.profile_startup,
+                     memprofile=args.memprofile, session=args.session,
+                     warm_top=args.warm_top, warm_budget=args.warm_budget, languages=args.languages,
+                     entities=args.entities, orders_db=args.orders_db)
     app.run()
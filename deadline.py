@@ -0,0 +1,35 @@
+# deadline.py
+# Per-request time budgets. A Deadline is created when a request arrives and passed through the
+# pipeline; before each optional stage the pipeline asks whether enough of the budget is left for
+# that stage's typical cost, and skips (and records) the stage when it is not.
+import time
+from typing import Callable
+
+# Budget that must remain for an optional stage to run (seconds; roughly its p99 cost)
+STAGE_BUDGETS = {
+    'typo_correction': 0.001,   # fuzzy re-scoring of misspelled tokens
+    'spacy_ner': 0.020,         # spaCy parse for date/time/money entities
+    'rule_ner': 0.0002,         # the same entities from the regex grammar (entity_rules.py)
+    'entities': 0.0,            # regex entity extraction: skipped only once the deadline has passed
+}
+
+
+class Deadline:
+    def __init__(self, at: float, clock: Callable[[], float] = time.monotonic):
+        self.at = at            # absolute time on `clock`
+        self.clock = clock
+
+    @classmethod
+    def after(cls, seconds: float, clock: Callable[[], float] = time.monotonic) -> "Deadline":
+        return cls(clock() + seconds, clock)
+
+    def remaining(self) -> float:
+        return self.at - self.clock()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, stage: str) -> bool:
+        """Is there enough budget left to run `stage`?"""
+        left = self.remaining()
+        return left > 0 and left >= STAGE_BUDGETS[stage]
@@ -0,0 +1,153 @@
+# decision_log.py
+# Structured audit log of every decision (JSON lines), written off the hot path.
+# handle_query only appends the decision dict to an in-memory buffer; a background writer
+# serializes, enriches (English patterns fired) and writes batches, rotating files by size or age.
+# When the disk falls behind, the buffer fills and new records are dropped and counted
+# rather than ever blocking the caller.
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from languages import DEFAULT_LANGUAGE
+from nlu import fired_patterns
+
+LOG_DIR = "logs"
+MAX_BYTES = 50 * 2**20       # rotate when the current file reaches this size
+ROTATE_SECONDS = 3600        # ... or when it is this old
+BUFFER_SIZE = 50000          # records held in memory before new ones are dropped
+FLUSH_INTERVAL = 0.2         # seconds between writer passes
+
+
+class DecisionLog:
+    def __init__(self, directory: str = LOG_DIR, max_bytes: int = MAX_BYTES,
+                 rotate_seconds: float = ROTATE_SECONDS, sample_rate: float = 1.0,
+                 buffer_size: int = BUFFER_SIZE, flush_interval: float = FLUSH_INTERVAL, tag: str = ""):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.tag = tag               # appended to file names so several processes can share a directory
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = deque()   # append/popleft are atomic, so the hot path takes no lock
+        self._random = random.random
+        self.logged = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+        self.files = 0
+        self.write_errors = 0
+        self._file = None
+        self._file_opened = 0.0
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name="decision-log-writer", daemon=True)
+        self._writer.start()
+
+    # --- hot path ---
+    def log(self, decision: Dict[str, Any], session: Optional[str] = None):
+        """Buffer a decision for writing. Never blocks; drops (and counts) when the buffer is full."""
+        if self.sample_rate < 1.0 and self._random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        if len(self._buffer) >= self.buffer_size:
+            self.dropped += 1
+            return
+        self._buffer.append((time.time(), session, decision))
+        self.logged += 1
+
+    # --- background writer ---
+    def _open(self, now: float):
+        if self._file is not None:
+            self._file.close()
+        name = datetime.fromtimestamp(now).strftime("decisions-%Y%m%d-%H%M%S")
+        if self.tag:
+            name += f"-{self.tag}"
+        path = os.path.join(self.directory, f"{name}.jsonl")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{name}-{suffix}.jsonl")
+            suffix += 1
+        self._file = open(path, "a", encoding="utf-8")
+        self._file_opened = now
+        self.files += 1
+
+    @staticmethod
+    def _record(ts: float, session: Optional[str], d: Dict[str, Any]) -> Dict[str, Any]:
+        english = d.get('language', DEFAULT_LANGUAGE) == DEFAULT_LANGUAGE
+        record = {
+            'ts': ts,
+            'session': session,
+            'input': d['text'],
+            'normalized': d['key'],
+            'language': d.get('language'),
+            'intent': d['intent'],
+            'score': d['confidence'],
+            'intents': d.get('intents', []),
+            'patterns': fired_patterns(d['key'], d['intent']) if english else None,
+            'entities': d['entities'],
+            'escalation': d['escalation'],
+            'urgency': d.get('urgency'),
+            'sentiment': d.get('sentiment'),
+            'response': d['response'],
+            'degraded': d.get('degraded', []),
+        }
+        if not english:
+            del record['patterns']   # decided by a language pack; the English patterns say nothing about it
+        return record
+
+    def _drain(self):
+        lines = []
+        while self._buffer:
+            ts, session, decision = self._buffer.popleft()
+            lines.append(json.dumps(self._record(ts, session, decision), ensure_ascii=False) + "\n")
+        if not lines:
+            return
+        now = time.time()
+        if (self._file is None or self._file.tell() >= self.max_bytes
+                or now - self._file_opened >= self.rotate_seconds):
+            self._open(now)
+        try:
+            self._file.write("".join(lines))
+            self._file.flush()
+            self.written += len(lines)
+        except OSError:
+            self.write_errors += len(lines)
+
+    def _write_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self._drain()
+        self._drain()
+        if self._file is not None:
+            self._file.close()
+
+    def close(self):
+        """Write everything still buffered and stop the writer."""
+        self._stop.set()
+        self._writer.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'logged': self.logged, 'written': self.written, 'dropped': self.dropped,
+                'sampled_out': self.sampled_out, 'buffered': len(self._buffer),
+                'files': self.files, 'write_errors': self.write_errors}
+
+
+if __name__ == "__main__":
+    # Hot-path overhead: time spent inside log() per query
+    import tempfile
+    from chatbot import process
+
+    decision = process("Where is my order #ABC-12345?")
+    log = DecisionLog(tempfile.mkdtemp())
+    n = 200000
+    start = time.perf_counter()
+    for _ in range(n):
+        log.log(decision, "bench")
+    elapsed = time.perf_counter() - start
+    log.close()
+    print(f"log(): {elapsed / n * 1e6:.2f} us per call; {log.stats()}")
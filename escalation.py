@@ -0,0 +1,324 @@
+# escalation.py
+# Escalation hand-off: cases are queued in memory without blocking the reply path and a background
+# writer batch-flushes them to a local SQLite store that agents can query.
+# Each case carries the message's urgency and sentiment (urgency.py) so agents can work the most
+# urgent cases first: cases(order='urgency').
+# The writer also groups near-identical cases (near_duplicates.py): a case that reads like one
+# escalated in the last few hours gets duplicate_of = the first case of that cluster, so during an
+# incident agents can see clusters() and close a whole cluster at once. The store is the source of
+# truth for clusters: before each batch the writer takes the write lock and indexes the cases other
+# processes (server workers, earlier runs) wrote since it last looked, so every process joins the
+# same clusters. The reply path never pays for it. Grouping needs numpy; without it cases are still
+# written, just not grouped.
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from near_duplicates import NearDuplicateIndex
+
+ESCALATION_DB = "escalations.db"
+QUEUE_SIZE = 10000       # cases buffered in memory before new ones are rejected
+BATCH_SIZE = 500         # max cases per SQLite transaction
+FLUSH_INTERVAL = 0.2     # seconds the writer waits for more cases before committing
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS escalations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    session TEXT,
+    message TEXT NOT NULL,
+    intent TEXT,
+    confidence REAL,
+    reason TEXT NOT NULL,
+    entities TEXT,
+    status TEXT NOT NULL DEFAULT 'open',
+    urgency REAL NOT NULL DEFAULT 0,
+    sentiment REAL NOT NULL DEFAULT 0,
+    duplicate_of INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_escalations_status ON escalations (status, created);
+"""
+# columns added after the first release; older stores are migrated on open
+_MIGRATIONS = {
+    'urgency': "ALTER TABLE escalations ADD COLUMN urgency REAL NOT NULL DEFAULT 0",
+    'sentiment': "ALTER TABLE escalations ADD COLUMN sentiment REAL NOT NULL DEFAULT 0",
+    'duplicate_of': "ALTER TABLE escalations ADD COLUMN duplicate_of INTEGER",
+}
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_escalations_urgency ON escalations (status, urgency DESC, created);
+CREATE INDEX IF NOT EXISTS idx_escalations_duplicate ON escalations (duplicate_of);
+"""
+_INSERT = ("INSERT INTO escalations (created, session, message, intent, confidence, reason, entities, "
+           "urgency, sentiment, duplicate_of) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_COLUMNS = ('id', 'created', 'session', 'message', 'intent', 'confidence', 'reason', 'entities', 'status',
+            'urgency', 'sentiment', 'duplicate_of')
+_CLUSTERS = """
+SELECT c.root, c.size, c.first, c.last, e.message, e.intent FROM (
+    SELECT COALESCE(duplicate_of, id) AS root, COUNT(*) AS size, MIN(created) AS first, MAX(created) AS last
+    FROM escalations WHERE status = ? GROUP BY root HAVING size >= ?
+) c JOIN escalations e ON e.id = c.root
+ORDER BY c.size DESC, c.last DESC LIMIT ?
+"""
+_SINCE = ("SELECT id, message, COALESCE(duplicate_of, id), created FROM escalations "
+          "WHERE id > ? AND created >= ? ORDER BY id DESC LIMIT ?")
+_ORDERS = {'recent': "created DESC, id DESC", 'urgency': "urgency DESC, created ASC, id ASC"}
+_CLOSE = object()
+
+
+def _duplicate_index() -> Optional["NearDuplicateIndex"]:
+    try:
+        from near_duplicates import NearDuplicateIndex   # needs numpy
+    except ImportError:
+        return None
+    return NearDuplicateIndex()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")      # agents can read while the writer appends
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class EscalationQueue:
+    def __init__(self, db_path: str = ESCALATION_DB, maxsize: int = QUEUE_SIZE,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL,
+                 duplicates: Optional["NearDuplicateIndex"] = None, group_duplicates: bool = True):
+        self.db_path = db_path
+        # only the writer thread uses the index
+        self.duplicates = duplicates or (_duplicate_index() if group_duplicates else None)
+        self._indexed_id = 0    # last case id the index has seen
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        conn = _connect(db_path)
+        conn.executescript(_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(escalations)")}
+        for column, sql in _MIGRATIONS.items():
+            if column not in existing:
+                conn.execute(sql)
+        conn.executescript(_INDEXES)
+        conn.close()
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._metrics = {'enqueued': 0, 'rejected': 0, 'written': 0, 'batches': 0,
+                         'max_depth': 0, 'last_flush_ms': 0.0, 'duplicates': 0,
+                         'write_errors': 0}
+        self._writer = threading.Thread(target=self._write_loop, name="escalation-writer", daemon=True)
+        self._writer.start()
+
+    # --- reply path ---
+    def submit(self, message: str, intent: Optional[str], confidence: float, reason: str,
+               entities: Optional[Dict[str, Any]] = None, session: Optional[str] = None,
+               urgency: float = 0.0, sentiment: float = 0.0) -> bool:
+        """Queue a case without blocking. Returns False (and counts it) if the queue is full."""
+        row = (time.time(), session, message, intent, confidence, reason,
+               json.dumps(entities or {}, ensure_ascii=False), urgency, sentiment)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self._metrics['rejected'] += 1
+            return False
+        depth = self._queue.qsize()
+        with self._lock:
+            self._metrics['enqueued'] += 1
+            if depth > self._metrics['max_depth']:
+                self._metrics['max_depth'] = depth
+        return True
+
+    # --- background writer ---
+    def _write_loop(self):
+        conn = _connect(self.db_path)
+        closing = False
+        while not closing:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = any(row is _CLOSE for row in batch)
+            rows = [row for row in batch if row is not _CLOSE]
+            try:
+                if rows:
+                    start = time.perf_counter()
+                    duplicates = self._insert(conn, rows)
+                    with self._lock:
+                        self._metrics['written'] += len(rows)
+                        self._metrics['duplicates'] += duplicates
+                        self._metrics['batches'] += 1
+                        self._metrics['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            except sqlite3.Error:
+                # the batch is lost, but the writer keeps draining so flush()/close() never hang
+                with self._lock:
+                    self._metrics['write_errors'] += len(rows)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def _insert(self, conn: sqlite3.Connection, rows: List[tuple]) -> int:
+        """Write one batch, each case linked to the cluster it joins; returns how many joined one."""
+        index = self.duplicates
+        if index is None:
+            with conn:
+                conn.executemany(_INSERT, [row + (None,) for row in rows])
+            return 0
+        # signatures outside the transaction. The index is only updated once the batch is committed (a
+        # rolled-back case id may be reused), so cases in this batch are also matched against the
+        # clusters the batch itself started.
+        sigs = [index.signature(row[2]) for row in rows]
+        buckets = [index.buckets(sig) if sig is not None else None for sig in sigs]
+        new_roots: List[tuple] = []    # (signature, case id) of clusters started in this batch
+        added = []
+        duplicates = 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")   # nobody else writes until this batch is in
+            self._catch_up(conn, index)
+            for row, sig, bucket in zip(rows, sigs, buckets):
+                root = None
+                if sig is not None:
+                    found = index.match(sig, bucket)
+                    if found is None and new_roots:
+                        found = index.closest(sig, [r[0] for r in new_roots])
+                        found = (new_roots[found[0]][1], found[1]) if found else None
+                    root = found[0] if found else None
+                case_id = conn.execute(_INSERT, row + (root,)).lastrowid
+                duplicates += root is not None
+                if sig is not None:
+                    if root is None:
+                        new_roots.append((sig, case_id))
+                    added.append((sig, root if root is not None else case_id, bucket, row[0]))
+        for sig, cluster, bucket, created in added:
+            index.add(sig, cluster, bucket, created)
+        self._indexed_id = case_id
+        return duplicates
+
+    def _catch_up(self, conn: sqlite3.Connection, index: "NearDuplicateIndex"):
+        """Index cases written by other processes since the last batch (on the first batch: the
+        recent store), so clusters span every process writing to this store."""
+        since = index.clock() - index.max_age_s
+        for case_id, message, root, created in reversed(
+                conn.execute(_SINCE, (self._indexed_id, since, index.window)).fetchall()):
+            sig = index.signature(message)
+            if sig is not None:
+                index.add(sig, root, created=created)
+            self._indexed_id = case_id
+
+    def flush(self):
+        """Block until every queued case is committed."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_CLOSE)
+        self._writer.join()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            m = dict(self._metrics)
+        m['depth'] = self._queue.qsize()
+        m['capacity'] = self._queue.maxsize
+        m['avg_batch'] = round(m['written'] / m['batches'], 1) if m['batches'] else 0.0
+        m['near_duplicates'] = self.duplicates.stats() if self.duplicates is not None else None
+        return m
+
+    # --- agent query API ---
+    def _rows(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        conn = _connect(self.db_path)
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        cases = []
+        for row in rows:
+            case = dict(zip(_COLUMNS, row))
+            case['entities'] = json.loads(case['entities'] or '{}')
+            cases.append(case)
+        return cases
+
+    def cases(self, status: Optional[str] = 'open', reason: Optional[str] = None,
+              intent: Optional[str] = None, session: Optional[str] = None,
+              limit: int = 50, order: str = 'recent') -> List[Dict[str, Any]]:
+        """Cases matching the given filters, most recent first or (order='urgency') most urgent first."""
+        where, params = [], []
+        for column, value in (('status', status), ('reason', reason), ('intent', intent), ('session', session)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM escalations"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {_ORDERS[order]} LIMIT ?"
+        return self._rows(sql, params + [limit])
+
+    def get(self, case_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._rows(f"SELECT {', '.join(_COLUMNS)} FROM escalations WHERE id = ?", (case_id,))
+        return rows[0] if rows else None
+
+    def set_status(self, case_id: int, status: str) -> bool:
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                updated = conn.execute("UPDATE escalations SET status = ? WHERE id = ?",
+                                       (status, case_id)).rowcount
+        finally:
+            conn.close()
+        return updated > 0
+
+    def clusters(self, status: str = 'open', min_size: int = 2, limit: int = 20) -> List[Dict[str, Any]]:
+        """Largest groups of near-identical cases with this status; 'root' is the first case."""
+        conn = _connect(self.db_path)
+        try:
+            rows = conn.execute(_CLUSTERS, (status, min_size, limit)).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(('root', 'size', 'first', 'last', 'message', 'intent'), row)) for row in rows]
+
+    def set_cluster_status(self, root: int, status: str) -> int:
+        """Set the status of a case and every case marked as its duplicate; returns how many changed."""
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                return conn.execute("UPDATE escalations SET status = ? WHERE id = ? OR duplicate_of = ?",
+                                    (status, root, root)).rowcount
+        finally:
+            conn.close()
+
+    def counts(self) -> Dict[str, int]:
+        """Number of cases per status."""
+        conn = _connect(self.db_path)
+        try:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM escalations GROUP BY status").fetchall())
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    # Burst benchmark: how fast can the reply path hand off cases, and how fast do they drain?
+    import argparse
+    import os
+    import tempfile
+    parser = argparse.ArgumentParser(description="Escalation queue burst benchmark")
+    parser.add_argument("--cases", type=int, default=20000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    esc = EscalationQueue(path, maxsize=args.cases)
+    start = time.perf_counter()
+    for i in range(args.cases):
+        esc.submit(f"I was double charged, case {i}", 'payment_dispute', 0.5, 'policy',
+                   {'money': ['$19.99']}, session=f"s{i % 100}")
+    submitted = time.perf_counter() - start
+    esc.flush()
+    drained = time.perf_counter() - start
+    print(f"submit: {args.cases / submitted:,.0f} cases/s ({submitted / args.cases * 1e6:.1f} us each)")
+    print(f"durable: {args.cases / drained:,.0f} cases/s, all committed after {drained:.2f} s")
+    print(esc.metrics())
+    esc.close()
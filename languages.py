@@ -0,0 +1,174 @@
+# languages.py
+# Per-language pattern packs, loaded on first use.
+# A pack (langpacks/<code>.json) holds intent patterns, responses, hand-off replies and entity regex
+# overrides for one language, plus an optional spaCy model name. English is built in
+# (nlu.INTENT_PATTERNS and the KB); its pack only carries the detector sample.
+# LanguageRouter picks a language per message with a character-trigram naive Bayes detector
+# (one dict lookup per trigram) and loads that pack when first needed; packs unused for
+# IDLE_EVICT_S are dropped again. Without a router (the default) nothing here is loaded or run.
+# Usage: python languages.py en es fr  (detector accuracy and cost)
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from intents import ScoreTable, by_id
+
+PACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "langpacks")
+DEFAULT_LANGUAGE = "en"
+IDLE_EVICT_S = 900.0     # drop a pack not used for this long
+SWEEP_INTERVAL_S = 60.0  # how often routing checks for idle packs
+MIN_MARGIN = 2.0         # log-likelihood lead needed to override the default language
+
+_LETTERS_RE = re.compile(r"[^\W\d_]+")
+
+
+def trigrams(text: str) -> List[str]:
+    grams = []
+    for word in _LETTERS_RE.findall(text.casefold()):
+        padded = f" {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _read_pack(code: str, pack_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(pack_dir, f"{code}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class LanguageDetector:
+    def __init__(self, samples: Dict[str, str], default: str = DEFAULT_LANGUAGE):
+        self.languages = list(samples)
+        self.default = default
+        counts = {lang: Counter(trigrams(text)) for lang, text in samples.items()}
+        vocab = set().union(*counts.values())
+        # trigram -> log P(trigram | language) for every language, add-one smoothed
+        totals = [sum(counts[lang].values()) + len(vocab) for lang in self.languages]
+        self._unseen = [math.log(1 / t) for t in totals]
+        self._table = {g: tuple(math.log((counts[lang][g] + 1) / t) for lang, t in zip(self.languages, totals))
+                       for g in vocab}
+
+    def scores(self, text: str) -> Dict[str, float]:
+        totals = [0.0] * len(self.languages)
+        table, unseen = self._table, self._unseen
+        for g in trigrams(text):
+            row = table.get(g, unseen)
+            for i, v in enumerate(row):
+                totals[i] += v
+        return dict(zip(self.languages, totals))
+
+    def detect(self, text: str) -> str:
+        """Most likely language; the default unless another one wins by MIN_MARGIN."""
+        scores = self.scores(text)
+        best = max(scores, key=scores.get)
+        if best != self.default and scores[best] - scores.get(self.default, -math.inf) < MIN_MARGIN:
+            return self.default
+        return best
+
+
+class LanguagePack:
+    def __init__(self, code: str, data: Dict[str, Any]):
+        self.code = code
+        self.name = data.get('name', code)
+        self.table = ScoreTable(data['patterns'])
+        self.responses = by_id(data.get('responses', {}))   # indexed by intent ID
+        self.replies: Dict[str, str] = data.get('replies', {})
+        self.entity_patterns: Dict[str, str] = data.get('entity_patterns', {})
+        self.nlp = None
+        if data.get('spacy_model'):
+            try:
+                import spacy
+                self.nlp = spacy.load(data['spacy_model'])
+            except Exception:
+                self.nlp = None   # regex entities only, as for English without spaCy
+
+
+class LanguageRouter:
+    def __init__(self, languages: Iterable[str], default: str = DEFAULT_LANGUAGE, pack_dir: str = PACK_DIR,
+                 idle_evict_s: float = IDLE_EVICT_S, clock: Callable[[], float] = time.monotonic):
+        self.languages = list(dict.fromkeys([default, *languages]))
+        self.default = default
+        self.pack_dir = pack_dir
+        self.idle_evict_s = idle_evict_s
+        self.clock = clock
+        # only the detector samples are read up front; patterns/models wait for the first message
+        self.detector = LanguageDetector({code: _read_pack(code, pack_dir)['sample'] for code in self.languages},
+                                         default)
+        self._packs: Dict[str, LanguagePack] = {}
+        self._last_used: Dict[str, float] = {}
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def detect(self, text: str) -> str:
+        return self.detector.detect(text)
+
+    def pack(self, code: str) -> Optional[LanguagePack]:
+        """The pack for `code`, loading it on first use; None for the built-in default language."""
+        if code == self.default:
+            self._maybe_sweep()
+            return None
+        now = self.clock()
+        with self._lock:
+            pack = self._packs.get(code)
+            if pack is None:
+                pack = self._packs[code] = LanguagePack(code, _read_pack(code, self.pack_dir))
+                self.loads += 1
+            self._last_used[code] = now
+        self._maybe_sweep()
+        return pack
+
+    def _maybe_sweep(self):
+        now = self.clock()
+        if now - self._last_sweep >= SWEEP_INTERVAL_S:
+            self._last_sweep = now
+            self.evict_idle(now)
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Drop packs idle for longer than idle_evict_s; returns their codes."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            idle = [code for code, used in self._last_used.items() if now - used >= self.idle_evict_s]
+            for code in idle:
+                del self._packs[code], self._last_used[code]
+            self.evictions += len(idle)
+        return idle
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'languages': self.languages, 'loaded': sorted(self._packs),
+                    'loads': self.loads, 'evictions': self.evictions}
+
+
+if __name__ == "__main__":
+    import sys
+    codes = sys.argv[1:] or ["en", "es", "fr"]
+    router = LanguageRouter(codes)
+    checks = {
+        'en': ["Where is my order?", "Refund status", "Reset my password", "Cancel subscription",
+               "I was double charged AGAIN", "app keeps crashing"],
+        'es': ["¿Dónde está mi pedido?", "estado de mi reembolso", "olvidé mi contraseña",
+               "me cobraron dos veces", "quiero cancelar mi suscripción", "la aplicación se cierra"],
+        'fr': ["Où est ma commande ?", "mon remboursement", "j'ai oublié mon mot de passe",
+               "j'ai été débité deux fois", "je veux résilier mon abonnement", "l'application plante"],
+    }
+    correct = total = 0
+    for lang, texts in checks.items():
+        if lang not in router.languages:
+            continue
+        for text in texts:
+            got = router.detect(text)
+            total += 1
+            correct += got == lang
+            if got != lang:
+                print(f"  {text!r}: expected {lang}, got {got}")
+    n = 20000
+    start = time.perf_counter()
+    for i in range(n):
+        router.detect(checks['en'][i % 6])
+    print(f"accuracy {correct}/{total}; detect(): {(time.perf_counter() - start) / n * 1e6:.1f} us per message")
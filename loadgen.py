@@ -0,0 +1,201 @@
+# loadgen.py
+# Local soak test: N concurrent simulated conversations against handle_query.
+# Usage: python loadgen.py --sessions 16 --duration 600 --interval 30
+import gc
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from chatbot import handle_query
+from test_all_commands import ALL_TEST_QUERIES
+
+CORPUS = [q for queries in ALL_TEST_QUERIES.values() for q in queries]
+
+FILLER = ["I have been a customer for years", "this is really frustrating",
+          "I already tried restarting", "my colleague has the same problem",
+          "please let me know as soon as possible", "thanks in advance"]
+
+
+def long_message(rng: random.Random) -> str:
+    parts = [rng.choice(CORPUS)] + [rng.choice(FILLER) for _ in range(rng.randint(10, 40))]
+    rng.shuffle(parts)
+    return ". ".join(parts) + "."
+
+
+def entity_message(rng: random.Random) -> str:
+    order_id = "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(7)) + str(rng.randint(0, 9))
+    return rng.choice([
+        f"Where is my order #{order_id}?",
+        f"Track order {order_id} please, my email is user{rng.randint(1, 9999)}@example.com",
+        f"I was charged ${rng.randint(5, 500)}.99 on {rng.randint(1, 28)} March for order {order_id}",
+        f"Refund for order {order_id} placed last Tuesday at 3pm",
+    ])
+
+
+def next_message(rng: random.Random) -> str:
+    roll = rng.random()
+    if roll < 0.7:
+        return rng.choice(CORPUS)
+    if roll < 0.85:
+        return entity_message(rng)
+    return long_message(rng)
+
+
+def rss_mb() -> float:
+    """Current resident set size (falls back to peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class GCPauses:
+    """Collects stop-the-world GC pause durations via gc.callbacks."""
+
+    def __init__(self):
+        self.pauses: List[float] = []
+        self._start = None
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            self.pauses.append(time.perf_counter() - self._start)
+            self._start = None
+
+    def drain(self) -> List[float]:
+        pauses, self.pauses = self.pauses, []
+        return pauses
+
+
+class LoadGenerator:
+    def __init__(self, sessions: int = 8, think_time: float = 0.0, seed: int = 0):
+        self.sessions = sessions
+        self.think_time = think_time
+        self.seed = seed
+        self.errors = 0
+        self._latencies: List[float] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _conversation(self, idx: int):
+        rng = random.Random(self.seed * 1000 + idx)
+        while not self._stop.is_set():
+            text = next_message(rng)
+            start = time.perf_counter()
+            try:
+                handle_query(text)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._latencies.append(elapsed)
+            if self.think_time:
+                self._stop.wait(rng.expovariate(1 / self.think_time))
+
+    def _drain(self) -> List[float]:
+        with self._lock:
+            latencies, self._latencies = self._latencies, []
+        return latencies
+
+    def run(self, duration: float = 60.0, interval: float = 10.0) -> Dict[str, object]:
+        gc_pauses = GCPauses()
+        gc.callbacks.append(gc_pauses)
+        rss_start = rss_mb()
+        threads = [threading.Thread(target=self._conversation, args=(i,), daemon=True)
+                   for i in range(self.sessions)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        windows, total, all_pauses = [], 0, []
+        print(f"{'t(s)':>6} | {'req/s':>8} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | "
+              f"{'RSS MB':>7} | {'GC max ms':>9}")
+        try:
+            window_start = start
+            while time.perf_counter() - start < duration:
+                time.sleep(min(interval, max(0.0, duration - (time.perf_counter() - start))))
+                now = time.perf_counter()
+                window_len, window_start = now - window_start, now
+                lat = sorted(self._drain())
+                pauses = gc_pauses.drain()
+                all_pauses += pauses
+                total += len(lat)
+                window = {
+                    't': round(now - start, 1),
+                    'rps': round(len(lat) / window_len, 1),
+                    'p50_ms': round(percentile(lat, 50) * 1000, 3),
+                    'p95_ms': round(percentile(lat, 95) * 1000, 3),
+                    'p99_ms': round(percentile(lat, 99) * 1000, 3),
+                    'rss_mb': round(rss_mb(), 1),
+                    'gc_max_ms': round(max(pauses, default=0.0) * 1000, 3),
+                }
+                windows.append(window)
+                print(f"{window['t']:>6} | {window['rps']:>8} | {window['p50_ms']:>7} | "
+                      f"{window['p95_ms']:>7} | {window['p99_ms']:>7} | {window['rss_mb']:>7} | "
+                      f"{window['gc_max_ms']:>9}")
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join()
+            gc.callbacks.remove(gc_pauses)
+        elapsed = time.perf_counter() - start
+        rss_end = rss_mb()
+        return {
+            'sessions': self.sessions,
+            'duration_s': round(elapsed, 1),
+            'requests': total,
+            'errors': self.errors,
+            'throughput_rps': round(total / elapsed, 1),
+            'rss_start_mb': round(rss_start, 1),
+            'rss_end_mb': round(rss_end, 1),
+            'rss_growth_mb': round(rss_end - rss_start, 1),
+            'gc_pauses': len(all_pauses),
+            'gc_pause_total_ms': round(sum(all_pauses) * 1000, 1),
+            'gc_pause_max_ms': round(max(all_pauses, default=0.0) * 1000, 3),
+            'windows': windows,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Soak-test handle_query with concurrent sessions")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent conversations")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument("--interval", type=float, default=10.0, help="seconds per report window")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between messages (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the full report to this file")
+    parser.add_argument("--memprofile", metavar="PATH", help="profile allocations and write a report here")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.memprofile:
+        from memprofile import MemoryProfiler
+        profiler = MemoryProfiler(interval_s=args.interval)
+        profiler.start()
+    report = LoadGenerator(args.sessions, args.think_time, args.seed).run(args.duration, args.interval)
+    if profiler is not None:
+        print(f"Memory report written to {profiler.write_report(args.memprofile)}")
+    print(f"\nRequests: {report['requests']} ({report['throughput_rps']} req/s), errors: {report['errors']}")
+    print(f"RSS: {report['rss_start_mb']} -> {report['rss_end_mb']} MB ({report['rss_growth_mb']:+} MB)")
+    print(f"GC: {report['gc_pauses']} pauses, {report['gc_pause_total_ms']} ms total, "
+          f"max {report['gc_pause_max_ms']} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -1,10 +1,19 @@
 # logic_layer.py
+import threading
+from types import MappingProxyType
+from typing import FrozenSet, Optional
+
 from pyDatalog import pyDatalog
 
+from intents import INTENT_IDS, NO_INTENT, by_id
+
+# pyDatalog keeps its engine per thread; start from a fresh one in the importing thread
+pyDatalog.Logic()
+
 # Declare predicate and variable terms
 pyDatalog.create_terms('intent, entity, response, policy, escalate, fallback')
-pyDatalog.create_terms('I, E, Text, Confidence, Reason')
-pyDatalog.create_terms('low_confidence, force_escalation')
+pyDatalog.create_terms('I, E, Text, Confidence, Reason, Urgency')
+pyDatalog.create_terms('low_confidence, force_escalation, urgent')
 
 # --- Knowledge base: responses ---
 # Response(Text) is the answer string for a given intent; entity specialization is optional.
@@ -62,6 +71,8 @@ pyDatalog.create_terms('low_confidence, force_escalation')
 
 low_confidence(Confidence) <= (Confidence < 0.4)  # lowered threshold to 0.4
 force_escalation(I) <= policy('force_escalation_required', I)
+# Urgency (urgency.py, 0..1) escalates a message the bot could otherwise answer
+urgent(Urgency) <= (Urgency >= 0.8)
 
 # A case escalates if either low confidence OR forced escalation applies.
 escalate(I, Confidence, Reason) <= (low_confidence(Confidence)) & (Reason == 'low_confidence')
@@ -69,3 +80,84 @@ escalate(I, Confidence, Reason) <= (force_escalation(I)) & (Reason == 'policy')
 
 # Fallback when no response is defined
 fallback(I) <= ~(response(I, Text))
+
+# --- Thread access ---
+# The KB above lives in the importing thread. Other threads (e.g. the GUI main loop when the
+# backend was warmed up in a background thread) must attach to it before asking queries.
+KB = pyDatalog.Logic(True)
+_local = threading.local()
+_local.attached = True
+_engine_lock = threading.RLock()
+
+def attach():
+    """Make the knowledge base visible to the calling thread."""
+    if not getattr(_local, 'attached', False):
+        with _engine_lock:  # copying KB must not overlap with another thread's query
+            pyDatalog.Logic(KB)
+        _local.attached = True
+
+def ask(query: str):
+    """pyDatalog query that is safe to call from any thread (queries are serialized)."""
+    with _engine_lock:
+        attach()
+        return pyDatalog.ask(query)
+
+# --- Concurrent evaluation ---
+class Snapshot:
+    """Immutable, fully evaluated view of the KB that any thread can read without pyDatalog.
+
+    Facts (responses, forced-escalation policies) are materialized once, by name for the API and as
+    tuples indexed by intent ID for the pipeline. The low_confidence and urgent rules are evaluated
+    through the engine the first time a value is seen and then memoized, so steady-state reads
+    take no lock.
+    """
+
+    def __init__(self):
+        self.responses = MappingProxyType(dict(ask("response(I, Text)").answers))
+        self.forced: FrozenSet[str] = frozenset(i for (i,) in ask("force_escalation(I)").answers)
+        self.response_by_id = by_id(self.responses)
+        self.forced_by_id = by_id(dict.fromkeys(self.forced, True), False)
+        self._low_confidence = {}
+        self._urgent = {}
+
+    def is_low_confidence(self, confidence: float) -> bool:
+        hit = self._low_confidence.get(confidence)
+        if hit is None:
+            hit = bool(ask("low_confidence(%s)" % confidence))
+            self._low_confidence[confidence] = hit
+        return hit
+
+    def is_urgent(self, urgency: float) -> bool:
+        hit = self._urgent.get(urgency)
+        if hit is None:
+            hit = bool(ask("urgent(%s)" % urgency))
+            self._urgent[urgency] = hit
+        return hit
+
+    def escalate(self, intent: str, confidence: float, urgency: Optional[float] = None) -> FrozenSet[str]:
+        """Same reasons as escalate(intent, confidence, Reason), plus 'urgent' when an urgency is given."""
+        return self.escalate_id(INTENT_IDS.get(intent, NO_INTENT), confidence, urgency)
+
+    def escalate_id(self, iid: int, confidence: float, urgency: Optional[float] = None) -> FrozenSet[str]:
+        reasons = set()
+        if urgency is not None and self.is_urgent(urgency):
+            reasons.add('urgent')
+        if self.is_low_confidence(confidence):
+            reasons.add('low_confidence')
+        if iid != NO_INTENT and self.forced_by_id[iid]:
+            reasons.add('policy')
+        return frozenset(reasons)
+
+    def response(self, intent: str) -> Optional[str]:
+        return self.responses.get(intent)
+
+_snapshot = None
+
+def snapshot() -> Snapshot:
+    """Shared snapshot of the KB, built on first use."""
+    global _snapshot
+    if _snapshot is None:
+        with _engine_lock:
+            if _snapshot is None:
+                _snapshot = Snapshot()
+    return _snapshot
@@ -0,0 +1,136 @@
+# memprofile.py
+# Diagnostic memory profiler for long sessions (GUI or backend).
+# Periodically snapshots tracemalloc, Tk widget counts and live counts of suspect object types,
+# then writes a report attributing growth to the top allocation sites.
+import gc
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Object types we suspect of accumulating over a shift (Tk/CTk widgets, fonts, spaCy docs)
+TRACKED_TYPES = ('CTkFont', 'CTkFrame', 'CTkLabel', 'Frame', 'Doc', 'Span')
+
+
+def count_widgets(root) -> Counter:
+    """Count live Tk widgets under `root` by widget class."""
+    counts = Counter()
+    stack = [root]
+    while stack:
+        w = stack.pop()
+        counts[w.winfo_class()] += 1
+        stack.extend(w.winfo_children())
+    return counts
+
+
+def count_objects(type_names=TRACKED_TYPES) -> Counter:
+    """Count live Python objects whose class name is in `type_names` (walks the GC heap)."""
+    wanted = set(type_names)
+    counts = Counter()
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in wanted:
+            counts[name] += 1
+    return counts
+
+
+class MemoryProfiler:
+    def __init__(self, root=None, interval_s: float = 60.0, top: int = 15, frames: int = 5):
+        self.root = root              # Tk root to walk for widget counts (None for backend-only)
+        self.interval_s = interval_s
+        self.top = top
+        self.frames = frames
+        self.samples: List[Dict[str, object]] = []
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._latest: Optional[tracemalloc.Snapshot] = None
+        self._timer: Optional[threading.Timer] = None
+        self._after_id = None
+        self._started_at = None
+
+    # --- lifecycle ---
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._started_at = time.time()
+        self._baseline = tracemalloc.take_snapshot()
+        self.sample()
+        self._schedule()
+
+    def _schedule(self):
+        if self.root is not None:
+            # Tk is not thread-safe, so widget walks must happen on the Tk thread
+            self._after_id = self.root.after(int(self.interval_s * 1000), self._tick)
+        else:
+            self._timer = threading.Timer(self.interval_s, self._tick)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _tick(self):
+        self.sample()
+        self._schedule()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+
+    # --- sampling ---
+    def sample(self):
+        self._latest = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        sample = {
+            't': round(time.time() - self._started_at, 1),
+            'traced_mb': round(current / 2**20, 2),
+            'peak_mb': round(peak / 2**20, 2),
+            'objects': dict(count_objects()),
+        }
+        if self.root is not None:
+            widgets = count_widgets(self.root)
+            sample['widgets'] = sum(widgets.values())
+            sample['widget_classes'] = dict(widgets.most_common(8))
+        self.samples.append(sample)
+
+    def top_growth(self) -> List[tracemalloc.StatisticDiff]:
+        snapshot = self._latest.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        return snapshot.compare_to(self._baseline, 'lineno')[:self.top]
+
+    # --- reporting ---
+    def report(self) -> str:
+        self.sample()
+        first, last = self.samples[0], self.samples[-1]
+        lines = [f"Memory profile — {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                 f"Duration: {last['t']} s, {len(self.samples)} samples",
+                 f"Traced memory: {first['traced_mb']} -> {last['traced_mb']} MB (peak {last['peak_mb']} MB)",
+                 ""]
+        if 'widgets' in last:
+            lines.append(f"Tk widgets: {first['widgets']} -> {last['widgets']}")
+            for cls, n in last['widget_classes'].items():
+                lines.append(f"  {cls:<20} {n:>8}")
+            lines.append("")
+        lines.append("Tracked objects (first -> last):")
+        for name in TRACKED_TYPES:
+            lines.append(f"  {name:<20} {first['objects'].get(name, 0):>8} -> {last['objects'].get(name, 0)}")
+        lines += ["", f"Top {self.top} allocation sites by growth:"]
+        for stat in self.top_growth():
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size_diff / 1024:>+10.1f} KiB {stat.count_diff:>+8} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+        lines += ["", "Timeline:", f"  {'t(s)':>8} {'traced MB':>10} {'widgets':>8}"]
+        for s in self.samples:
+            lines.append(f"  {s['t']:>8} {s['traced_mb']:>10} {s.get('widgets', '-'):>8}")
+        return "\n".join(lines)
+
+    def write_report(self, path: str = "memory_report.txt") -> str:
+        self.stop()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.report() + "\n")
+        return path
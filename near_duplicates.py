@@ -0,0 +1,172 @@
+# near_duplicates.py
+# Near-duplicate detection for escalated messages: during an incident hundreds of customers send
+# the same complaint in slightly different words, and agents should see one cluster, not hundreds
+# of unrelated cases.
+# Each message gets a fixed-size MinHash signature (PERMS 32-bit minima over its character
+# 4-grams, computed in one NumPy pass) split into BANDS bands. Every band has a direct-mapped
+# table from band hash to the latest slot that had it. A lookup probes one entry per band and
+# compares at most BANDS signatures, so its cost does not depend on how many messages are indexed.
+# Signatures live in a ring of `window` slots: the oldest message is overwritten by the newest, and
+# table entries that still point at an overwritten slot fail the signature check, so memory is fixed
+# at construction (about 340 B per slot with the defaults) and nothing has to be deleted.
+# numpy is required here; escalation.py imports this module only when numpy is installed.
+# Usage: python near_duplicates.py --window 1000000   (lookup cost as the window fills)
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+WINDOW = 1 << 17         # messages remembered per index (ring buffer)
+PERMS = 64               # MinHash functions per signature
+BANDS = 16               # LSH bands (PERMS // BANDS rows each; pairs above ~0.5 Jaccard collide)
+THRESHOLD = 0.5          # estimated Jaccard similarity needed to join a cluster
+MAX_AGE_S = 6 * 3600.0   # older messages do not pull new ones into their cluster
+SHINGLE = 4              # characters per shingle
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+class NearDuplicateIndex:
+    def __init__(self, window: int = WINDOW, perms: int = PERMS, bands: int = BANDS,
+                 threshold: float = THRESHOLD, max_age_s: float = MAX_AGE_S, seed: int = 0,
+                 clock: Callable[[], float] = time.time):
+        if perms % bands:
+            raise ValueError("perms must be a multiple of bands")
+        self.window, self.perms, self.bands = window, perms, bands
+        self.threshold, self.max_age_s, self.clock = threshold, max_age_s, clock
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing: h(x) = (a * x + b) mod 2**64 >> 32, with odd a
+        self._a = rng.integers(1, 1 << 63, perms, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, perms, dtype=np.uint64)
+        self._mix = rng.integers(1, 1 << 63, perms // bands, dtype=np.uint64) | np.uint64(1)
+        self._table_bits = max(8, (window - 1).bit_length())
+        self._shift = np.uint64(64 - self._table_bits)
+        self._band_index = np.arange(bands)
+        # slot + 1 per band bucket (0: empty), so zero-filled pages cost nothing until used
+        self._tables = np.zeros((bands, 1 << self._table_bits), dtype=np.int32)
+        self._sigs = np.zeros((window, perms), dtype=np.uint32)
+        self._clusters = np.zeros(window, dtype=np.int64)
+        self._created = np.zeros(window, dtype=np.float64)
+        self._next = 0            # messages indexed so far; the next slot is _next % window
+        self._lock = threading.Lock()
+        self._metrics = {'lookups': 0, 'matched': 0, 'added': 0}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of the normalized text, or None when there is nothing to compare."""
+        data = np.frombuffer(normalize(text).encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        if not len(data):
+            return None
+        if len(data) < SHINGLE:
+            data = np.concatenate([data, np.zeros(SHINGLE - len(data), dtype=np.uint64)])
+        n = len(data) - SHINGLE + 1
+        shingles = np.zeros(n, dtype=np.uint64)
+        for i in range(SHINGLE):   # each 4-byte window packed into one 32-bit value
+            shingles = (shingles << np.uint64(8)) | data[i:i + n]
+        hashed = self._a[:, None] * shingles
+        hashed += self._b[:, None]
+        return (hashed.min(axis=1) >> np.uint64(32)).astype(np.uint32)   # the shift keeps the order
+
+    def buckets(self, sig: np.ndarray) -> np.ndarray:
+        """Table position of each band of `sig` (pass to match/add to compute it once)."""
+        keys = (sig.reshape(self.bands, -1).astype(np.uint64) * self._mix).sum(axis=1, dtype=np.uint64)
+        return (keys * np.uint64(0x9E3779B97F4A7C15)) >> self._shift
+
+    def match(self, sig: np.ndarray, buckets: Optional[np.ndarray] = None) -> Optional[Tuple[int, float]]:
+        """(cluster, estimated similarity) of the most similar indexed message, if close enough."""
+        if buckets is None:
+            buckets = self.buckets(sig)
+        with self._lock:
+            self._metrics['lookups'] += 1
+            slots = self._tables[self._band_index, buckets]
+            slots = slots[slots > 0] - 1   # a slot found in several bands is just compared again
+            slots = slots[self._created[slots] >= self.clock() - self.max_age_s]
+            if not len(slots):
+                return None
+            agree = np.count_nonzero(self._sigs[slots] == sig, axis=1)
+            best = int(agree.argmax())
+            similarity = agree[best] / self.perms
+            if similarity < self.threshold:
+                return None
+            self._metrics['matched'] += 1
+            return int(self._clusters[slots[best]]), float(similarity)
+
+    def closest(self, sig: np.ndarray, others: List[np.ndarray]) -> Optional[Tuple[int, float]]:
+        """(position, estimated similarity) of the most similar of `others`, if close enough."""
+        agree = np.count_nonzero(np.stack(others) == sig, axis=1)
+        best = int(agree.argmax())
+        similarity = agree[best] / self.perms
+        return (best, float(similarity)) if similarity >= self.threshold else None
+
+    def add(self, sig: np.ndarray, cluster: int, buckets: Optional[np.ndarray] = None,
+            created: Optional[float] = None):
+        """Index a message under `cluster`, overwriting the oldest one once the window is full.
+        `created` (default: now) is when the message arrived, on the index clock."""
+        if buckets is None:
+            buckets = self.buckets(sig)
+        with self._lock:
+            slot = self._next % self.window
+            self._sigs[slot] = sig
+            self._clusters[slot] = cluster
+            self._created[slot] = self.clock() if created is None else created
+            self._tables[self._band_index, buckets] = slot + 1
+            self._next += 1
+            self._metrics['added'] += 1
+
+    def assign(self, text: str, key: int) -> Optional[int]:
+        """Cluster for `text`: an existing cluster's key, or `key` when it starts a new one.
+        None for text with nothing to compare (it is not indexed)."""
+        sig = self.signature(text)
+        if sig is None:
+            return None
+        buckets = self.buckets(sig)
+        found = self.match(sig, buckets)
+        cluster = found[0] if found else key
+        self.add(sig, cluster, buckets)
+        return cluster
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            m = dict(self._metrics, indexed=min(self._next, self.window), window=self.window)
+        m['match_rate'] = m['matched'] / m['lookups'] if m['lookups'] else 0.0
+        m['memory_mb'] = round((self._tables.nbytes + self._sigs.nbytes + self._clusters.nbytes
+                                + self._created.nbytes) / 2 ** 20, 1)
+        return m
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    parser = argparse.ArgumentParser(description="Near-duplicate index: lookup cost as the window fills")
+    parser.add_argument("--window", type=int, default=1_000_000)
+    parser.add_argument("--checkpoints", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    words = ["order", "refund", "charged", "app", "login", "crash", "payment", "account", "delivery", "card",
+             "password", "error", "screen", "subscription", "invoice", "late", "missing", "broken", "again", "why"]
+    incident = "the app crashes every time i try to log in since the update"
+
+    def message(i: int) -> str:
+        if i % 10 == 0:   # one in ten is the incident, reworded a little
+            return incident.replace("every time", rng.choice(["every time", "whenever", "each time"])) + "!" * (i % 3)
+        return f"{' '.join(rng.choice(words) for _ in range(8))} #{i}"
+
+    index = NearDuplicateIndex(window=args.window)
+    step = args.window // args.checkpoints
+    print(f"{'indexed':>10} {'us/message':>11} {'incident clusters':>18} {'memory MB':>10}")
+    incident_clusters = set()
+    for checkpoint in range(args.checkpoints):
+        start = time.perf_counter()
+        for i in range(checkpoint * step, (checkpoint + 1) * step):
+            cluster = index.assign(message(i), i)
+            if i % 10 == 0:
+                incident_clusters.add(cluster)
+        elapsed = time.perf_counter() - start
+        print(f"{(checkpoint + 1) * step:>10,} {elapsed / step * 1e6:>11.1f} {len(incident_clusters):>18} "
+              f"{index.stats()['memory_mb']:>10}")
@@ -0,0 +1,295 @@
+# orders.py
+# Order-status lookups for order_status messages that carry an order ID.
+# Orders live in a local SQLite store (a stand-in for the order system; `python orders.py seed`
+# fills one). Lookups borrow a read-only connection from a fixed pool, run one of two fixed SQL
+# statements (sqlite3 keeps them prepared per connection; batch lookups pad their IN list to
+# BATCH_CHUNK so one statement serves every batch) and keep results, including "not found", in a
+# small TTL cache, since the same customer tends to ask again within minutes.
+# stats() reports per-lookup latency and pool saturation (waits, timeouts, peak connections in use).
+# Usage:
+#   python orders.py seed --orders 100000
+#   python orders.py bench --threads 8
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+ORDERS_DB = "orders.db"
+POOL_SIZE = 4            # read connections
+POOL_TIMEOUT_S = 0.05    # wait for a free connection before giving up (the reply falls back to generic text)
+TTL_S = 30.0             # how long a looked-up status is reused
+CACHE_SIZE = 2048        # order IDs kept in the TTL cache
+BATCH_CHUNK = 32         # IDs per batch statement
+LATENCY_WINDOW = 2000    # recent lookup latencies kept for percentiles
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    carrier TEXT,
+    eta TEXT,
+    updated REAL NOT NULL
+);
+"""
+_COLUMNS = ('order_id', 'status', 'carrier', 'eta', 'updated')
+_LOOKUP = "SELECT order_id, status, carrier, eta, updated FROM orders WHERE order_id = ?"
+_LOOKUP_MANY = ("SELECT order_id, status, carrier, eta, updated FROM orders WHERE order_id IN (%s)"
+                % ", ".join("?" * BATCH_CHUNK))
+
+STATUS_TEXT = {
+    'processing': "is being prepared for shipment",
+    'shipped': "has shipped",
+    'out_for_delivery': "is out for delivery",
+    'delivered': "was delivered",
+    'delayed': "is delayed",
+    'cancelled': "was cancelled",
+}
+
+
+def normalize_id(order_id: str) -> str:
+    return order_id.strip().upper()
+
+
+def format_status(order_id: str, order: Optional[Dict[str, Any]]) -> str:
+    """Reply text for a looked-up order."""
+    if order is None:
+        return (f"I couldn't find order {order_id}. Please double-check the ID in your confirmation email, "
+                "or track it in My Orders -> Track.")
+    text = f"Order {order['order_id']} {STATUS_TEXT.get(order['status'], order['status'])}"
+    if order.get('carrier') and order['status'] in ('shipped', 'out_for_delivery', 'delayed'):
+        text += f" with {order['carrier']}"
+    if order.get('eta') and order['status'] != 'delivered':
+        text += f", expected {order['eta']}"
+    return text + "."
+
+
+class ConnectionPool:
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT_S):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        for _ in range(size):
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False,
+                                   cached_statements=16)
+            self._idle.put(conn)
+        self._lock = threading.Lock()
+        self._metrics = {'acquired': 0, 'waits': 0, 'timeouts': 0, 'in_use': 0, 'max_in_use': 0,
+                         'wait_ms': 0.0}
+
+    def acquire(self) -> Optional[sqlite3.Connection]:
+        """A free connection, waiting up to `timeout`; None if the pool stayed saturated."""
+        try:
+            conn = self._idle.get_nowait()
+            waited = 0.0
+        except queue.Empty:
+            start = time.perf_counter()
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._metrics['timeouts'] += 1
+                return None
+            waited = time.perf_counter() - start
+        with self._lock:
+            m = self._metrics
+            m['acquired'] += 1
+            m['waits'] += waited > 0
+            m['wait_ms'] += waited * 1000
+            m['in_use'] += 1
+            m['max_in_use'] = max(m['max_in_use'], m['in_use'])
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._metrics['in_use'] -= 1
+        self._idle.put(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            m = dict(self._metrics, size=self.size)
+        m['saturation'] = (m['waits'] + m['timeouts']) / max(m['acquired'] + m['timeouts'], 1)
+        return m
+
+    def close(self):
+        for _ in range(self.size):
+            self._idle.get().close()
+
+
+class OrderLookup:
+    def __init__(self, path: str = ORDERS_DB, pool_size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT_S,
+                 ttl_s: float = TTL_S, cache_size: int = CACHE_SIZE, clock: Callable[[], float] = time.monotonic):
+        self.pool = ConnectionPool(path, pool_size, timeout)
+        self.ttl_s = ttl_s
+        self.cache_size = cache_size
+        self.clock = clock
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()   # id -> (expires, order or None)
+        self._lock = threading.Lock()
+        self._latencies: List[float] = []
+        self._metrics = {'lookups': 0, 'cache_hits': 0, 'queries': 0, 'not_found': 0, 'unavailable': 0}
+
+    _MISSING = object()
+
+    def _cached(self, order_id: str, now: float):
+        entry = self._cache.get(order_id)
+        if entry is None or entry[0] <= now:
+            return self._MISSING
+        self._cache.move_to_end(order_id)
+        return entry[1]
+
+    def _remember(self, results: Dict[str, Optional[Dict[str, Any]]], now: float):
+        with self._lock:
+            for order_id, order in results.items():
+                self._cache[order_id] = (now + self.ttl_s, order)
+                self._cache.move_to_end(order_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self._metrics['not_found'] += sum(order is None for order in results.values())
+
+    def lookup(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """The order (a dict of _COLUMNS) or None if there is no such order.
+
+        Raises TimeoutError when every connection stayed busy for the pool timeout."""
+        return self.lookup_many([order_id])[normalize_id(order_id)]
+
+    def lookup_many(self, order_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Look up several orders with one statement per BATCH_CHUNK IDs; keys are normalized IDs."""
+        start = time.perf_counter()
+        now = self.clock()
+        wanted = list(dict.fromkeys(normalize_id(i) for i in order_ids))
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing = []
+        with self._lock:
+            for order_id in wanted:
+                order = self._cached(order_id, now)
+                if order is self._MISSING:
+                    missing.append(order_id)
+                else:
+                    results[order_id] = order
+            self._metrics['lookups'] += len(wanted)
+            self._metrics['cache_hits'] += len(wanted) - len(missing)
+        if missing:
+            conn = self.pool.acquire()
+            if conn is None:
+                with self._lock:
+                    self._metrics['unavailable'] += len(missing)
+                raise TimeoutError("order store busy")
+            try:
+                found = {}
+                if len(missing) == 1:
+                    row = conn.execute(_LOOKUP, missing).fetchone()
+                    if row:
+                        found[row[0]] = dict(zip(_COLUMNS, row))
+                    queries = 1
+                else:
+                    queries = 0
+                    for i in range(0, len(missing), BATCH_CHUNK):
+                        chunk = missing[i:i + BATCH_CHUNK]
+                        chunk += [chunk[-1]] * (BATCH_CHUNK - len(chunk))   # same arity, same prepared statement
+                        for row in conn.execute(_LOOKUP_MANY, chunk):
+                            found[row[0]] = dict(zip(_COLUMNS, row))
+                        queries += 1
+            finally:
+                self.pool.release(conn)
+            fetched = {order_id: found.get(order_id) for order_id in missing}
+            self._remember(fetched, now)
+            results.update(fetched)
+            with self._lock:
+                self._metrics['queries'] += queries
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._latencies.append(elapsed)
+            if len(self._latencies) > LATENCY_WINDOW:
+                del self._latencies[:LATENCY_WINDOW // 2]
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            m = dict(self._metrics, cached=len(self._cache))
+            lat = sorted(self._latencies)
+        m['cache_hit_rate'] = m['cache_hits'] / m['lookups'] if m['lookups'] else 0.0
+        if lat:
+            m['p50_ms'] = round(lat[len(lat) // 2] * 1000, 3)
+            m['p99_ms'] = round(lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000, 3)
+        m['pool'] = self.pool.stats()
+        return m
+
+    def close(self):
+        self.pool.close()
+
+
+def seed(path: str = ORDERS_DB, orders: int = 10000, rng_seed: int = 0,
+         extra_ids: Iterable[str] = ("ABC-12345",)) -> List[str]:
+    """Create (or refill) a stand-in order store with random orders; returns their IDs."""
+    rng = random.Random(rng_seed)
+    ids = list(dict.fromkeys(list(extra_ids) + [
+        "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(7)) + str(rng.randint(0, 9))
+        for _ in range(orders)]))
+    carriers = ["UPS", "FedEx", "DHL", "USPS"]
+    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?)", [
+            (order_id, rng.choice(list(STATUS_TEXT)), rng.choice(carriers),
+             f"{rng.choice(months)} {rng.randint(1, 28)}", time.time()) for order_id in ids])
+    conn.close()
+    return ids
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Local order-status store")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("seed")
+    p.add_argument("--db", default=ORDERS_DB)
+    p.add_argument("--orders", type=int, default=10000)
+    p = sub.add_parser("bench")
+    p.add_argument("--db", default=ORDERS_DB)
+    p.add_argument("--threads", type=int, default=8)
+    p.add_argument("--lookups", type=int, default=20000, help="per thread")
+    p.add_argument("--pool", type=int, default=POOL_SIZE)
+    args = parser.parse_args()
+
+    if args.cmd == "seed":
+        print(f"{len(seed(args.db, args.orders))} orders in {args.db}")
+    else:
+        ids = [row[0] for row in sqlite3.connect(args.db).execute("SELECT order_id FROM orders")]
+        for label, ttl in (("no cache", 0.0), (f"TTL cache {TTL_S:.0f} s", TTL_S)):
+            orders = OrderLookup(args.db, pool_size=args.pool, ttl_s=ttl)
+            hot = random.Random(1).sample(ids, min(500, len(ids)))   # repeat askers
+
+            def work(seed_: int):
+                rng = random.Random(seed_)
+                for _ in range(args.lookups):
+                    try:
+                        orders.lookup(rng.choice(hot) if rng.random() < 0.8 else rng.choice(ids))
+                    except TimeoutError:
+                        pass
+
+            threads = [threading.Thread(target=work, args=(i,)) for i in range(args.threads)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            s = orders.stats()
+            print(f"{label:<16} {args.threads * args.lookups / elapsed:>9,.0f} lookups/s  p50 {s['p50_ms']:.3f} ms  "
+                  f"p99 {s['p99_ms']:.3f} ms  hit rate {s['cache_hit_rate']:.0%}  "
+                  f"pool waits {s['pool']['waits']} timeouts {s['pool']['timeouts']} "
+                  f"saturation {s['pool']['saturation']:.1%}")
+            orders.close()
+        orders = OrderLookup(args.db, pool_size=args.pool, ttl_s=0.0)
+        batch = random.Random(2).sample(ids, min(256, len(ids)))
+        for label, run in (("one by one", lambda: [orders.lookup(i) for i in batch]),
+                           ("lookup_many", lambda: orders.lookup_many(batch))):
+            start = time.perf_counter()
+            run()
+            print(f"{label:<16} {len(batch)} orders in {(time.perf_counter() - start) * 1000:.2f} ms")
+        orders.close()
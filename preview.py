@@ -0,0 +1,224 @@
+# preview.py
+# As-you-type intent preview for the input bar ("looks like: Refund status").
+# IncrementalMatcher keeps the pattern hits of the part of the message that can no longer change
+# (everything but the last few words) and, on each update, only scans the newly settled words and
+# the tail, so the cost per keystroke does not grow with the message length. Patterns with an open
+# gap (\bwhere.*order\b) keep a partial match instead: once the part before the gap has matched,
+# later words only need to complete the part after it. MessagePreview ranks the intents of a
+# message's sentences/clauses the way sending does (segments.py): finished segments are classified
+# once, and only the one being typed goes through the IncrementalMatcher. PreviewWorker runs it on a
+# background thread and keeps only the newest request, so a burst of keystrokes costs one scan.
+# The preview is a hint: it skips typo correction and entities; sending still runs the full pipeline.
+# Usage (keystroke cost on a long message): python preview.py --chars 2000
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from intents import MAX_SCORE, N_INTENTS, intent_id, intent_name
+from nlu import TABLE, canonicalize
+from segments import SegmentAnalyzer
+
+TAIL_WORDS = 3       # trailing words rescanned on every update (the word being typed still changes)
+CONTEXT_WORDS = 4    # settled words kept as context so multi-word patterns match across the seam
+MIN_CONFIDENCE = 0.2 # same threshold as match_intent
+
+_WORD_RE = re.compile(r"\S+")
+# bypass the lru_cache: keystroke prefixes would only evict real queries from it
+_canonicalize = canonicalize.__wrapped__
+
+
+def _gap_rows(rows) -> Dict[int, Tuple[Callable, Callable]]:
+    """Rows whose pattern has an open gap (`head.*tail`): their two ends can be any distance
+    apart, so they are tracked as partial matches instead of within the context window."""
+    gaps = {}
+    for i, (_, _, search) in enumerate(rows):
+        source = search.__self__.pattern
+        if ".*" in source:
+            head, tail = source.split(".*", 1)
+            gaps[i] = (re.compile(head).search, re.compile(tail).search)
+    return gaps
+
+
+class IncrementalMatcher:
+    def __init__(self):
+        self._rows = TABLE.rows   # (intent ID, weight, search); the intent-name bonus is a row too
+        self._gaps = _gap_rows(self._rows)
+        self.reset()
+
+    def reset(self):
+        self._settled = ""                # raw prefix whose hits are final
+        self._canon = ""                  # canonical text of that prefix
+        self._context = 0                 # offset in _canon of its last CONTEXT_WORDS words
+        self._hits: Set[int] = set()      # pattern indexes matched in it
+        self._open: Dict[int, int] = {}   # gap row -> offset in _canon where its tail may start
+
+    def _scan(self, text: str, pos: int, skip: Set[int]) -> Set[int]:
+        return {i for i, (_, _, search) in enumerate(self._rows) if i not in skip and search(text, pos)}
+
+    def _settle(self, chunk: str):
+        """Append newly settled canonical words and record what they complete or open."""
+        start = self._context
+        self._canon = f"{self._canon} {chunk}" if self._canon else chunk
+        self._hits |= self._scan(self._canon, start, self._hits)
+        for i, (head, tail) in self._gaps.items():
+            if i in self._hits:
+                continue
+            at = self._open.get(i)
+            if at is None:
+                m = head(self._canon, start)
+                if m is None:
+                    continue
+                at = self._open[i] = m.end()
+            if tail(self._canon, max(at, start)):
+                self._hits.add(i)
+        context = len(self._canon)
+        for _ in range(CONTEXT_WORDS):
+            context = self._canon.rfind(" ", 0, context)
+            if context < 0:
+                break
+        self._context = context + 1
+
+    def update(self, text: str) -> Tuple[Optional[str], float]:
+        """Intent and confidence for `text`, reusing the work done for the previous prefix."""
+        if not text.startswith(self._settled):
+            self.reset()   # an edit before the settled point: start over
+        rest = text[len(self._settled):]
+        words = list(_WORD_RE.finditer(rest))
+        split = words[-TAIL_WORDS].start() if len(words) > TAIL_WORDS else 0
+        if split:
+            chunk = _canonicalize(rest[:split])
+            if chunk:
+                self._settle(chunk)
+            self._settled = text[:len(self._settled) + split]
+        window = " ".join(part for part in (self._canon[self._context:], _canonicalize(rest[split:])) if part)
+        hits = self._hits | self._scan(window, 0, self._hits)
+        for i, at in self._open.items():   # a gap opened earlier, closed by the words being typed
+            if i not in hits and self._gaps[i][1](window, max(0, at - self._context)):
+                hits.add(i)
+
+        scores = [0.0] * N_INTENTS
+        for i in sorted(hits):   # row order, so the sums match TABLE.score()
+            iid, weight, _ = self._rows[i]
+            scores[iid] = min(scores[iid] + weight, MAX_SCORE)
+        best, score = TABLE.best(scores)
+        if score < MIN_CONFIDENCE:
+            return None, 0.0
+        return intent_name(best), score
+
+
+class MessagePreview:
+    """Intent of a message being typed, ranked over its segments like segments.analyze()."""
+
+    def __init__(self):
+        self.matcher = IncrementalMatcher()   # the segment being typed
+        self.reset()
+
+    def reset(self):
+        self._fed = ""
+        self._analyzer = SegmentAnalyzer(fuzzy=False)   # the finished segments
+        self.matcher.reset()
+
+    def update(self, text: str) -> Tuple[Optional[str], float]:
+        if not text.startswith(self._fed):
+            self.reset()   # an edit in a finished segment: classify them again
+        self._analyzer.feed(text[len(self._fed):])
+        self._fed = text
+        intent, confidence = self.matcher.update(self._analyzer.segmenter.pending)
+        best, score = self._analyzer.with_segment(intent_id(intent), confidence).best()
+        return intent_name(best), score
+
+
+def describe(intent: Optional[str], confidence: float) -> Dict[str, Any]:
+    """Label and suggested answer shown under the input box."""
+    import logic_layer
+    if intent is None:
+        return {'intent': None, 'confidence': 0.0, 'label': None, 'suggestion': None}
+    snap = logic_layer.snapshot()
+    specialist = intent in snap.forced
+    return {'intent': intent, 'confidence': confidence,
+            'label': intent.replace('_', ' ').capitalize(),
+            'suggestion': "A specialist will pick this up." if specialist else snap.response(intent)}
+
+
+class PreviewWorker:
+    def __init__(self):
+        self.preview = MessagePreview()
+        self._cond = threading.Condition()
+        self._text: Optional[str] = None   # newest text not yet scanned
+        self._submitted = 0
+        self._finished = 0
+        self._result: Optional[Dict[str, Any]] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="intent-preview", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str):
+        """Request a preview of `text`; an older request still waiting is dropped."""
+        with self._cond:
+            self._text = text
+            self._submitted += 1
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._text is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                text, generation = self._text, self._submitted
+                self._text = None
+            result = describe(*self.preview.update(text))
+            with self._cond:
+                self._finished = generation
+                if generation == self._submitted:   # not already superseded
+                    self._result = result
+
+    @property
+    def pending(self) -> bool:
+        with self._cond:
+            return self._finished < self._submitted
+
+    def poll(self) -> Optional[Dict[str, Any]]:
+        """The newest finished preview, once; None if nothing new."""
+        with self._cond:
+            result, self._result = self._result, None
+            return result
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    # Keystroke cost: incremental update vs. re-running the segment analysis on the whole input
+    import argparse
+    import random
+    import time
+    from loadgen import long_message
+    from segments import analyze
+    parser = argparse.ArgumentParser(description="As-you-type preview cost per keystroke")
+    parser.add_argument("--chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    text = ""
+    while len(text) < args.chars:
+        text += long_message(rng) + " "
+    text = text[:args.chars]
+
+    def timings(fn) -> List[float]:
+        out = []
+        for n in range(1, len(text) + 1):
+            start = time.perf_counter()
+            fn(text[:n])
+            out.append((time.perf_counter() - start) * 1000)
+        return sorted(out)
+
+    preview = MessagePreview()
+    for label, fn in (("incremental", preview.update), ("full analyze", lambda t: analyze(t, fuzzy=False).best())):
+        t = timings(fn)
+        print(f"{label:<18} p50 {t[len(t) // 2]:6.3f} ms  p99 {t[int(len(t) * 0.99)]:6.3f} ms  "
+              f"max {t[-1]:6.3f} ms  (frame budget at 60 fps: 16.7 ms)")
@@ -0,0 +1,178 @@
+# replay.py
+# Decision-diff replay: which recorded messages would get a different answer after a change to
+# INTENT_PATTERNS, the KB facts or anything else in the pipeline?
+# Two versions of the code (directories, or git revisions extracted with `git archive`) each get
+# their own pool of worker processes, started fresh with that version first on sys.path, so both
+# run side by side without sharing a module. The corpus (decision logs or plain text, one message
+# per line) is streamed through both in batches, with a bounded number of batches in flight, and
+# every message whose intent, confidence, escalation or response changed is written out as one
+# JSON line as soon as both answers are in. Memory stays flat however long the corpus is.
+# Usage:
+#   python replay.py HEAD . logs/decisions-*.jsonl --out diff.jsonl
+#   python replay.py ../chatbot-main ../chatbot-branch messages.txt --workers 8
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Tuple
+
+BATCH = 200          # messages per task
+IN_FLIGHT = 4        # batches queued per worker (bounds memory)
+MIN_SHIFT = 0.05     # smaller confidence changes are not reported on their own
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+FIELDS = ('intent', 'confidence', 'escalation', 'response')
+
+
+# --- versions ---
+def checkout(spec: str, workdir: str) -> str:
+    """Directory holding version `spec`: the directory itself, or a git revision of this repo."""
+    if os.path.isdir(spec):
+        return os.path.abspath(spec)
+    target = os.path.join(workdir, spec.replace("/", "_"))
+    os.makedirs(target)
+    archive = subprocess.run(["git", "-C", ROOT, "archive", spec], check=True, capture_output=True).stdout
+    subprocess.run(["tar", "-x", "-C", target], input=archive, check=True)
+    return target
+
+
+def _init_worker(version_dir: str):
+    # this interpreter has imported nothing from the pipeline yet: point it at one version only
+    sys.path[:] = [version_dir] + [p for p in sys.path if os.path.abspath(p or ".") != ROOT]
+    os.chdir(version_dir)   # relative paths in the version (langpacks, defaults) resolve there
+
+
+def _decide_batch(texts: List[str]) -> List[Tuple[Any, ...]]:
+    import chatbot
+    out = []
+    for text in texts:
+        d = chatbot.process(text)
+        out.append(tuple(d.get(field) for field in FIELDS))
+    return out
+
+
+# --- corpus ---
+def read_corpus(paths: Iterable[str]) -> Iterator[str]:
+    """Messages from decision logs (*.jsonl, the 'input' field) or text files (one per line)."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if path.endswith(".jsonl"):
+                    try:
+                        yield json.loads(line)['input']
+                    except (ValueError, KeyError):
+                        continue   # a line cut short by a crash
+                elif line.strip():
+                    yield line.rstrip("\n")
+
+
+def _batches(texts: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --- diff ---
+def diff_decisions(before: Tuple[Any, ...], after: Tuple[Any, ...], min_shift: float = MIN_SHIFT) -> List[str]:
+    """Kinds of change between two (intent, confidence, escalation, response) tuples."""
+    (intent_a, conf_a, esc_a, resp_a), (intent_b, conf_b, esc_b, resp_b) = before, after
+    changes = []
+    if intent_a != intent_b:
+        changes.append('intent')
+    if abs((conf_b or 0.0) - (conf_a or 0.0)) >= min_shift:
+        changes.append('confidence')
+    if esc_a is None and esc_b is not None:
+        changes.append('escalated')
+    elif esc_a is not None and esc_b is None:
+        changes.append('de-escalated')
+    elif esc_a != esc_b:
+        changes.append('escalation_reason')
+    if resp_a != resp_b:
+        changes.append('response')
+    return changes
+
+
+def replay(base: str, candidate: str, texts: Iterable[str], out: TextIO, workers: int = 2,
+           batch: int = BATCH, min_shift: float = MIN_SHIFT) -> Dict[str, Any]:
+    """Run `texts` through both version directories; write one JSON line per changed message and
+    return the summary."""
+    ctx = multiprocessing.get_context("spawn")
+    pools = [ctx.Pool(workers, _init_worker, (version,)) for version in (base, candidate)]
+    pending: deque = deque()
+    summary: Dict[str, Any] = {'messages': 0, 'changed': 0, 'changes': Counter(), 'transitions': Counter()}
+
+    def drain_one():
+        (offset, chunk), results = pending.popleft()
+        for index, (text, a, b) in enumerate(zip(chunk, results[0].get(), results[1].get())):
+            summary['messages'] += 1
+            changes = diff_decisions(a, b, min_shift)
+            if not changes:
+                continue
+            summary['changed'] += 1
+            summary['changes'].update(changes)
+            if 'intent' in changes:
+                summary['transitions'][f"{a[0]} -> {b[0]}"] += 1
+            out.write(json.dumps({'n': offset + index, 'text': text, 'changes': changes,
+                                  'before': dict(zip(FIELDS, a)), 'after': dict(zip(FIELDS, b))},
+                                 ensure_ascii=False) + "\n")
+
+    try:
+        offset = 0
+        for chunk in _batches(texts, batch):
+            pending.append(((offset, chunk), [pool.apply_async(_decide_batch, (chunk,)) for pool in pools]))
+            offset += len(chunk)
+            if len(pending) >= workers * IN_FLIGHT:
+                drain_one()
+        while pending:
+            drain_one()
+    finally:
+        for pool in pools:
+            pool.terminate()
+            pool.join()
+    summary['changes'] = dict(summary['changes'])
+    summary['transitions'] = dict(summary['transitions'].most_common(20))
+    return summary
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    lines = [f"{summary['changed']:,} of {summary['messages']:,} messages changed"]
+    lines += [f"  {kind:<18} {count:>9,}" for kind, count in sorted(summary['changes'].items())]
+    if summary['transitions']:
+        lines.append("  top intent changes:")
+        lines += [f"    {count:>7,}  {t}" for t, count in summary['transitions'].items()]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Replay a corpus through two versions and diff the decisions")
+    parser.add_argument("base", help="directory or git revision")
+    parser.add_argument("candidate", help="directory or git revision")
+    parser.add_argument("corpus", nargs="+", help="decision logs (*.jsonl) or text files, one message per line")
+    parser.add_argument("--out", help="diff file (JSON lines); default stdout")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="per version")
+    parser.add_argument("--batch", type=int, default=BATCH)
+    parser.add_argument("--min-shift", type=float, default=MIN_SHIFT, help="confidence change worth reporting")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    try:
+        base, candidate = checkout(args.base, workdir), checkout(args.candidate, workdir)
+        out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+        try:
+            summary = replay(base, candidate, read_corpus(args.corpus), out, args.workers, args.batch, args.min_shift)
+        finally:
+            if args.out:
+                out.close()
+        print(format_summary(summary), file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
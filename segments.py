@@ -0,0 +1,172 @@
+# segments.py
+# Multi-intent analysis of long messages ("the app keeps closing, also I want my money back").
+# Segmenter splits text into sentences/clauses as it arrives (sentence punctuation, line breaks,
+# ", also"/", but"-style clause joins); each finished segment is classified on its own with
+# nlu.match_intent_id, so the work is one short match per segment instead of one match over the
+# whole text. SegmentAnalyzer ranks the intents found (best segment confidence, then how many
+# segments asked for it, then first mention) and stops at the first segment whose intent is under
+# a force_escalation policy: the message escalates whatever the rest says.
+# Usage: python segments.py "The app keeps freezing. Also, I want to dispute a charge"
+import copy
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import logic_layer
+from intents import N_INTENTS, NO_INTENT, ScoreTable, intent_name
+from nlu import match_intent_id
+
+# whitespace after . ! ? ; (not "19.99"), line breaks, a comma that starts a new clause and
+# "and I ..."/"and also ..."
+_BOUNDARY_RE = re.compile(r"(?<=[.!?;])\s+|\s*\n\s*|,\s*(?=(?:and|also|plus|but|however|additionally)\b)"
+                          r"|\s+and\s+(?=(?:i|also)\b)", re.IGNORECASE)
+
+
+class Segmenter:
+    """Incremental splitter: feed() text as it arrives, finish() at the end."""
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> List[str]:
+        """Segments completed by `chunk`. A boundary at the very end is held back until more text
+        (or finish()) shows where it ends."""
+        self._buffer += chunk
+        out, start = [], 0
+        for m in _BOUNDARY_RE.finditer(self._buffer):
+            if m.end() == len(self._buffer):
+                break
+            segment = self._buffer[start:m.start()].strip()
+            if segment:
+                out.append(segment)
+            start = m.end()
+        self._buffer = self._buffer[start:]
+        return out
+
+    def finish(self) -> List[str]:
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+    @property
+    def pending(self) -> str:
+        """Text of the segment not finished yet."""
+        return self._buffer
+
+
+def segments(text: str) -> List[str]:
+    segmenter = Segmenter()
+    return segmenter.feed(text) + segmenter.finish()
+
+
+class SegmentAnalyzer:
+    def __init__(self, fuzzy: bool = True, table: Optional[ScoreTable] = None, early_stop: bool = True):
+        self.fuzzy = fuzzy
+        self.table = table
+        self.early_stop = early_stop
+        self.segmenter = Segmenter()
+        self.segments = 0
+        self.forced = NO_INTENT       # intent of the first segment under a forced policy
+        self._confidence = [0.0] * N_INTENTS   # best segment confidence per intent ID
+        self._count = [0] * N_INTENTS          # segments classified as each intent
+        self._seen: List[int] = []             # intent IDs in order of first mention
+
+    @property
+    def done(self) -> bool:
+        return self.early_stop and self.forced != NO_INTENT
+
+    def add(self, segment: str) -> bool:
+        """Classify one segment; True once analysis can stop."""
+        if self.done:
+            return True
+        self.segments += 1
+        self._record(*match_intent_id(segment, self.fuzzy, self.table))
+        return self.done
+
+    def _record(self, iid: int, confidence: float):
+        if iid == NO_INTENT:
+            return
+        if not self._count[iid]:
+            self._seen.append(iid)
+        self._count[iid] += 1
+        if confidence > self._confidence[iid]:
+            self._confidence[iid] = confidence
+        if self.forced == NO_INTENT and logic_layer.snapshot().forced_by_id[iid]:
+            self.forced = iid
+
+    def with_segment(self, iid: int, confidence: float) -> "SegmentAnalyzer":
+        """A copy that also counts one more segment, already classified (the unfinished segment of
+        an as-you-type preview); this analyzer is left as it was."""
+        other = copy.copy(self)
+        other._confidence, other._count, other._seen = list(self._confidence), list(self._count), list(self._seen)
+        if not other.done:
+            other.segments += 1
+            other._record(iid, confidence)
+        return other
+
+    def feed(self, chunk: str) -> bool:
+        """Analyze the segments completed by `chunk`; True once analysis can stop."""
+        for segment in self.segmenter.feed(chunk):
+            if self.add(segment):
+                return True
+        return self.done
+
+    def finish(self) -> "SegmentAnalyzer":
+        if not self.done:
+            for segment in self.segmenter.finish():
+                self.add(segment)
+        return self
+
+    def ranked(self) -> List[Tuple[int, float]]:
+        """(intent ID, confidence), best first; a forced-policy intent always comes first."""
+        seen, conf, count = self._seen, self._confidence, self._count
+        order = sorted(range(len(seen)),
+                       key=lambda k: (seen[k] != self.forced, -conf[seen[k]], -count[seen[k]], k))
+        return [(seen[k], conf[seen[k]]) for k in order]
+
+    def best(self) -> Tuple[int, float]:
+        ranked = self.ranked()
+        return ranked[0] if ranked else (NO_INTENT, 0.0)
+
+    def result(self) -> Dict[str, Any]:
+        iid, confidence = self.best()
+        return {'intent': intent_name(iid), 'confidence': confidence,
+                'intents': [[intent_name(i), c] for i, c in self.ranked()],
+                'segments': self.segments, 'forced': self.forced != NO_INTENT,
+                'stopped_early': self.done}
+
+
+def analyze(text: str, **options) -> SegmentAnalyzer:
+    """Segment and classify a complete message (options are passed to SegmentAnalyzer)."""
+    analyzer = SegmentAnalyzer(**options)
+    analyzer.feed(text)
+    return analyzer.finish()
+
+
+def analyze_stream(chunks: Iterable[str], **options) -> SegmentAnalyzer:
+    """Like analyze() for text arriving in pieces; stops reading once analysis is decided."""
+    analyzer = SegmentAnalyzer(**options)
+    for chunk in chunks:
+        if analyzer.feed(chunk):
+            return analyzer
+    return analyzer.finish()
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from loadgen import long_message
+    import random
+    samples = sys.argv[1:] or [
+        "the app keeps closing, also I was double charged and I want my money back",
+        "Hi. I have been a customer for years. Where is my order? Also, how much is the premium plan?",
+        "The app keeps freezing on my phone. I want to cancel my subscription. And I need an invoice.",
+    ]
+    for s in samples:
+        print(s)
+        print("  ", analyze(s).result())
+    rng = random.Random(0)
+    texts = [long_message(rng) for _ in range(300)]
+    for label, options in (("segments", {}), ("segments, no early stop", {'early_stop': False})):
+        start = time.perf_counter()
+        scanned = sum(analyze(t, **options).segments for t in texts)
+        print(f"{label:<24} {(time.perf_counter() - start) / len(texts) * 1e3:6.2f} ms/message, "
+              f"{scanned / len(texts):.1f} segments classified")
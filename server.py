@@ -0,0 +1,452 @@
+# server.py
+# Pre-fork serving mode (POSIX only).
+# The master imports and fully warms nlu (patterns, entity backend) and logic_layer (KB + snapshot),
+# pre-caches answers for quick replies and top historical queries (warmup.py), freezes the GC heap
+# so refcount-free pages stay shared, then forks N workers that share those pages
+# copy-on-write and accept() on one listening socket. Workers are recycled after --max-requests;
+# SIGHUP rolls all workers gracefully, SIGTERM/SIGINT shuts down after in-flight requests finish.
+# Each worker runs admission control (admission.py): past its in-flight limit requests are degraded
+# to the regex-only path or answered with a canned "high volume" reply instead of queueing.
+# Decisions are cached in one memory-mapped table shared by all workers (shared_cache.py), created
+# by the master before warm-up, so a query answered by one worker is a hit in every other one and
+# the cache is held once per host; its hit rate and memory are reported host-wide by `status`.
+# Each worker opens its own connection pool to the order store (orders.py) after the fork, when the
+# store exists, and answers order_status messages that name an order with its live status.
+# Protocol: one JSON object per line in each direction.
+#   {"text": "...", "session": "...", "timeout_ms": 50}
+#       ->  {"response": ..., "intent": ..., "confidence": ..., ...}
+#           (plus "degraded": [skipped stages] or "shed": "<reason>" under load or a short deadline)
+#   {"cmd": "metrics"}                 ->  metrics of the worker that took the connection
+# Usage:
+#   python server.py serve --port 8765 --workers 4 --max-requests 100000 --max-in-flight 64
+#   python server.py query "Where is my order?"
+#   python server.py status
+#   python server.py bench --workers 1 2 4
+import gc
+import json
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from admission import DEGRADED, MAX_IN_FLIGHT, SESSION_BURST, SESSION_RATE, SHED, AdmissionController
+from deadline import Deadline
+from nlu import DEFAULT_ENTITY_BACKEND, ENTITY_BACKENDS
+from orders import ORDERS_DB
+from shared_cache import SHM_DIR, SLOTS, ResponseCache
+from warmup import BUDGET_S, TOP_N, WARM_QUERIES, CacheWarmer, format_report, warm_texts
+
+HOST = "127.0.0.1"
+PORT = 8765
+METRICS_DIR = os.path.join("run", "workers")
+METRICS_INTERVAL = 5.0       # seconds between per-worker metrics dumps
+ACCEPT_POLL = 0.5            # seconds a worker waits in select() before re-checking its stop flag
+
+
+def memory_usage() -> Dict[str, float]:
+    """Private / proportional memory of this process in MB (Linux smaps_rollup)."""
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty", "Shared_Clean", "Shared_Dirty"):
+                    usage[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        return {}
+    return {'rss_mb': round(usage.get('Rss', 0), 1), 'pss_mb': round(usage.get('Pss', 0), 1),
+            'private_mb': round(usage.get('Private_Clean', 0) + usage.get('Private_Dirty', 0), 1),
+            'shared_mb': round(usage.get('Shared_Clean', 0) + usage.get('Shared_Dirty', 0), 1)}
+
+
+def warm(top_n: int = TOP_N, budget_s: float = BUDGET_S, languages: Optional[List[str]] = None,
+         entities: str = DEFAULT_ENTITY_BACKEND) -> Dict[str, Any]:
+    """Import and exercise the whole pipeline in the master so workers inherit it warm.
+
+    Language packs other than English are left to load lazily in the workers that need them.
+    """
+    import chatbot
+    import logic_layer
+    import nlu
+    if entities != nlu.entity_backend():
+        nlu.set_entity_backend(entities)
+    if languages:
+        chatbot.set_languages(languages)
+    logic_layer.snapshot()
+    for q in WARM_QUERIES:
+        chatbot.process(q)
+    chatbot.clear_cache()
+    # answers for the most common questions are inherited by every worker
+    report = CacheWarmer(warm_texts(top_n), budget_s).run()
+    gc.collect()
+    gc.freeze()   # keep the GC from touching (and so copying) every inherited object
+    return report
+
+
+class Worker:
+    def __init__(self, index: int, sock: socket.socket, max_requests: int, metrics_dir: str,
+                 record: bool, admission: Optional[Dict[str, Any]] = None, orders_db: Optional[str] = None):
+        self.index = index
+        self.orders_db = orders_db
+        self.sock = sock
+        # jitter so workers started together are not all recycled at the same moment
+        self.max_requests = max_requests + random.randint(0, max_requests // 10) if max_requests else 0
+        self.metrics_dir = metrics_dir
+        self.record = record
+        self.admission = AdmissionController(**(admission or {}))
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self.latencies: List[float] = []   # recent latencies (bounded) for percentiles
+        self.started = time.time()
+        self.active = 0
+
+    def run(self):
+        import chatbot
+        signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        if self.record:
+            # writer threads do not survive fork, so each worker starts its own
+            chatbot.start_escalations()
+            chatbot.start_decision_log(tag=f"w{self.index}-{os.getpid()}")
+        if self.orders_db and os.path.exists(self.orders_db):
+            chatbot.start_orders(self.orders_db)   # sqlite connections must not cross a fork
+        threading.Thread(target=self._dump_metrics_loop, daemon=True).start()
+        while not self.stop.is_set():
+            ready, _, _ = select.select([self.sock], [], [], ACCEPT_POLL)
+            if not ready:
+                continue
+            try:
+                conn, _ = self.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                continue   # another worker won the accept
+            conn.setblocking(True)
+            with self.lock:
+                self.connections += 1
+                self.active += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+        # graceful: wait for in-flight connections, then flush recorders
+        deadline = time.time() + 30
+        while self.active and time.time() < deadline:
+            time.sleep(0.05)
+        if self.record:
+            chatbot.stop_escalations()
+            chatbot.stop_decision_log()
+        self._dump_metrics()
+        chatbot.stop_orders()
+
+    def _serve(self, conn: socket.socket):
+        import chatbot
+        try:
+            with conn, conn.makefile("rwb") as stream:
+                for line in stream:
+                    try:
+                        request = json.loads(line)
+                        if request.get("cmd") == "metrics":
+                            reply = self.metrics()
+                        else:
+                            start = time.perf_counter()
+                            timeout = request.get("timeout_ms")
+                            deadline = Deadline.after(timeout / 1000) if timeout is not None else None
+                            reply = self._answer(chatbot, request["text"], request.get("session"), deadline)
+                            self._count(time.perf_counter() - start)
+                    except Exception as e:
+                        with self.lock:
+                            self.errors += 1
+                        reply = {'error': str(e)}
+                    stream.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+                    stream.flush()
+                    if self.stop.is_set():
+                        break
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def _answer(self, chatbot, text: str, session: Optional[str],
+                deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        ticket = self.admission.admit(text, session)
+        if ticket.mode == SHED:
+            return {'response': ticket.reply, 'intent': None, 'confidence': 0.0, 'escalation': None,
+                    'shed': ticket.reason, 'worker': os.getpid()}
+        try:
+            d = chatbot.process(text, session, cheap=ticket.mode == DEGRADED, deadline=deadline)
+        finally:
+            self.admission.release(ticket)
+        reply = {'response': d['response'], 'intent': d['intent'], 'confidence': d['confidence'],
+                 'escalation': d['escalation'], 'urgency': d['urgency'], 'worker': os.getpid()}
+        if d['degraded']:
+            reply['degraded'] = d['degraded']
+        return reply
+
+    def _count(self, latency: float):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            if len(self.latencies) > 2000:
+                del self.latencies[:1000]
+            if self.max_requests and self.requests >= self.max_requests:
+                self.stop.set()   # recycle: finish what we have, then exit
+
+    def metrics(self) -> Dict[str, Any]:
+        import chatbot
+        with self.lock:
+            lat = sorted(self.latencies)
+            m = {'worker': self.index, 'pid': os.getpid(), 'requests': self.requests,
+                 'errors': self.errors, 'connections': self.connections, 'active': self.active,
+                 'uptime_s': round(time.time() - self.started, 1)}
+        if lat:
+            m['p50_ms'] = round(lat[len(lat) // 2] * 1000, 3)
+            m['p99_ms'] = round(lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000, 3)
+        m['admission'] = self.admission.stats()
+        m['cache'] = chatbot.cache_stats()
+        m['orders'] = chatbot.order_stats()
+        m.update(memory_usage())
+        return m
+
+    def _dump_metrics(self):
+        path = os.path.join(self.metrics_dir, f"worker-{self.index}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.metrics(), f)
+        os.replace(path + ".tmp", path)
+
+    def _dump_metrics_loop(self):
+        while not self.stop.wait(METRICS_INTERVAL):
+            self._dump_metrics()
+
+
+class Master:
+    def __init__(self, host: str = HOST, port: int = PORT, workers: int = 4, max_requests: int = 0,
+                 metrics_dir: str = METRICS_DIR, record: bool = True,
+                 admission: Optional[Dict[str, Any]] = None, warm_top: int = TOP_N,
+                 warm_budget: float = BUDGET_S, languages: Optional[List[str]] = None,
+                 shared_cache_slots: int = SLOTS, entities: str = DEFAULT_ENTITY_BACKEND,
+                 orders_db: Optional[str] = ORDERS_DB):
+        self.host, self.port = host, port
+        self.orders_db = orders_db
+        self.entities = entities
+        self.shared_cache_slots = shared_cache_slots
+        self.languages = languages
+        self.warm_top, self.warm_budget = warm_top, warm_budget
+        self.n_workers = workers
+        self.max_requests = max_requests
+        self.metrics_dir = metrics_dir
+        self.record = record
+        self.admission = admission
+        self.workers: Dict[int, int] = {}     # pid -> worker index
+        self.retiring: Set[int] = set()       # rolled-out workers still finishing their connections
+        self.shutting_down = False
+        self.roll_requested = False
+
+    def _spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                Worker(index, self.sock, self.max_requests, self.metrics_dir, self.record, self.admission,
+                       self.orders_db).run()
+            except Exception:
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = index
+
+    def serve(self):
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        cache = None
+        if self.shared_cache_slots:
+            import chatbot
+            cache = chatbot.set_shared_cache(ResponseCache.create(
+                os.path.join(SHM_DIR, f"chatbot-cache-{self.port}"), slots=self.shared_cache_slots))
+        t = time.perf_counter()
+        report = warm(self.warm_top, self.warm_budget, self.languages, self.entities)
+        print(f"[master {os.getpid()}] warmed in {time.perf_counter() - t:.2f} s; {memory_usage()}")
+        print(f"[master {os.getpid()}] cache: {format_report(report)}")
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(1024)
+        self.sock.setblocking(False)
+        signal.signal(signal.SIGTERM, self._on_shutdown)
+        signal.signal(signal.SIGINT, self._on_shutdown)
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, 'roll_requested', True))
+        for i in range(self.n_workers):
+            self._spawn(i)
+        print(f"[master {os.getpid()}] listening on {self.host}:{self.port} with {self.n_workers} workers")
+        while self.workers or self.retiring:
+            if self.roll_requested:
+                self.roll_requested = False
+                self._roll()
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.2)
+                continue
+            self.retiring.discard(pid)
+            index = self.workers.pop(pid, None)
+            if index is not None and not self.shutting_down:
+                self._spawn(index)   # recycled or crashed: replace it from the warm master
+        self.sock.close()
+        if cache is not None:
+            cache.close(unlink=True)
+
+    def _roll(self):
+        """Graceful restart: start a fresh worker for each old one and tell the old one to finish.
+        Old workers are reaped by the serve loop like any other (but not replaced), so a worker
+        draining idle keep-alive connections never blocks the master."""
+        for pid, index in list(self.workers.items()):
+            if self.shutting_down:
+                break
+            self.workers.pop(pid)
+            self.retiring.add(pid)
+            self._spawn(index)
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _on_shutdown(self, *_):
+        self.shutting_down = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+# --- client helpers ---
+class Client:
+    def __init__(self, host: str = HOST, port: int = PORT, timeout: float = 10.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.stream = self.sock.makefile("rwb")
+
+    def call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.stream.write(json.dumps(request).encode("utf-8") + b"\n")
+        self.stream.flush()
+        return json.loads(self.stream.readline())
+
+    def query(self, text: str, session: Optional[str] = None) -> Dict[str, Any]:
+        return self.call({'text': text, 'session': session})
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+
+def read_status(metrics_dir: str = METRICS_DIR) -> List[Dict[str, Any]]:
+    rows = []
+    if os.path.isdir(metrics_dir):
+        for name in sorted(os.listdir(metrics_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(metrics_dir, name)) as f:
+                    rows.append(json.load(f))
+    return rows
+
+
+def _client_load(port: int, seconds: float, out):
+    client = Client(port=port)
+    n, end = 0, time.time() + seconds
+    while time.time() < end:
+        client.query(random.choice(WARM_QUERIES))
+        n += 1
+    client.close()
+    out.put(n)
+
+
+def bench(worker_counts: List[int], clients: int, seconds: float, port: int):
+    import multiprocessing
+    import subprocess
+    print(f"{'workers':>8} | {'req/s':>9} | {'private MB/worker':>17} | {'PSS MB/worker':>13}")
+    for n in worker_counts:
+        metrics_dir = os.path.join("run", f"bench-{n}")
+        proc = subprocess.Popen([sys.executable, __file__, "serve", "--port", str(port), "--workers", str(n),
+                                 "--metrics-dir", metrics_dir, "--no-record"], stdout=subprocess.DEVNULL)
+        for _ in range(100):
+            try:
+                Client(port=port).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        out = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_client_load, args=(port, seconds, out)) for _ in range(clients)]
+        for p in procs:
+            p.start()
+        total = sum(out.get() for _ in procs)
+        for p in procs:
+            p.join()
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+        status = read_status(metrics_dir)
+        private = sum(s.get('private_mb', 0) for s in status) / max(len(status), 1)
+        pss = sum(s.get('pss_mb', 0) for s in status) / max(len(status), 1)
+        print(f"{n:>8} | {total / seconds:>9,.0f} | {private:>17.1f} | {pss:>13.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Pre-fork chatbot server")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("serve")
+    p.add_argument("--host", default=HOST)
+    p.add_argument("--port", type=int, default=PORT)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    p.add_argument("--max-requests", type=int, default=0, help="recycle a worker after this many requests")
+    p.add_argument("--metrics-dir", default=METRICS_DIR)
+    p.add_argument("--no-record", action="store_true", help="do not record escalations/decision logs")
+    p.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT, help="per-worker concurrent requests")
+    p.add_argument("--session-rate", type=float, default=SESSION_RATE, help="messages/s allowed per session")
+    p.add_argument("--session-burst", type=int, default=SESSION_BURST)
+    p.add_argument("--warm-top", type=int, default=TOP_N, help="historical queries to pre-cache")
+    p.add_argument("--warm-budget", type=float, default=BUDGET_S, help="seconds allowed for pre-caching")
+    p.add_argument("--languages", nargs="+", default=None, help="language packs to serve, e.g. en es fr")
+    p.add_argument("--shared-cache-slots", type=int, default=SLOTS,
+                   help="slots of the host-wide decision cache (0: a private cache per worker)")
+    p.add_argument("--entities", choices=ENTITY_BACKENDS, default=DEFAULT_ENTITY_BACKEND,
+                   help="date/time/money entities: regex grammar, en_core_web_sm, or none")
+    p.add_argument("--orders-db", default=ORDERS_DB,
+                   help="order store for live order statuses (skipped when the file does not exist)")
+    p = sub.add_parser("query")
+    p.add_argument("text")
+    p.add_argument("--port", type=int, default=PORT)
+    p = sub.add_parser("status")
+    p.add_argument("--metrics-dir", default=METRICS_DIR)
+    p = sub.add_parser("bench")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--clients", type=int, default=8)
+    p.add_argument("--seconds", type=float, default=5.0)
+    p.add_argument("--port", type=int, default=PORT + 1)
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        Master(args.host, args.port, args.workers, args.max_requests, args.metrics_dir,
+               record=not args.no_record,
+               admission={'max_in_flight': args.max_in_flight, 'session_rate': args.session_rate,
+                          'session_burst': args.session_burst},
+               warm_top=args.warm_top, warm_budget=args.warm_budget, languages=args.languages,
+               shared_cache_slots=args.shared_cache_slots, entities=args.entities,
+               orders_db=args.orders_db).serve()
+    elif args.cmd == "query":
+        client = Client(port=args.port)
+        print(json.dumps(client.query(args.text), indent=2, ensure_ascii=False))
+        client.close()
+    elif args.cmd == "status":
+        rows = read_status(args.metrics_dir)
+        for row in rows:
+            print(json.dumps(row))
+        # every worker reports the same host-wide cache; show the freshest view once
+        hosts = [row['cache']['host'] for row in rows if row.get('cache', {}).get('host')]
+        if hosts:
+            print(json.dumps({'host_cache': max(hosts, key=lambda h: h['hits'] + h['misses'])}))
+    else:
+        bench(args.workers, args.clients, args.seconds, args.port)
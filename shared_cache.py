@@ -0,0 +1,343 @@
+# shared_cache.py
+# Decision cache shared by every worker process on a host.
+# A fixed-size hash table in a memory-mapped file (under /dev/shm): SLOTS slots of SLOT_SIZE bytes,
+# grouped into sets of WAYS slots; a key hashes to one set and lives in one of its slots, stored as
+# the canonical key plus the decision as JSON. Reads take no lock: each slot carries a version that
+# a writer makes odd while it rewrites the slot (a seqlock), and a reader that sees it change retries.
+# Writes take one of STRIPES locks (a thread lock plus an fcntl byte-range lock on the file, so they
+# exclude both threads and processes). A full set evicts with the CLOCK algorithm: a hit sets the
+# slot's reference bit, the set's hand clears set bits and evicts the first slot without one.
+# Hit/miss/eviction counters live in per-process rows of the same file, so stats() is per host.
+# ResponseCache.local() runs the same table over an in-process buffer (tests, single process).
+# Usage: python shared_cache.py --processes 4 --slots 4096  (hit rate and throughput across processes)
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+SLOTS = 16384          # 16 MB with the default slot size
+WAYS = 8               # slots per set (a key can live in any slot of its set)
+SLOT_SIZE = 1024       # bytes per slot, header included; larger decisions are not cached
+STRIPES = 64           # write locks
+MAX_PROCESSES = 128    # per-process counter rows; rows of exited processes are reused
+READ_RETRIES = 8       # a read racing more writes than this counts as a miss
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+_MAGIC = b"RESPC001"
+_HEADER = struct.Struct("<8sIIIII")   # magic, slots, ways, slot size, stripes, max processes
+_HEADER_SIZE = 64
+_ROW = struct.Struct("<6Q")           # pid, then the COUNTERS
+_ROW_SIZE = 64
+COUNTERS = ('hits', 'misses', 'puts', 'evictions', 'too_large')
+_SLOT = struct.Struct("<IBBHIQ")      # version, used, reference bit, key length, value length, key hash
+_VERSION = struct.Struct("<I")
+_SLOT_HEADER = 24
+_REF = 5                              # offset of the reference bit in a slot
+
+
+def _layout(slots: int, ways: int, max_processes: int):
+    rows = _HEADER_SIZE
+    hands = rows + max_processes * _ROW_SIZE
+    data = -(-(hands + slots // ways) // 64) * 64
+    return rows, hands, data
+
+
+class ResponseCache:
+    def __init__(self, buf, slots: int, ways: int, slot_size: int, stripes: int, max_processes: int,
+                 fd: Optional[int] = None, path: Optional[str] = None):
+        if slots % ways:
+            raise ValueError("slots must be a multiple of ways")
+        self._buf = buf
+        self.slots, self.ways, self.slot_size = slots, ways, slot_size
+        self.stripes, self.max_processes = stripes, max_processes
+        self.fd, self.path = fd, path
+        self._sets = slots // ways
+        self._rows, self._hands, self._data = _layout(slots, ways, max_processes)
+        self._pid = None
+        self._attach_process()
+
+    # --- construction ---
+    @classmethod
+    def create(cls, path: Optional[str] = None, slots: int = SLOTS, ways: int = WAYS, slot_size: int = SLOT_SIZE,
+               stripes: int = STRIPES, max_processes: int = MAX_PROCESSES) -> "ResponseCache":
+        """New, empty shared cache file; workers forked afterwards inherit the mapping."""
+        path = path or os.path.join(SHM_DIR, f"chatbot-cache-{os.getpid()}")
+        size = _layout(slots, ways, max_processes)[2] + slots * slot_size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.ftruncate(fd, size)
+        buf = mmap.mmap(fd, size)
+        _HEADER.pack_into(buf, 0, _MAGIC, slots, ways, slot_size, stripes, max_processes)
+        return cls(buf, slots, ways, slot_size, stripes, max_processes, fd, path)
+
+    @classmethod
+    def attach(cls, path: str) -> "ResponseCache":
+        """Map an existing cache file (a process started independently of the one that created it)."""
+        fd = os.open(path, os.O_RDWR)
+        buf = mmap.mmap(fd, os.fstat(fd).st_size)
+        magic, slots, ways, slot_size, stripes, max_processes = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            buf.close()
+            os.close(fd)
+            raise ValueError(f"{path} is not a response cache")
+        return cls(buf, slots, ways, slot_size, stripes, max_processes, fd, path)
+
+    @classmethod
+    def local(cls, slots: int = 1024, ways: int = WAYS, slot_size: int = SLOT_SIZE,
+              stripes: int = 8) -> "ResponseCache":
+        """The same table in this process's memory (thread locks only)."""
+        buf = bytearray(_layout(slots, ways, 1)[2] + slots * slot_size)
+        _HEADER.pack_into(buf, 0, _MAGIC, slots, ways, slot_size, stripes, 1)
+        return cls(buf, slots, ways, slot_size, stripes, 1)
+
+    # --- per-process state ---
+    def _attach_process(self):
+        """Fresh thread locks and a counter row for this process (again after a fork)."""
+        self._pid = os.getpid()
+        self._locks = [threading.Lock() for _ in range(self.stripes + 1)]   # + one for the row table
+        self._stats_lock = threading.Lock()
+        self._row = self._rows + self._claim_row() * _ROW_SIZE
+
+    def _claim_row(self) -> int:
+        with self._locked(self.stripes):
+            for i in range(self.max_processes):
+                pid = _ROW.unpack_from(self._buf, self._rows + i * _ROW_SIZE)[0]
+                if pid in (0, self._pid) or not _alive(pid):
+                    # counts of an exited process stay in the row, so host totals never go backwards
+                    struct.pack_into("<Q", self._buf, self._rows + i * _ROW_SIZE, self._pid)
+                    return i
+        return self.max_processes - 1   # table full: share the last row (its counts become approximate)
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._attach_process()
+
+    def _locked(self, stripe: int) -> "_StripeLock":
+        return _StripeLock(self._locks[stripe], self.fd, stripe)
+
+    def _count(self, counter: int, n: int = 1):
+        if not n:
+            return
+        off = self._row + 8 * (1 + counter)
+        with self._stats_lock:
+            struct.pack_into("<Q", self._buf, off, struct.unpack_from("<Q", self._buf, off)[0] + n)
+
+    # --- table ---
+    def _set_of(self, kb: bytes):
+        h = int.from_bytes(hashlib.blake2b(kb, digest_size=8).digest(), "little")
+        index = h % self._sets
+        return h, index, self._data + index * self.ways * self.slot_size
+
+    def get(self, key: str, count: bool = True) -> Optional[Dict[str, Any]]:
+        """Cached decision for a canonical key, or None; `count=False` leaves the hit/miss counters alone."""
+        self._check_fork()
+        buf, kb = self._buf, key.encode("utf-8")
+        h, _, base = self._set_of(kb)
+        for way in range(self.ways):
+            off = base + way * self.slot_size
+            for _ in range(READ_RETRIES):
+                version, used, ref, klen, vlen, khash = _SLOT.unpack_from(buf, off)
+                if version & 1:
+                    continue   # being rewritten
+                if not used:
+                    self._count(1, count)
+                    return None   # slots fill in order and are never emptied one by one
+                if khash != h or klen != len(kb):
+                    break
+                start = off + _SLOT_HEADER
+                data = buf[start:start + klen + vlen]
+                if _VERSION.unpack_from(buf, off)[0] != version:
+                    continue   # changed while we copied it
+                if data[:klen] != kb:
+                    break
+                if not ref:
+                    buf[off + _REF] = 1
+                self._count(0, count)
+                return json.loads(data[klen:])
+        self._count(1, count)
+        return None
+
+    def put(self, key: str, decision: Dict[str, Any]) -> bool:
+        """Store a decision; False if it does not fit in a slot."""
+        self._check_fork()
+        buf, kb = self._buf, key.encode("utf-8")
+        vb = json.dumps(decision, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if _SLOT_HEADER + len(kb) + len(vb) > self.slot_size:
+            self._count(4)
+            return False
+        h, index, base = self._set_of(kb)
+        evicted = False
+        with self._locked(index % self.stripes):
+            target = None
+            for way in range(self.ways):
+                off = base + way * self.slot_size
+                _, used, _, klen, _, khash = _SLOT.unpack_from(buf, off)
+                if not used or (khash == h and klen == len(kb)
+                                and buf[off + _SLOT_HEADER:off + _SLOT_HEADER + klen] == kb):
+                    target = off
+                    break
+            if target is None:
+                # CLOCK: clear reference bits until a slot without one comes round
+                hand = buf[self._hands + index]
+                while target is None:
+                    off = base + hand * self.slot_size
+                    hand = (hand + 1) % self.ways
+                    if buf[off + _REF]:
+                        buf[off + _REF] = 0
+                    else:
+                        target = off
+                buf[self._hands + index] = hand
+                evicted = True
+            version = _VERSION.unpack_from(buf, target)[0]
+            _VERSION.pack_into(buf, target, (version + 1) & 0xFFFFFFFF)
+            start = target + _SLOT_HEADER
+            buf[start:start + len(kb) + len(vb)] = kb + vb
+            _SLOT.pack_into(buf, target, (version + 2) & 0xFFFFFFFF, 1, 0, len(kb), len(vb), h)
+        self._count(2)
+        if evicted:
+            self._count(3)
+        return True
+
+    def clear(self):
+        """Empty every slot and reset the counters."""
+        self._check_fork()
+        buf = self._buf
+        with self._locked(self.stripes), self._stats_lock:
+            for i in range(self.max_processes):
+                off = self._rows + i * _ROW_SIZE
+                _ROW.pack_into(buf, off, _ROW.unpack_from(buf, off)[0], *[0] * len(COUNTERS))
+        for stripe in range(self.stripes):
+            with self._locked(stripe):
+                for index in range(stripe, self._sets, self.stripes):
+                    base = self._data + index * self.ways * self.slot_size
+                    for way in range(self.ways):
+                        off = base + way * self.slot_size
+                        version = _VERSION.unpack_from(buf, off)[0]
+                        _SLOT.pack_into(buf, off, (version + 2) & 0xFFFFFFFF, 0, 0, 0, 0, 0)
+                    buf[self._hands + index] = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Host-wide counters (all processes) and memory use."""
+        self._check_fork()
+        buf = self._buf
+        totals = dict.fromkeys(COUNTERS, 0)
+        processes = 0
+        for i in range(self.max_processes):
+            row = _ROW.unpack_from(buf, self._rows + i * _ROW_SIZE)
+            if row[0] and (row[0] == self._pid or _alive(row[0])):
+                processes += 1
+            for name, value in zip(COUNTERS, row[1:]):
+                totals[name] += value
+        used = stored = 0
+        for off in range(self._data, self._data + self.slots * self.slot_size, self.slot_size):
+            _, in_use, _, klen, vlen, _ = _SLOT.unpack_from(buf, off)
+            if in_use:
+                used += 1
+                stored += klen + vlen
+        lookups = totals['hits'] + totals['misses']
+        return dict(totals, backend='shared' if self.fd is not None else 'local', path=self.path,
+                    processes=processes, slots=self.slots, used=used, fill=used / self.slots,
+                    bytes=len(buf), stored_bytes=stored, hit_rate=totals['hits'] / lookups if lookups else 0.0)
+
+    def close(self, unlink: bool = False):
+        if self.fd is not None:
+            self._buf.close()
+            os.close(self.fd)
+            self.fd = None
+            if unlink and self.path:
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+
+
+class _StripeLock:
+    """Thread lock plus, for a shared file, an fcntl lock on one byte (per-process, so both are needed)."""
+    __slots__ = ('lock', 'fd', 'stripe')
+
+    def __init__(self, lock: threading.Lock, fd: Optional[int], stripe: int):
+        self.lock, self.fd, self.stripe = lock, fd, stripe
+
+    def __enter__(self):
+        self.lock.acquire()
+        if self.fd is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, self.stripe)
+
+    def __exit__(self, *_):
+        if self.fd is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, self.stripe)
+        self.lock.release()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+if __name__ == "__main__":
+    # N forked processes replay the same traffic against one shared cache vs. a private cache each
+    import argparse
+    import random
+    import time
+    from collections import Counter
+    from loadgen import next_message
+    from nlu import canonicalize
+    parser = argparse.ArgumentParser(description="Shared response cache across processes")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--slots", type=int, default=4096)
+    parser.add_argument("--messages", type=int, default=20000, help="per process")
+    args = parser.parse_args()
+
+    def run(cache: ResponseCache, seed: int) -> float:
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        for _ in range(args.messages):
+            key = canonicalize(next_message(rng))
+            if cache.get(key) is None:
+                cache.put(key, {'key': key, 'intent': 'order_status', 'confidence': 0.5,
+                                'response': "You can track your order in My Orders -> Track."})
+        return time.perf_counter() - start
+
+    for label, shared in (("private per process", False), ("shared per host", True)):
+        path = os.path.join(SHM_DIR, f"chatbot-cache-bench-{os.getpid()}")
+        cache = ResponseCache.create(path, slots=args.slots) if shared else None
+        pids = []
+        for p in range(args.processes):
+            pid = os.fork()
+            if pid == 0:
+                mine = cache if shared else ResponseCache.create(f"{path}-{p}", slots=args.slots)
+                elapsed = run(mine, p)
+                with open(f"{path}-{p}.json", "w") as f:
+                    json.dump({'elapsed': elapsed, **mine.stats()}, f)
+                if not shared:
+                    mine.close(unlink=True)
+                os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        results = []
+        for p in range(args.processes):
+            with open(f"{path}-{p}.json") as f:
+                results.append(json.load(f))
+            os.unlink(f"{path}-{p}.json")
+        if shared:
+            stats = cache.stats()
+            cache.close(unlink=True)
+            hits, lookups, memory = stats['hits'], stats['hits'] + stats['misses'], stats['bytes']
+        else:
+            totals = Counter()
+            for r in results:
+                totals.update({k: r[k] for k in ('hits', 'misses', 'bytes')})
+            hits, lookups, memory = totals['hits'], totals['hits'] + totals['misses'], totals['bytes']
+        rate = args.processes * args.messages / sum(r['elapsed'] for r in results)
+        print(f"{label:<20} hit rate {hits / lookups:6.1%}  {memory / 2 ** 20:6.1f} MB mapped  "
+              f"{rate:,.0f} lookups/s per process")
@@ -0,0 +1,87 @@
+# startup_profile.py
+# Startup profiling: summarized `python -X importtime` output plus time-to-first-paint marks.
+# Usage: python startup_profile.py [module] [--top N] [--json]
+import json
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+
+def import_profile(module: str = 'chatbot') -> List[Tuple[str, int, int, int]]:
+    """Import `module` in a fresh interpreter with -X importtime.
+
+    Returns (module, self_us, cumulative_us, depth) rows in import order.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True)
+    rows = parse_importtime(proc.stderr)
+    if proc.returncode != 0 and not rows:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr.strip()}")
+    return rows
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) rows from `-X importtime` stderr; other lines are ignored."""
+    rows = []
+    for line in output.splitlines():
+        m = _IMPORTTIME_LINE.match(line)
+        if m:
+            depth = (len(m.group(3)) - 1) // 2
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), depth))
+    return rows
+
+
+def summarize(rows: List[Tuple[str, int, int, int]], top: int = 15) -> Dict[str, object]:
+    """Aggregate import rows into totals per top-level package and the slowest modules."""
+    packages: Dict[str, int] = {}
+    for name, _self_us, cumulative_us, depth in rows:
+        if depth == 0:
+            root = name.split('.')[0]
+            packages[root] = packages.get(root, 0) + cumulative_us
+    total_us = sum(us for name, _s, us, depth in rows if depth == 0)
+    return {
+        'total_ms': round(total_us / 1000, 1),
+        'modules': len(rows),
+        'packages_ms': {k: round(v / 1000, 1)
+                        for k, v in sorted(packages.items(), key=lambda kv: -kv[1])[:top]},
+        'slowest_self_ms': {name: round(s / 1000, 1)
+                            for name, s, _c, _d in sorted(rows, key=lambda r: -r[1])[:top]},
+    }
+
+
+def format_summary(summary: Dict[str, object]) -> str:
+    lines = [f"Import total: {summary['total_ms']} ms across {summary['modules']} modules",
+             "Top-level packages (cumulative ms):"]
+    lines += [f"  {name:<30} {ms:>9.1f}" for name, ms in summary['packages_ms'].items()]
+    lines.append("Slowest modules (self ms):")
+    lines += [f"  {name:<30} {ms:>9.1f}" for name, ms in summary['slowest_self_ms'].items()]
+    return "\n".join(lines)
+
+
+class StartupTimer:
+    """Records named milestones relative to process start (e.g. window shown, backend ready)."""
+
+    def __init__(self, t0: float = None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str):
+        self.marks.setdefault(name, round((time.perf_counter() - self.t0) * 1000, 1))
+
+    def report(self) -> str:
+        return "\n".join(f"  {name:<30} {ms:>9.1f} ms" for name, ms in self.marks.items())
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize import-time cost of a module")
+    parser.add_argument('module', nargs='?', default='chatbot')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', action='store_true', help="emit JSON for regression tracking")
+    args = parser.parse_args()
+    result = summarize(import_profile(args.module), top=args.top)
+    print(json.dumps(result, indent=2) if args.json else format_summary(result))
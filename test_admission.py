@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for admission control
+Overload must degrade and then shed instead of queueing, sessions are rate limited, and
+forced-escalation messages are the last to be turned away.
+"""
+
+import chatbot
+from admission import DEGRADED, FULL, SHED, AdmissionController, HIGH_VOLUME_REPLY, RATE_LIMIT_REPLY, overload
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_in_flight_limit_degrades_then_sheds():
+    ac = AdmissionController(max_in_flight=4, degrade_at=0.5, priority_reserve=2)
+    tickets = [ac.admit("Where is my order?") for _ in range(5)]
+    assert [t.mode for t in tickets] == [FULL, FULL, DEGRADED, DEGRADED, SHED]
+    assert tickets[-1].reply == HIGH_VOLUME_REPLY
+    # priority messages may still use the reserve
+    urgent = [ac.admit("I was double charged"), ac.admit("My account is locked")]
+    assert [t.mode for t in urgent] == [FULL, FULL]
+    assert ac.admit("I was double charged again").mode == SHED
+    for t in tickets + urgent:
+        ac.release(t)
+    assert ac.stats()['in_flight'] == 0
+    assert ac.admit("Where is my order?").mode == FULL
+
+
+def test_session_token_bucket():
+    clock = FakeClock()
+    ac = AdmissionController(session_rate=1.0, session_burst=3, clock=clock)
+    modes = []
+    for _ in range(4):
+        t = ac.admit("hello", "alice")
+        modes.append(t.mode)
+        ac.release(t)
+    assert modes == [FULL, FULL, FULL, SHED]
+    assert ac.admit("hello", "alice").reply == RATE_LIMIT_REPLY
+    assert ac.admit("hello", "bob").mode == FULL          # other sessions are unaffected
+    assert ac.admit("I want to dispute this charge", "alice").priority   # priority bypasses the bucket
+    clock.now = 1.0
+    assert ac.admit("hello", "alice").mode == FULL
+    assert ac.stats()['shed_rate_limited'] == 2
+
+
+def test_cheap_path_skips_typo_correction():
+    chatbot.clear_cache()
+    assert chatbot.process("I want a refnd")['intent'] == 'refund_status'
+    chatbot.clear_cache()
+    assert chatbot.process("I want a refnd", cheap=True)['intent'] is None
+    assert chatbot.cache_stats()['size'] == 0     # cheap decisions are not cached
+
+
+def test_p99_stays_bounded_at_three_times_capacity():
+    r = overload(multiplier=3.0, seconds=1.5, controller=AdmissionController(max_in_flight=16))
+    assert r['shed'] > 0
+    assert r['p99_ms'] < 250
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for decision-log compaction and columnar analytics
+"""
+
+import glob
+import os
+
+import pytest
+
+import chatbot
+from analytics import DecisionStore
+
+
+def test_compact_and_aggregate_decision_logs(tmp_path):
+    logs, store_dir = str(tmp_path / "logs"), str(tmp_path / "store")
+    chatbot.start_decision_log(logs)
+    try:
+        for text in ["What are your prices?", "How much does it cost?", "My account is locked",
+                     "blah blah", "Where is my order?"]:
+            chatbot.handle_query(text)
+    finally:
+        chatbot.stop_decision_log()
+
+    store = DecisionStore(store_dir)
+    paths = glob.glob(os.path.join(logs, "decisions-*.jsonl"))
+    assert store.compact(paths) == 5
+    assert store.compact(paths) == 0  # already compacted files are skipped
+    reopened = DecisionStore(store_dir)
+    assert len(reopened) == 5
+
+    daily = reopened.daily_intent_counts()
+    assert daily['counts'].sum() == 5
+    assert daily['counts'][0][reopened.intents.index('pricing')] == 2
+
+    rates = reopened.escalation_rates()
+    assert rates['account_locked']['policy'] == 1.0
+    assert rates['(none)']['low_confidence'] == 1.0
+    assert rates['pricing']['escalated'] == 0.0
+
+    hist = reopened.confidence_histogram(bins=10)
+    assert hist['counts'].sum() == 5 and hist['counts'][0] == 1
+
+
+def test_live_log_is_compacted_incrementally(tmp_path):
+    log, store_dir = str(tmp_path / "decisions-w0.jsonl"), str(tmp_path / "store")
+    record = '{"ts": 1700000000, "intent": "pricing", "escalation": null, "score": 0.5}\n'
+    with open(log, "w", encoding="utf-8") as f:
+        f.write(record * 3 + record[:20])   # the writer is mid-line
+    store = DecisionStore(store_dir)
+    assert store.compact([log]) == 3
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(record[20:] + record)
+    assert store.compact([log]) == 2          # the rest of the line and the new one
+    assert store.compact([log]) == 0
+    assert len(DecisionStore(store_dir)) == 5
+
+
+def test_interrupted_append_is_not_visible(tmp_path):
+    store_dir = str(tmp_path / "store")
+    store = DecisionStore(store_dir)
+    store.append({'ts': [1, 2], 'intent': [0, 0], 'reason': [0, 0], 'confidence': [0.5, 0.5]})
+    with open(store._column_path('ts'), "ab") as f:   # a crash after one column was appended
+        f.write(b"\0" * 8 * 3)
+    reopened = DecisionStore(store_dir)
+    assert len(reopened) == 2 and len(reopened.column('ts')) == 2
+    reopened.append({'ts': [3], 'intent': [0], 'reason': [0], 'confidence': [0.5]})
+    assert list(DecisionStore(store_dir).column('ts')) == [1, 2, 3]
+    os.truncate(reopened._column_path('confidence'), 4)   # a column lost committed records
+    with pytest.raises(ValueError):
+        DecisionStore(store_dir)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for per-request deadlines
+A fixed fake clock makes every budget check deterministic: optional stages are skipped (and
+recorded) when the budget is short, while intent matching and escalation rules always run.
+"""
+
+from types import SimpleNamespace
+
+import chatbot
+import nlu
+from deadline import Deadline
+
+
+def fixed_deadline(remaining: float) -> Deadline:
+    return Deadline(remaining, clock=lambda: 0.0)
+
+
+def test_ample_budget_matches_undeadlined_pipeline():
+    chatbot.clear_cache()
+    d = chatbot.process("I want a refnd for order #ABC-12345", deadline=fixed_deadline(1.0))
+    assert d['intent'] == 'refund_status' and d['entities']['order_id'] == 'ABC-12345'
+    assert d['degraded'] == []
+    assert chatbot.cache_stats()['size'] == 1
+
+
+def test_short_budget_skips_typo_correction_and_is_not_cached():
+    chatbot.clear_cache()
+    d = chatbot.process("I want a refnd", deadline=fixed_deadline(0.0005))
+    assert d['intent'] is None and d['escalation'] == 'low_confidence'
+    assert d['degraded'] == ['typo_correction']
+    assert chatbot.cache_stats()['size'] == 0
+    # a later request with time to spare gets (and caches) the full answer
+    assert chatbot.process("I want a refnd", deadline=fixed_deadline(1.0))['intent'] == 'refund_status'
+    assert chatbot.cache_stats()['size'] == 1
+
+
+def test_expired_deadline_still_evaluates_escalation_rules():
+    chatbot.clear_cache()
+    d = chatbot.process("I want to dispute order #ABC-12345", deadline=fixed_deadline(0.0))
+    assert d['intent'] == 'payment_dispute' and d['escalation'] == 'policy'
+    assert d['entities'] == {}
+    assert d['degraded'] == ['entities']   # the exact match is confident: no correction was needed
+
+
+def test_clean_text_is_not_degraded_or_left_uncached_under_a_short_budget():
+    chatbot.clear_cache()
+    d = chatbot.process("Where is my order?", deadline=fixed_deadline(0.0005))
+    assert d['intent'] == 'order_status' and d['degraded'] == []
+    assert chatbot.cache_stats()['size'] == 1
+    # unmatched, but there is no unknown word a correction pass could fix
+    assert chatbot.process("blah blah", deadline=fixed_deadline(0.0005))['degraded'] == []
+
+
+def test_spacy_is_skipped_when_budget_is_short(monkeypatch):
+    calls = []
+    monkeypatch.setattr(nlu, '_nlp', lambda text: calls.append(text) or SimpleNamespace(ents=[]))
+    chatbot.clear_cache()
+    d = chatbot.process("refund for order #ABC-12345", deadline=fixed_deadline(0.005))
+    assert d['degraded'] == ['spacy_ner'] and d['entities'] == {'order_id': 'ABC-12345'}
+    assert calls == []
+    chatbot.process("refund for order #ABC-12345", deadline=fixed_deadline(1.0))
+    assert calls == ["refund for order #ABC-12345"]
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for the asynchronous decision log
+"""
+
+import glob
+import json
+import os
+
+import chatbot
+from decision_log import DecisionLog
+
+
+def read_records(directory):
+    records = []
+    for path in sorted(glob.glob(os.path.join(directory, "decisions-*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            records += [json.loads(line) for line in f]
+    return records
+
+
+def test_decisions_are_logged_with_patterns(tmp_path):
+    log = chatbot.start_decision_log(str(tmp_path))
+    try:
+        chatbot.handle_query("Where's my order #ABC-12345??", session="s1")
+        chatbot.handle_query("I want a refnd", session="s1")
+    finally:
+        chatbot.stop_decision_log()
+    first, second = read_records(str(tmp_path))
+    assert first['normalized'] == "where is my order abc-12345"
+    assert first['intent'] == 'order_status' and first['entities']['order_id'] == 'ABC-12345'
+    assert first['patterns'] == [r'\bwhere.*order\b']
+    assert second['patterns'] == [r'\brefund\b'] and second['score'] == 0.4
+    assert log.stats()['written'] == 2
+
+
+def test_language_pack_decisions_are_logged_without_english_patterns(tmp_path):
+    chatbot.set_languages(['en', 'es'])
+    chatbot.start_decision_log(str(tmp_path))
+    try:
+        chatbot.handle_query("Mi cuenta está bloqueada")
+        chatbot.handle_query("My account is locked")
+    finally:
+        chatbot.stop_decision_log()
+        chatbot.set_languages(['en'])
+    spanish, english = read_records(str(tmp_path))
+    assert spanish['language'] == 'es' and spanish['intent'] == 'account_locked' and 'patterns' not in spanish
+    assert english['language'] == 'en' and english['patterns']
+
+
+def test_rotates_by_size(tmp_path):
+    log = DecisionLog(str(tmp_path), max_bytes=2000, flush_interval=60)
+    decision = chatbot.process("What are your prices?")
+    for _ in range(30):
+        log.log(decision)
+        log._drain()  # one writer pass per record makes rotation points deterministic
+    log.close()
+    assert log.files > 1
+    assert len(read_records(str(tmp_path))) == 30
+
+
+def test_full_buffer_drops_instead_of_blocking(tmp_path):
+    log = DecisionLog(str(tmp_path), buffer_size=10, flush_interval=60)
+    decision = chatbot.process("What are your prices?")
+    for _ in range(100):
+        log.log(decision)
+    assert log.stats()['dropped'] == 90
+    log.close()
+    assert len(read_records(str(tmp_path))) == 10
+
+
+def test_sampling(tmp_path):
+    log = DecisionLog(str(tmp_path), sample_rate=0.0)
+    log.log(chatbot.process("What are your prices?"))
+    log.close()
+    assert log.stats()['sampled_out'] == 1 and read_records(str(tmp_path)) == []
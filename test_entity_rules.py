@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for the rule-based entity backend
+The regex grammar must find dates, times and amounts without mistaking order IDs, versions or
+hours ranges for them, and the pipeline must be able to switch backends.
+"""
+
+import chatbot
+import nlu
+from entity_rules import RuleRecognizer
+
+
+def ents(text):
+    return [(e.label_, e.text) for e in RuleRecognizer()(text).ents]
+
+
+def test_grammar():
+    assert ents("I was charged $49.99 on 3 March for order ABC-12345") == [('MONEY', '$49.99'), ('DATE', '3 March')]
+    assert ents("placed last Tuesday at 9:30 am") == [('DATE', 'last Tuesday'), ('TIME', '9:30 am')]
+    assert ents("paid 20 dollars on 2024-03-14, two weeks ago") == [
+        ('MONEY', '20 dollars'), ('DATE', '2024-03-14'), ('DATE', 'two weeks ago')]
+    assert ents("charged €12,50 twice, then 1.234,56 euros and $1,299.99") == [
+        ('MONEY', '€12,50'), ('MONEY', '1.234,56 euros'), ('MONEY', '$1,299.99')]
+    assert ents("refund €12,5") == []   # never cut short at the comma
+    for text in ("Track order #ABC-12345", "version 2.5 broke", "may I get a refund", "hours are 9:00-18:00"):
+        assert ents(text) == [], text
+
+
+def test_backend_is_selectable():
+    text = "Refund for order ABC12345 from yesterday, it was $49.99"
+    assert nlu.entity_backend() == 'rules' and nlu.ner_stage() == 'rule_ner' and nlu.has_ner()
+    runs = nlu.entity_stats()['ner_runs']
+    nlu.extract_entities(text)
+    assert nlu.entity_stats()['ner_runs'] == runs + 1   # counted for whichever backend ran
+    try:
+        assert nlu.set_entity_backend('none') is None and not nlu.has_ner()
+        chatbot.clear_cache()
+        assert chatbot.process(text)['entities'] == {'order_id': 'ABC12345'}
+    finally:
+        nlu.set_entity_backend('rules')
+        chatbot.clear_cache()
+    assert chatbot.process(text)['entities'] == {'order_id': 'ABC12345', 'date': ['yesterday'], 'money': ['$49.99']}
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for the escalation hand-off queue
+Bursts must be accepted without blocking, end up in SQLite, and be queryable by agents.
+"""
+
+import os
+
+import chatbot
+from escalation import EscalationQueue
+
+
+def test_burst_is_durable_and_queryable(tmp_path):
+    esc = EscalationQueue(os.path.join(str(tmp_path), "esc.db"))
+    for i in range(3000):
+        assert esc.submit(f"double charged #{i}", 'payment_dispute', 0.5, 'policy',
+                          {'money': ['$5']}, session=f"s{i % 3}")
+    esc.flush()
+    assert esc.counts() == {'open': 3000}
+    latest = esc.cases(session="s2", limit=1)[0]
+    assert latest['message'] == "double charged #2999" and latest['entities'] == {'money': ['$5']}
+    assert esc.set_status(latest['id'], 'assigned')
+    assert esc.get(latest['id'])['status'] == 'assigned'
+    assert esc.metrics()['written'] == 3000
+    esc.close()
+
+
+def test_full_queue_rejects_instead_of_blocking(tmp_path):
+    esc = EscalationQueue(os.path.join(str(tmp_path), "esc.db"), maxsize=1, flush_interval=5)
+    results = [esc.submit("locked out", 'account_locked', 0.5, 'policy') for _ in range(200)]
+    assert not all(results)
+    assert esc.metrics()['rejected'] == results.count(False)
+    esc.close()
+
+
+def test_escalated_replies_create_cases(tmp_path):
+    esc = chatbot.start_escalations(os.path.join(str(tmp_path), "esc.db"))
+    try:
+        chatbot.handle_query("My account is locked", session="abc")
+        chatbot.handle_query("What are your prices?", session="abc")
+        esc.flush()
+        cases = esc.cases(session="abc")
+        assert [(c['intent'], c['reason']) for c in cases] == [('account_locked', 'policy')]
+    finally:
+        chatbot.stop_escalations()
+
+
+def test_cases_by_urgency_and_old_store_migration(tmp_path):
+    import sqlite3
+    path = os.path.join(str(tmp_path), "old.db")
+    conn = sqlite3.connect(path)   # a store created before urgency/sentiment existed
+    conn.executescript("""CREATE TABLE escalations (id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL,
+        session TEXT, message TEXT NOT NULL, intent TEXT, confidence REAL, reason TEXT NOT NULL,
+        entities TEXT, status TEXT NOT NULL DEFAULT 'open');
+        INSERT INTO escalations (created, message, reason) VALUES (1, 'old case', 'policy');""")
+    conn.close()
+    esc = EscalationQueue(path)
+    esc.submit("Could I get a longer trial?", 'trial_extension', 0.5, 'policy', urgency=0.0, sentiment=0.3)
+    esc.submit("I was double charged AGAIN!!!", 'payment_dispute', 0.5, 'policy', urgency=0.82, sentiment=-0.2)
+    esc.flush()
+    ranked = esc.cases(order='urgency')
+    assert [c['message'] for c in ranked] == ["I was double charged AGAIN!!!", "old case", "Could I get a longer trial?"]
+    assert ranked[0]['urgency'] == 0.82 and ranked[1]['urgency'] == 0
+    esc.close()
+
+
+def test_near_identical_cases_form_one_cluster(tmp_path):
+    esc = EscalationQueue(os.path.join(str(tmp_path), "esc.db"))
+    for i, text in enumerate(["The app crashes every time I log in since the update!",
+                              "My account is locked after the password reset",
+                              "the app crashes whenever I log in since the update",
+                              "App crashes each time i log in since the update!!!"]):
+        esc.submit(text, 'app_crash', 0.5, 'policy', session=f"s{i}")
+    esc.flush()
+    root = esc.cases(session="s0")[0]['id']
+    assert [c['duplicate_of'] for c in esc.cases(order='urgency')] == [None, None, root, root]
+    [cluster] = esc.clusters()
+    assert (cluster['root'], cluster['size'], cluster['intent']) == (root, 3, 'app_crash')
+    assert esc.set_cluster_status(root, 'resolved') == 3
+    assert esc.counts() == {'open': 1, 'resolved': 3} and esc.metrics()['duplicates'] == 2
+    esc.close()
+
+
+def test_write_errors_are_counted_and_the_writer_keeps_draining(tmp_path):
+    import sqlite3
+    path = os.path.join(str(tmp_path), "esc.db")
+    esc = EscalationQueue(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TRIGGER reject BEFORE INSERT ON escalations WHEN NEW.message = 'boom' "
+                 "BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+    conn.commit()
+    esc.submit("boom", 'app_crash', 0.5, 'policy')
+    esc.flush()                     # returns although the batch failed
+    conn.execute("DROP TRIGGER reject")
+    conn.commit()
+    conn.close()
+    esc.submit("boom", 'app_crash', 0.5, 'policy')
+    esc.flush()
+    m = esc.metrics()
+    assert (m['write_errors'], m['written']) == (1, 1) and esc.counts() == {'open': 1}
+    assert esc.cases()[0]['duplicate_of'] is None   # the lost case did not start a cluster
+    esc.close()
+
+
+def test_clusters_span_processes_and_restarts(tmp_path):
+    path = os.path.join(str(tmp_path), "esc.db")
+    a, b = EscalationQueue(path), EscalationQueue(path)   # two server workers on one store
+    a.submit("The app crashes every time I log in since the update!", 'app_crash', 0.5, 'policy')
+    a.flush()
+    b.submit("the app crashes whenever I log in since the update", 'app_crash', 0.5, 'policy')
+    b.flush()
+    a.close()
+    b.close()
+    restarted = EscalationQueue(path)
+    restarted.submit("App crashes each time i log in since the update!!!", 'app_crash', 0.5, 'policy')
+    restarted.flush()
+    [cluster] = restarted.clusters()
+    assert cluster['size'] == 3 and cluster['root'] == restarted.cases(order='urgency')[0]['id']
+    restarted.close()
+
+
+def test_cases_are_written_ungrouped_without_numpy(tmp_path, monkeypatch):
+    import sys
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    monkeypatch.delitem(sys.modules, 'near_duplicates', raising=False)
+    esc = EscalationQueue(os.path.join(str(tmp_path), "esc.db"))
+    assert esc.duplicates is None
+    esc.submit("locked out", 'account_locked', 0.5, 'policy')
+    esc.submit("locked out", 'account_locked', 0.5, 'policy')
+    esc.flush()
+    assert esc.counts() == {'open': 2} and esc.metrics()['near_duplicates'] is None
+    esc.close()
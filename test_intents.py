@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for the intent registry
+Array scoring must pick the same intent as the name-keyed pattern sets it replaced, keep each
+pattern set's tie order, and the ID-indexed KB views must agree with the name-keyed ones.
+"""
+
+import pytest
+
+import logic_layer
+from intents import INTENTS, NO_INTENT, ScoreTable, by_id, intent_id, intent_name
+from nlu import INTENT_PATTERNS, TABLE, canonicalize, match_intent_id
+from test_all_commands import ALL_TEST_QUERIES
+
+
+def test_ids_round_trip():
+    assert [intent_id(name) for name in INTENTS] == list(range(len(INTENTS)))
+    assert intent_id(None) == NO_INTENT and intent_name(NO_INTENT) is None
+    assert list(INTENT_PATTERNS) == list(INTENTS)   # English tie order is registry order
+    with pytest.raises(KeyError):
+        by_id({'no_such_intent': 1})
+
+
+def test_tie_goes_to_first_intent_in_the_pattern_set():
+    text = canonicalize("dispute the charge")   # one pattern each for billing and dispute
+    assert intent_name(TABLE.best(TABLE.score(text))[0]) == 'billing_inquiry'
+    pack = ScoreTable({'payment_dispute': [r'\bdispute\b'], 'billing_inquiry': [r'\bcharge\b']})
+    assert intent_name(pack.best(pack.score(text))[0]) == 'payment_dispute'
+
+
+def test_id_views_match_name_views():
+    snap = logic_layer.snapshot()
+    for name in INTENTS:
+        iid = intent_id(name)
+        assert snap.response_by_id[iid] == snap.response(name)
+        assert snap.forced_by_id[iid] == (name in snap.forced)
+        assert snap.escalate_id(iid, 0.5) == snap.escalate(name, 0.5)
+    for queries in ALL_TEST_QUERIES.values():
+        for q in queries:
+            iid, _ = match_intent_id(q)
+            assert iid == NO_INTENT or 0 <= iid < len(INTENTS)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for language packs
+Messages are routed by the trigram detector, packs load on first use and are evicted when idle,
+and an English-only deployment builds no router at all.
+"""
+
+import chatbot
+from languages import LanguageRouter
+from test_all_commands import ALL_TEST_QUERIES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_detector_keeps_english_corpus_english():
+    router = LanguageRouter(['es', 'fr'])
+    assert router.detect("¿Dónde está mi pedido?") == 'es'
+    assert router.detect("Je n'arrive pas à me connecter") == 'fr'
+    queries = [q for qs in ALL_TEST_QUERIES.values() for q in qs]
+    english = sum(router.detect(q) == 'en' for q in queries)
+    assert english >= 0.95 * len(queries)
+
+
+def test_packs_load_on_first_use_and_evict_when_idle():
+    clock = FakeClock()
+    router = LanguageRouter(['es', 'fr'], idle_evict_s=100, clock=clock)
+    assert router.stats()['loaded'] == []
+    assert router.pack('en') is None
+    es = router.pack('es')
+    assert router.pack('es') is es and router.stats()['loads'] == 1
+    clock.now = 50
+    router.pack('fr')
+    clock.now = 120
+    assert router.evict_idle() == ['es']
+    assert router.stats()['loaded'] == ['fr']
+    assert router.pack('es') is not es and router.stats()['loads'] == 3
+
+
+def test_routing_through_the_pipeline():
+    assert chatbot.set_languages(['en']) is None     # single language: nothing to load or detect
+    router = chatbot.set_languages(['en', 'es', 'fr'])
+    try:
+        d = chatbot.process("Mi cuenta está bloqueada")
+        assert (d['language'], d['intent'], d['escalation']) == ('es', 'account_locked', 'policy')
+        assert d['response'].startswith("Esta solicitud necesita")
+        d = chatbot.process("Où est ma commande #ABC-12345 ?")
+        assert d['language'] == 'fr' and d['intent'] == 'order_status'
+        assert d['entities']['order_id'] == 'ABC-12345'
+        # misdetected English still gets an English answer
+        d = chatbot.process("Suggestion for improvement")
+        assert d['language'] == 'en' and d['intent'] == 'feature_request'
+        assert router.stats()['loaded'] == ['es', 'fr']
+    finally:
+        chatbot.set_languages(['en'])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Concurrency stress test for logic_layer
+Checks that the KB snapshot gives the same escalate/response answers as the pyDatalog engine
+when read from 32 threads at once. Run directly to print a throughput curve vs. thread count.
+"""
+
+import threading
+import time
+
+import logic_layer
+from nlu import INTENT_PATTERNS
+
+INTENTS = list(INTENT_PATTERNS) + ['unknown']
+CONFIDENCES = [0.0, 0.3, 0.39, 0.4, 0.5, 0.8, 1.0]
+CASES = [(i, c) for i in INTENTS for c in CONFIDENCES]
+
+
+def engine_answers():
+    """Reference answers straight from pyDatalog, evaluated serially."""
+    answers = {}
+    for intent, conf in CASES:
+        esc = logic_layer.ask("escalate('%s', %s, Reason)" % (intent, conf))
+        resp = logic_layer.ask("response('%s', Text)" % intent)
+        answers[(intent, conf)] = (frozenset(r for (r,) in esc.answers) if esc else frozenset(),
+                                   resp.answers[0][0] if resp else None)
+    return answers
+
+
+def snapshot_answers(snap, rounds=1):
+    answers = {}
+    for _ in range(rounds):
+        for intent, conf in CASES:
+            answers[(intent, conf)] = (snap.escalate(intent, conf), snap.response(intent))
+    return answers
+
+
+def run_threads(n_threads, target):
+    barrier = threading.Barrier(n_threads)
+    results, errors = [None] * n_threads, []
+
+    def worker(idx):
+        try:
+            barrier.wait()
+            results[idx] = target()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_snapshot_matches_engine_under_32_threads():
+    expected = engine_answers()
+    snap = logic_layer.Snapshot()  # fresh, so low_confidence memoization races too
+    results, errors = run_threads(32, lambda: snapshot_answers(snap, rounds=20))
+    assert not errors
+    assert all(r == expected for r in results)
+
+
+def test_serialized_engine_matches_under_32_threads():
+    expected = engine_answers()
+    results, errors = run_threads(32, engine_answers)
+    assert not errors
+    assert all(r == expected for r in results)
+
+
+def throughput_curve(thread_counts=(1, 2, 4, 8, 16, 32), lookups=20000):
+    snap = logic_layer.snapshot()
+    rounds = max(1, lookups // len(CASES))
+    print(f"{'threads':>8} | {'lookups/s':>12}")
+    for n in thread_counts:
+        start = time.perf_counter()
+        _, errors = run_threads(n, lambda: snapshot_answers(snap, rounds=rounds))
+        elapsed = time.perf_counter() - start
+        assert not errors
+        print(f"{n:>8} | {n * rounds * len(CASES) / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    test_snapshot_matches_engine_under_32_threads()
+    test_serialized_engine_matches_under_32_threads()
+    print("Snapshot and serialized engine agree with the serial engine under 32 threads.")
+    throughput_curve()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for the near-duplicate index
+Reworded messages must join the first message's cluster, unrelated ones must not, and the window
+and age limits must let old messages go without growing memory.
+"""
+
+import pytest
+
+from near_duplicates import NearDuplicateIndex
+
+INCIDENT = ["The app crashes every time I try to log in since the update!",
+            "the app crashes whenever I try to log in since the update",
+            "App crashes each time i try to login since the update!!"]
+OTHER = ["I want a refund for order ABC-12345", "How do I change my email address?",
+         "My card was declined at checkout", "the app is slow"]
+
+
+def test_reworded_messages_share_a_cluster():
+    index = NearDuplicateIndex(window=64)
+    assert [index.assign(text, i) for i, text in enumerate(INCIDENT + OTHER)] == [0, 0, 0, 3, 4, 5, 6]
+    assert index.assign("", 7) is None
+    cluster, similarity = index.match(index.signature("the app crashes every time i try to log in since the update"))
+    assert cluster == 0 and similarity > 0.9
+    s = index.stats()
+    assert (s['indexed'], s['matched']) == (7, 3)
+
+
+def test_signatures_are_fixed_size_and_deterministic():
+    a, b = NearDuplicateIndex(window=8), NearDuplicateIndex(window=8)
+    assert a.signature("hi").shape == a.signature(INCIDENT[0] * 20).shape == (a.perms,)
+    assert (a.signature(INCIDENT[0]) == b.signature(INCIDENT[0])).all()
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(perms=64, bands=10)
+
+
+def test_window_and_age_evict_old_messages():
+    now = [0.0]
+    index = NearDuplicateIndex(window=4, max_age_s=60, clock=lambda: now[0])
+    memory = index.stats()['memory_mb']
+    index.assign(INCIDENT[0], 0)
+    for i, text in enumerate(OTHER):   # four newer messages overwrite the only incident slot
+        index.assign(text, 10 + i)
+    assert index.assign(INCIDENT[1], 20) == 20
+    now[0] = 61.0
+    assert index.assign(INCIDENT[2], 30) == 30   # the incident cluster is older than max_age_s
+    assert index.stats()['indexed'] == 4 and index.stats()['memory_mb'] == memory
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the NLU layer (canonicalization, intent matching, entity extraction)
+"""
+
+import chatbot
+from nlu import (canonicalize, dedupe, match_intent, correct_token, correct_typos, TYPO_PENALTY,
+                 extract_entities, entity_types_for)
+
+
+def test_surface_variants_share_one_key():
+    variants = ["Where is my order?", "where is my order", "Where's my order??",
+                "  WHERE IS MY ORDER ", "Where’s my order 📦"]
+    assert {canonicalize(v) for v in variants} == {"where is my order"}
+
+
+def test_contractions_expand_before_matching():
+    assert canonicalize("I can't log in") == "i cannot log in"
+    assert match_intent("I can't log in") == match_intent("I cannot log in") == ('password_reset', 0.5)
+
+
+def test_token_internal_punctuation_is_kept():
+    assert canonicalize("Track order #ABC-12345.") == "track order abc-12345"
+    assert canonicalize("Paid $19.99, mail me at a.b@example.com!") == "paid $19.99 mail me at a.b@example.com"
+
+
+def test_dedupe_maps_each_message_to_its_key():
+    keys, index = dedupe(["Refund?", "refund", "Pricing", "REFUND!!"])
+    assert keys == ["refund", "pricing"]
+    assert index == [0, 0, 1, 0]
+
+
+def test_misspelled_keywords_match_with_penalty():
+    assert correct_typos("i want a refnd") == ("i want a refund", 1)
+    assert match_intent("I forgot my pasword") == ('password_reset', round(0.5 - TYPO_PENALTY, 2))
+    assert match_intent("send me the invocie")[0] in ('billing_inquiry', 'invoice_request')
+
+
+def test_everyday_words_are_not_corrected():
+    assert correct_typos("there is a problem with yours") == ("there is a problem with yours", 0)
+    # real words one or two edits from a keyword (locked, error, price, plans, order, login, ...)
+    for word in ("blocked", "looked", "rocked", "terror", "prince", "plane", "plant", "border", "logic",
+                 "expert", "shopping", "modification", "trace"):
+        assert correct_token(word) is None, word
+
+
+def test_real_words_do_not_invent_intents():
+    assert match_intent("The order page looked fine yesterday") == (None, 0.0)
+    assert match_intent("I bought a gift for the prince") == (None, 0.0)
+    assert match_intent("which plane should I take") == (None, 0.0)
+    assert match_intent("what a terror") == (None, 0.0)
+    looked = chatbot.process("The order page looked fine yesterday")
+    assert looked['intent'] is None and looked['escalation'] == 'low_confidence'
+
+
+def test_entity_extraction_limited_to_intent_needs():
+    text = "Track order #ABC-12345, mail me at jo@example.com"
+    assert extract_entities(text) == {'order_id': 'ABC-12345', 'email': 'jo@example.com'}
+    assert extract_entities(text, {'email'}) == {'email': 'jo@example.com'}
+    assert 'money' not in entity_types_for('business_hours')
+    assert {'date', 'money'} <= entity_types_for('refund_status')
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for order-status lookups
+Lookups must come from the store and then the TTL cache, batches must be answered with one statement
+per chunk, a saturated pool must be reported, and order_status replies must carry the live status.
+"""
+
+import sqlite3
+
+import pytest
+
+import chatbot
+from intents import intent_id
+from orders import BATCH_CHUNK, OrderLookup, format_status, seed
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "orders.db")
+    ids = seed(path, orders=100)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("UPDATE orders SET status = 'shipped', carrier = 'UPS', eta = 'Mar 14' "
+                     "WHERE order_id = 'ABC-12345'")
+    conn.close()
+    return path, ids
+
+
+def test_lookup_uses_the_ttl_cache(store):
+    path, _ = store
+    now = [0.0]
+    orders = OrderLookup(path, ttl_s=30, clock=lambda: now[0])
+    try:
+        assert orders.lookup('abc-12345')['status'] == 'shipped'
+        assert orders.lookup('NOPE-000000') is None
+        assert orders.lookup('ABC-12345')['carrier'] == 'UPS'
+        now[0] = 31.0
+        orders.lookup('ABC-12345')
+        s = orders.stats()
+        assert (s['lookups'], s['cache_hits'], s['queries'], s['not_found']) == (4, 1, 3, 1)
+        assert s['pool']['acquired'] == 3 and s['pool']['in_use'] == 0
+    finally:
+        orders.close()
+
+
+def test_lookup_many_uses_one_statement_per_chunk(store):
+    path, ids = store
+    orders = OrderLookup(path)
+    try:
+        wanted = ids[:BATCH_CHUNK + 3] + ['MISSING-1']
+        found = orders.lookup_many(wanted)
+        assert set(found) == set(wanted) and found['MISSING-1'] is None
+        assert all(found[i]['order_id'] == i for i in ids[:BATCH_CHUNK + 3])
+        assert orders.stats()['queries'] == 2
+    finally:
+        orders.close()
+
+
+def test_saturated_pool_times_out(store):
+    path, _ = store
+    orders = OrderLookup(path, pool_size=1, timeout=0.01)
+    try:
+        held = orders.pool.acquire()
+        with pytest.raises(TimeoutError):
+            orders.lookup('ABC-12345')
+        orders.pool.release(held)
+        assert orders.lookup('ABC-12345') is not None
+        pool = orders.stats()['pool']
+        assert (pool['timeouts'], pool['max_in_use']) == (1, 1) and pool['saturation'] > 0
+    finally:
+        orders.close()
+
+
+def test_order_status_replies_carry_the_live_status(store):
+    path, ids = store
+    chatbot.start_orders(path)
+    try:
+        d = chatbot.process("Where is my order #ABC-12345?")
+        assert d['response'] == "Order ABC-12345 has shipped with UPS, expected Mar 14."
+        assert d['order']['status'] == 'shipped'
+        assert 'order' not in chatbot._lookup(d['key'], count=False)   # statuses are never cached
+        assert chatbot.process("Where is my order?")['response'] == chatbot._response_text(intent_id('order_status'))
+        # words after "order" are not IDs; an ID needs a digit
+        assert chatbot.process("What's my order status?")['response'] == chatbot._response_text(intent_id('order_status'))
+        assert chatbot.process("where is my order number ABC-12345")['order']['order_id'] == 'ABC-12345'
+        replies = chatbot.handle_batch([f"where is order {i}" for i in ids[1:4]] + ["track order ZZZZZZZ9"])
+        assert replies[-1] == format_status('ZZZZZZZ9', None)
+        assert all(r.startswith(f"Order {i} ") for r, i in zip(replies, ids[1:4]))
+    finally:
+        chatbot.stop_orders()
+        chatbot.clear_cache()
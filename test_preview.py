@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for the as-you-type intent preview
+Incremental matching must agree with a from-scratch regex match for every prefix, including after
+edits in the middle of the text, the preview must rank segments like sending does, and the worker
+must only report the newest request.
+"""
+
+import random
+import time
+
+from intents import intent_name
+from loadgen import long_message
+from nlu import match_intent
+from preview import IncrementalMatcher, MessagePreview, PreviewWorker
+from segments import analyze
+from test_all_commands import ALL_TEST_QUERIES
+
+
+def test_typing_matches_full_regex_match():
+    matcher = IncrementalMatcher()
+    for queries in ALL_TEST_QUERIES.values():
+        for q in queries:
+            matcher.update("")
+            for n in range(1, len(q) + 1):
+                assert matcher.update(q[:n]) == match_intent(q[:n], fuzzy=False), q[:n]
+
+
+def test_long_message_with_edits():
+    rng = random.Random(3)
+    matcher = IncrementalMatcher()
+    text = long_message(rng)
+    for n in range(1, len(text) + 1, 7):
+        matcher.update(text[:n])
+    edited = "I want my money back. " + text[len(text) // 2:]   # edit before the settled prefix
+    assert matcher.update(edited) == match_intent(edited, fuzzy=False)
+    assert matcher.update(text) == match_intent(text, fuzzy=False)
+
+
+def test_gap_patterns_match_however_far_apart_their_ends_are():
+    # \bwhere.*order\b, \bwhen.*open\b and \bsomething.*wrong\b with many words in the gap
+    messages = ["Where did the package I bought from you last month go, it is an order for my mom",
+                "When are you guys going to be open again for support",
+                "Something about the checkout page seems really quite wrong",
+                "I would like to know if there is some way that I could maybe export all of my data"]
+    matcher = IncrementalMatcher()
+    for text in messages:
+        matcher.update("")
+        for n in range(1, len(text) + 1):
+            assert matcher.update(text[:n]) == match_intent(text[:n], fuzzy=False), text[:n]
+        assert matcher.update(text)[0] is not None
+
+
+def test_preview_ranks_segments_like_sending():
+    def sent(text):
+        iid, confidence = analyze(text, fuzzy=False).best()
+        return intent_name(iid), confidence
+
+    rng = random.Random(5)
+    messages = ["What is the price? I'd also like to know about delivery.",
+                "The app keeps freezing. Also, I want to dispute a charge and where is my order",
+                long_message(rng), long_message(rng)]
+    preview = MessagePreview()
+    for text in messages:
+        preview.update("")
+        for n in range(1, len(text) + 1):
+            assert preview.update(text[:n]) == sent(text[:n]), text[:n]
+    assert preview.update(messages[0])[0] == 'pricing'   # whole-text matching says order_status
+    edited = messages[0].replace("price", "refund")
+    assert preview.update(edited) == sent(edited)
+
+
+def test_worker_reports_newest_preview():
+    worker = PreviewWorker()
+    for partial in ("Where", "Where is my", "Where is my refund"):
+        worker.submit(partial)
+    while worker.pending:
+        time.sleep(0.001)
+    result = worker.poll()
+    assert result['intent'] == 'refund_status' and result['suggestion']
+    assert worker.poll() is None
+    worker.submit("My account is locked")
+    while worker.pending:
+        time.sleep(0.001)
+    assert worker.poll()['suggestion'] == "A specialist will pick this up."
+    worker.close()
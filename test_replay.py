@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for decision-diff replay
+Each kind of change must be classified, and a real pattern change between two copies of the
+tree must show up (and only it) when a corpus is replayed through both.
+"""
+
+import io
+import json
+import shutil
+
+from replay import ROOT, diff_decisions, replay
+
+
+def test_change_kinds():
+    same = ('refund_status', 0.5, None, "Refunds are processed ...")
+    assert diff_decisions(same, same) == []
+    assert diff_decisions(same, ('refund_status', 0.52, None, same[3])) == []
+    assert diff_decisions(same, (None, 0.0, 'low_confidence', "escalating")) == [
+        'intent', 'confidence', 'escalated', 'response']
+    assert diff_decisions(('account_locked', 0.5, 'policy', "x"), ('account_locked', 0.5, None, "x")) == ['de-escalated']
+
+
+def test_replay_reports_a_pattern_change(tmp_path):
+    base, candidate = tmp_path / "base", tmp_path / "candidate"
+    for target in (base, candidate):
+        shutil.copytree(ROOT, target, ignore=shutil.ignore_patterns('.git', '__pycache__', 'logs', 'run', '*.db*'))
+    nlu = candidate / "nlu.py"
+    nlu.write_text(nlu.read_text(encoding="utf-8").replace(r"r'\brefund\b', ", ""), encoding="utf-8")
+    texts = ["Where is my order?", "I want a refund", "Reset my password"] * 5
+    out = io.StringIO()
+    summary = replay(str(base), str(candidate), iter(texts), out, workers=1, batch=4)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert summary['messages'] == 15 and summary['changed'] == 5
+    assert {r['text'] for r in rows} == {"I want a refund"}
+    assert [r['n'] for r in rows] == [1, 4, 7, 10, 13]
+    assert rows[0]['before']['intent'] == 'refund_status' and 'escalated' in rows[0]['changes']
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for segment-level intent analysis
+Streaming segmentation must match one-shot segmentation, every request in a multi-issue message
+must be ranked, and a forced-escalation clause must escalate the message and stop the analysis.
+"""
+
+import random
+
+import chatbot
+from loadgen import long_message
+from segments import Segmenter, analyze, analyze_stream, segments
+
+
+def test_streaming_matches_one_shot():
+    rng = random.Random(4)
+    for _ in range(50):
+        text = long_message(rng) + ", also the app keeps freezing\nand I want a refund; thanks"
+        segmenter, got, i = Segmenter(), [], 0
+        while i < len(text):
+            step = rng.randint(1, 12)
+            got += segmenter.feed(text[i:i + step])
+            i += step
+        assert got + segmenter.finish() == segments(text)
+    assert segments("It costs $19.99. Why?") == ["It costs $19.99.", "Why?"]
+
+
+def test_multi_intent_ranking():
+    result = analyze("Where is my order? Also, how much is the premium plan? And I want my money back").result()
+    assert result['intent'] == 'pricing' and result['segments'] == 3
+    assert [i for i, _ in result['intents']] == ['pricing', 'order_status', 'refund_status']
+    assert not result['forced']
+
+
+def test_forced_clause_escalates_and_stops_early():
+    consumed = []
+
+    def chunks():
+        for part in ["The app keeps freezing. ", "My account is locked. ", "Where is my order? ", "Refund?"]:
+            consumed.append(part)
+            yield part
+
+    analyzer = analyze_stream(chunks())
+    assert analyzer.result()['intent'] == 'account_locked' and analyzer.done
+    assert len(consumed) == 3   # the boundary after "locked." is only certain once more text arrives
+    d = chatbot.process("The app keeps freezing, but also my account is locked")
+    assert d['intent'] == 'account_locked' and d['escalation'] == 'policy'
+    assert [i for i, _ in d['intents']] == ['account_locked', 'app_crash']
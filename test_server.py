@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for the pre-fork server
+A real master with two forked workers must answer traffic, replace workers that reach
+--max-requests, roll every worker on SIGHUP, write per-worker metrics files and exit cleanly.
+"""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from server import Client, read_status
+from shared_cache import SHM_DIR
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork mode is POSIX only")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _ask(port: int, text: str) -> dict:
+    client = Client(port=port)   # a new connection each time, so any worker may take it
+    try:
+        return client.query(text)
+    finally:
+        client.close()
+
+
+def _children(pid: int) -> set:
+    """Live child processes (exited workers the master has not reaped yet are left out)."""
+    out = subprocess.run(["ps", "-o", "pid=,stat=", "--ppid", str(pid)], capture_output=True, text=True).stdout
+    return {int(child) for child, stat in (line.split() for line in out.splitlines()) if not stat.startswith("Z")}
+
+
+def _until(predicate, timeout: float = 20.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            value = predicate()
+            if value:
+                return value
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError("timed out")
+
+
+def test_workers_are_recycled_rolled_and_report_metrics(tmp_path):
+    port, metrics = _free_port(), str(tmp_path / "metrics")
+    master = subprocess.Popen(
+        [sys.executable, "server.py", "serve", "--port", str(port), "--workers", "2", "--max-requests", "10",
+         "--no-record", "--metrics-dir", metrics, "--warm-top", "0", "--shared-cache-slots", "64",
+         "--orders-db", ""],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    try:
+        _until(lambda: _ask(port, "Where is my order?"))
+        pids = set()
+        for i in range(60):
+            reply = _ask(port, ["Where is my order?", "What are your prices?", "My account is locked"][i % 3])
+            assert reply['intent'] and reply['response']
+            pids.add(reply['worker'])
+        assert len(pids) > 2                    # workers past --max-requests were replaced
+
+        rows = _until(lambda: len(read_status(metrics)) == 2 and read_status(metrics))
+        assert sorted(row['worker'] for row in rows) == [0, 1]
+        assert sum(row['requests'] for row in rows) and all(row['cache']['host'] for row in rows)
+
+        idle = {}                               # keep-alive connections hold both old workers open
+        end = time.time() + 20
+        while len(idle) < 2 and time.time() < end:
+            client = Client(port=port)          # (metrics calls do not count towards --max-requests)
+            m = client.call({'cmd': 'metrics'})
+            if m['pid'] in idle or m['requests'] >= 10:   # a recycling worker is about to exit anyway
+                client.close()
+            else:
+                idle[m['pid']] = client
+        before = _until(lambda: _children(master.pid) == set(idle) and set(idle))
+        master.send_signal(signal.SIGHUP)
+        # both replacements start at once, without waiting for the held workers to drain
+        rolled = _until(lambda: (lambda now: len(now - before) == 2 and now)(_children(master.pid)), timeout=5)
+        assert before <= rolled
+        for client in idle.values():
+            client.close()
+        # old workers finish what they hold and exit; the two new ones take over
+        after = _until(lambda: (lambda now: len(now) == 2 and not now & before and now)(_children(master.pid)))
+        assert after == rolled - before
+        assert _ask(port, "Refund status")['worker'] in after
+    finally:
+        master.send_signal(signal.SIGTERM)
+        output = master.communicate(timeout=60)[0].decode()
+    assert master.returncode == 0, output
+    assert "listening on" in output
+    assert not os.path.exists(os.path.join(SHM_DIR, f"chatbot-cache-{port}"))
+    for row in read_status(metrics):            # final dumps from the workers that shut down
+        assert json.dumps(row) and row['pid'] not in before
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for the shared response cache
+The slot table must round-trip decisions and evict with CLOCK, a decision cached by one process
+must be a hit in another, and hit counters must add up across the host.
+"""
+
+import os
+
+import chatbot
+from shared_cache import ResponseCache
+
+DECISION = {'key': 'where is my order', 'intent': 'order_status', 'confidence': 0.5, 'entities': {},
+            'escalation': None, 'response': "You can track your order in My Orders -> Track."}
+
+
+def test_round_trip_and_oversized_values():
+    cache = ResponseCache.local()
+    assert cache.get('where is my order') is None
+    assert cache.put('where is my order', DECISION)
+    assert cache.get('where is my order') == DECISION
+    assert cache.put('where is my order', dict(DECISION, confidence=1.0))
+    assert cache.get('where is my order')['confidence'] == 1.0
+    assert not cache.put('huge', dict(DECISION, response='x' * 2000))
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['puts'], stats['too_large'], stats['used']) == (2, 1, 2, 1, 1)
+
+
+def test_clock_spares_recently_read_entries():
+    cache = ResponseCache.local(slots=8, ways=8)   # one set: every key competes for the same 8 slots
+    for i in range(8):
+        cache.put(f"q{i}", DECISION)
+    for i in range(4):
+        cache.get(f"q{i}")
+    cache.put("new", DECISION)
+    assert cache.get("q4") is None                 # first entry without its reference bit
+    assert all(cache.get(f"q{i}") for i in (0, 1, 2, 3, 5, 6, 7)) and cache.get("new")
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_and_counters_are_shared_across_processes(tmp_path):
+    cache = ResponseCache.create(str(tmp_path / "cache"), slots=64)
+    try:
+        pid = os.fork()
+        if pid == 0:
+            code = 0 if cache.put('refund status', DECISION) and cache.get('refund status') else 1
+            os._exit(code)
+        assert os.waitpid(pid, 0)[1] == 0
+        other = ResponseCache.attach(cache.path)   # a process that was not forked from the creator
+        assert other.get('refund status') == DECISION
+        other.close()
+        stats = cache.stats()
+        assert (stats['hits'], stats['puts'], stats['backend']) == (2, 1, 'shared')
+    finally:
+        cache.close(unlink=True)
+
+
+def test_pipeline_uses_the_shared_cache():
+    cache = chatbot.set_shared_cache(ResponseCache.local())
+    try:
+        first = chatbot.process("Where's my order??")
+        second = chatbot.process("where is my order")
+        assert second['intent'] == first['intent'] and second['text'] == "where is my order"
+        host = chatbot.cache_stats()['host']
+        assert (host['hits'], host['used']) == (1, 1)
+        assert cache.get(first['key'])['response'] == first['response']
+    finally:
+        chatbot.set_shared_cache(None)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for startup profiling
+A fixed `-X importtime` sample must parse into rows with the right depths, summarize into
+per-package totals and slowest modules, and startup marks must keep their first timing.
+"""
+
+from startup_profile import StartupTimer, format_summary, import_profile, parse_importtime, summarize
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        300 |     encodings.aliases
+import time:       500 |        800 |   encodings
+import time:      1000 |       1000 | re
+import time:      2000 |       2500 | json
+import time:       400 |        400 |   json.decoder
+import time:      3000 |       4000 | json.scanner
+Traceback (most recent call last):
+"""
+
+
+def test_parse_importtime_sample():
+    rows = parse_importtime(SAMPLE)
+    assert rows[0] == ('_io', 120, 120, 1)
+    assert rows[1] == ('encodings.aliases', 300, 300, 2)
+    assert [(name, depth) for name, _s, _c, depth in rows[3:]] == [
+        ('re', 0), ('json', 0), ('json.decoder', 1), ('json.scanner', 0)]
+
+
+def test_summarize_totals_top_level_imports_only():
+    summary = summarize(parse_importtime(SAMPLE), top=2)
+    assert summary['total_ms'] == 7.5            # re + json + json.scanner
+    assert summary['modules'] == 7
+    assert summary['packages_ms'] == {'json': 6.5, 're': 1.0}
+    assert list(summary['slowest_self_ms']) == ['json.scanner', 'json']
+    assert "Import total: 7.5 ms across 7 modules" in format_summary(summary)
+
+
+def test_import_profile_runs_a_fresh_interpreter():
+    rows = import_profile('json')
+    assert any(name == 'json' and depth == 0 for name, _s, _c, depth in rows)
+
+
+def test_startup_timer_keeps_the_first_mark():
+    timer = StartupTimer(t0=0.0)
+    timer.mark('window_shown')
+    first = timer.marks['window_shown']
+    timer.mark('window_shown')
+    assert timer.marks['window_shown'] == first and 'window_shown' in timer.report()
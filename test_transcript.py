@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for the paged chat transcript
+Older pages must come back complete and in order, and opening a long history must only read
+the most recent page.
+"""
+
+import time
+
+from transcript import Transcript
+
+
+def test_pages_walk_back_through_history(tmp_path):
+    t = Transcript("s1", directory=str(tmp_path))
+    for i in range(1234):
+        t.append("user" if i % 2 == 0 else "bot", f"message {i} — ünïcode")
+    t.close()
+
+    reader = Transcript("s1", directory=str(tmp_path))
+    seen, offset = [], None
+    while offset != 0:
+        records, offset = reader.read_page(offset, limit=100)
+        seen = records + seen
+    reader.close()
+    assert [r['text'] for r in seen] == [f"message {i} — ünïcode" for i in range(1234)]
+
+
+def test_empty_transcript_has_no_pages(tmp_path):
+    t = Transcript("empty", directory=str(tmp_path))
+    assert t.read_page() == ([], 0)
+    t.close()
+
+
+def test_last_page_cost_independent_of_history_length(tmp_path):
+    big = Transcript("big", directory=str(tmp_path))
+    for i in range(50000):
+        big.append("user", f"customer message number {i} about an order")
+    big.close()
+    small = Transcript("small", directory=str(tmp_path))
+    small.append("user", "hello")
+    small.close()
+
+    def open_time(session):
+        start = time.perf_counter()
+        for _ in range(20):
+            t = Transcript(session, directory=str(tmp_path))
+            t.read_page()
+            t.close()
+        return time.perf_counter() - start
+
+    reader = Transcript("big", directory=str(tmp_path))
+    records, offset = reader.read_page()
+    reader.close()
+    assert len(records) == 50 and records[-1]['text'].endswith("49999 about an order") and offset > 0
+    # generous bound: a full scan of 50k lines would be orders of magnitude slower
+    assert open_time("big") < 10 * open_time("small") + 0.05
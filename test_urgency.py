@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for urgency and sentiment scoring
+Negations, intensifiers, all-caps and repeated punctuation move the scores; very urgent messages
+escalate even when the bot could answer them, and scoring stays well under 100 us.
+"""
+
+import time
+
+import chatbot
+import logic_layer
+from intents import intent_id
+from urgency import score_message
+
+
+def test_rules_move_the_scores():
+    calm_u, calm_s = score_message("I was charged twice")
+    angry_u, angry_s = score_message("I was charged twice AGAIN!!!")
+    assert angry_u > calm_u and angry_s < calm_s
+    assert score_message("I am happy")[1] > 0 > score_message("I am not happy")[1]
+    assert score_message("really angry")[1] < score_message("angry")[1] < 0
+    assert score_message("not urgent, just asking")[0] == 0.0
+    assert score_message("order ABC-12345 please")[0] == 0.0       # codes are not shouting
+    urgency, sentiment = score_message("Thanks, this was helpful!")
+    assert urgency == 0.0 and sentiment > 0
+
+
+def test_urgent_messages_escalate_with_their_scores():
+    polite = chatbot.process("What are your support hours? Thanks!")
+    assert polite['escalation'] is None and polite['sentiment'] > 0
+    shouted = chatbot.process("WHAT ARE YOUR SUPPORT HOURS?!! This is UNACCEPTABLE")
+    assert shouted['intent'] == 'business_hours' and shouted['escalation'] == 'urgent'
+    assert shouted['urgency'] >= 0.8 and shouted['response'] == chatbot.ESCALATION_REPLIES['urgent']
+    # same canonical key as the polite variant, but scored per message
+    again = chatbot.process("what are your support hours")
+    assert again['escalation'] is None and again['urgency'] < 0.8
+
+
+def test_urgency_escalation_is_decided_by_the_kb(monkeypatch):
+    snap = logic_layer.snapshot()
+    calls = []
+    escalate_id = snap.escalate_id
+    monkeypatch.setattr(snap, 'escalate_id', lambda *args: calls.append(args) or escalate_id(*args))
+    d = chatbot.process("WHERE IS MY ORDER?!! This is UNACCEPTABLE")
+    assert d['escalation'] == 'urgent'
+    assert (intent_id('order_status'), d['confidence'], d['urgency']) in calls
+    # a policy escalation keeps its own reason whatever the urgency
+    assert chatbot.process("MY ACCOUNT IS LOCKED!!! FIX IT NOW")['escalation'] == 'policy'
+
+
+def test_scoring_cost():
+    text = "I have been waiting for WEEKS and I was double charged AGAIN!!! This is really not acceptable."
+    n = 5000
+    start = time.perf_counter()
+    for _ in range(n):
+        score_message(text)
+    assert (time.perf_counter() - start) / n < 100e-6
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tests for startup cache warming
+Quick replies and the most frequent historical queries are cached before traffic, within a time
+budget, and live lookups answered from warmed entries are counted.
+"""
+
+import json
+import os
+
+import chatbot
+from shared_cache import ResponseCache
+from warmup import QUICK_REPLIES, CacheWarmer, top_queries, warm_texts
+
+
+def write_log(directory, inputs):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "decisions-20240101-000000.jsonl"), "w", encoding="utf-8") as f:
+        for text in inputs:
+            f.write(json.dumps({'input': text, 'normalized': chatbot.canonicalize(text)}) + "\n")
+        f.write('{"input": "older log"}\n[1, 2]\n')   # records from other writers are ignored
+        f.write('{"input": "cut sh')   # torn last line is ignored
+
+
+def test_top_queries_by_canonical_frequency(tmp_path):
+    logs = str(tmp_path / "logs")
+    write_log(logs, ["Where's my refund??"] * 2 + ["where is my refund"] + ["I forgot my password"] * 2
+                    + ["cancel please"])
+    assert top_queries(logs, 2) == ["Where's my refund??", "I forgot my password"]
+    assert warm_texts(1, logs) == QUICK_REPLIES + ["Where's my refund??"]
+
+
+def test_warm_cache_and_live_coverage():
+    chatbot.clear_cache()
+    report = CacheWarmer(QUICK_REPLIES + ["Where is my order??"]).start().wait()
+    assert report['warmed'] == 5 and report['computed'] == 4 and not report['timed_out']
+    assert chatbot.cache_stats()['hits'] == 0          # priming is not traffic
+    chatbot.handle_query("refund status")
+    chatbot.handle_query("How do I update my billing address?")
+    stats = chatbot.cache_stats()
+    assert stats['warm_hits'] == 1 and stats['warm_coverage'] == 0.5
+
+
+def test_budget_stops_warming():
+    chatbot.clear_cache()
+    report = CacheWarmer(QUICK_REPLIES, budget_s=0).run()
+    assert report['warmed'] == 0 and report['timed_out'] and report['skipped'] == len(QUICK_REPLIES)
+
+
+def test_report_counts_the_shared_cache():
+    chatbot.set_shared_cache(ResponseCache.local(slots=64))
+    try:
+        report = CacheWarmer(QUICK_REPLIES).run()
+        assert report['cache_size'] == len(QUICK_REPLIES) == chatbot.cache_stats()['host']['used']
+    finally:
+        chatbot.set_shared_cache(None)
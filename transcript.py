@@ -0,0 +1,86 @@
+# transcript.py
+# Append-only on-disk chat transcript (one JSON object per line) with buffered background writes
+# and backwards paging, so opening a long history only reads the most recent page.
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+TRANSCRIPT_DIR = "transcripts"
+PAGE_SIZE = 50           # messages per page loaded into the chat view
+READ_BLOCK = 64 * 1024   # bytes read per step when scanning backwards
+WRITE_BATCH = 256        # max records per buffered write
+
+_CLOSE = object()
+
+
+class Transcript:
+    def __init__(self, session: str = "default", directory: str = TRANSCRIPT_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{session}.jsonl")
+        self._io_lock = threading.Lock()   # a page read never sees a half-written batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="transcript-writer", daemon=True)
+        self._writer.start()
+
+    # --- writing (off the UI thread) ---
+    def append(self, role: str, text: str, ts: Optional[str] = None):
+        """Queue a message for writing; never blocks on disk."""
+        self._queue.put({'ts': ts or datetime.now().isoformat(timespec='seconds'),
+                         'role': role, 'text': text})
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while batch[-1] is not _CLOSE and len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [r for r in batch if r is not _CLOSE]
+            if records:
+                data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+                with self._io_lock, open(self.path, "ab") as f:
+                    f.write(data)
+            for _ in batch:
+                self._queue.task_done()
+            if batch[-1] is _CLOSE:
+                return
+
+    def flush(self):
+        """Block until every queued message is on disk."""
+        self._queue.join()
+
+    def close(self):
+        """Flush pending writes and stop the writer thread."""
+        self._queue.put(_CLOSE)
+        self._writer.join()
+
+    # --- reading (backwards paging) ---
+    def read_page(self, before: Optional[int] = None, limit: int = PAGE_SIZE) -> Tuple[List[Dict[str, Any]], int]:
+        """Return up to `limit` records ending just before byte offset `before` (default: end of file).
+
+        Records come back oldest first, together with the offset of the first one; pass that offset
+        as `before` to fetch the previous page. An offset of 0 means the start of history was reached.
+        Cost is proportional to the page, not to the transcript length.
+        """
+        if not os.path.exists(self.path):
+            return [], 0
+        with self._io_lock, open(self.path, "rb") as f:
+            end = f.seek(0, os.SEEK_END) if before is None else before
+            pos, chunk = end, b""
+            while pos > 0 and chunk.count(b"\n") <= limit:
+                step = min(READ_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step) + chunk
+        lines = chunk.split(b"\n")
+        if lines and lines[-1] == b"":
+            lines.pop()
+        if pos > 0:
+            lines = lines[1:]  # may start mid-record; it belongs to an earlier page
+        page = lines[-limit:] if limit else []
+        start = end - sum(len(line) + 1 for line in page)
+        return [json.loads(line) for line in page], start
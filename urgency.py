@@ -0,0 +1,108 @@
+# urgency.py
+# Lexicon-and-rules urgency/sentiment scorer used to prioritize escalations.
+# One regex tokenization pass over the raw message (casing and punctuation matter here, so it does
+# not use the canonical form) and one dict lookup per token:
+#   - lexicon words carry a valence (-1..1) and an urgency weight;
+#   - a negation flips and dampens the valence of the next few words ("not happy");
+#   - an intensifier multiplies the next scored word ("really angry");
+#   - ALL-CAPS words are amplified and count as shouting; runs of !/? add urgency.
+# No model, no download; a typical message scores in ~10-20 us.
+# Usage: python urgency.py "I was double charged AGAIN!!!"
+import math
+import re
+from typing import Tuple
+
+# word -> (valence, urgency)
+LEXICON = {
+    # anger / distress
+    'angry': (-0.8, 0.4), 'furious': (-1.0, 0.6), 'livid': (-1.0, 0.6), 'outraged': (-1.0, 0.6),
+    'terrible': (-0.8, 0.2), 'awful': (-0.8, 0.2), 'horrible': (-0.8, 0.2), 'worst': (-0.9, 0.3),
+    'unacceptable': (-1.0, 0.5), 'ridiculous': (-0.8, 0.3), 'absurd': (-0.7, 0.3),
+    'frustrated': (-0.7, 0.3), 'frustrating': (-0.7, 0.3), 'annoyed': (-0.6, 0.2),
+    'annoying': (-0.6, 0.2), 'upset': (-0.6, 0.3), 'disappointed': (-0.6, 0.1),
+    'useless': (-0.7, 0.2), 'hate': (-0.8, 0.2), 'bad': (-0.5, 0.0), 'poor': (-0.4, 0.0),
+    'wrong': (-0.4, 0.1), 'broken': (-0.5, 0.2), 'scam': (-1.0, 0.7), 'fraud': (-1.0, 0.8),
+    'stolen': (-0.9, 0.8), 'steal': (-0.9, 0.6), 'lawyer': (-0.8, 0.8), 'sue': (-0.9, 0.8),
+    'complaint': (-0.5, 0.3), 'unhappy': (-0.6, 0.2), 'fed': (-0.3, 0.2), 'sick': (-0.3, 0.1),
+    # urgency
+    'urgent': (0.0, 0.8), 'urgently': (0.0, 0.8), 'asap': (0.0, 0.7), 'immediately': (0.0, 0.7),
+    'emergency': (-0.3, 1.0), 'critical': (-0.2, 0.7), 'now': (0.0, 0.2), 'again': (-0.2, 0.5),
+    'still': (-0.1, 0.3), 'already': (0.0, 0.2), 'deadline': (0.0, 0.4), 'today': (0.0, 0.2),
+    'waiting': (-0.2, 0.3), 'weeks': (-0.1, 0.2), 'days': (0.0, 0.1), 'twice': (-0.2, 0.3),
+    # politeness / satisfaction
+    'thanks': (0.5, 0.0), 'thank': (0.5, 0.0), 'great': (0.6, 0.0), 'good': (0.4, 0.0),
+    'love': (0.6, 0.0), 'happy': (0.6, 0.0), 'awesome': (0.7, 0.0), 'excellent': (0.7, 0.0),
+    'appreciate': (0.5, 0.0), 'helpful': (0.5, 0.0), 'please': (0.1, 0.0), 'kindly': (0.2, 0.0),
+    'wonderful': (0.7, 0.0), 'nice': (0.4, 0.0),
+}
+INTENSIFIERS = {'very': 1.5, 'really': 1.5, 'so': 1.3, 'extremely': 2.0, 'absolutely': 1.8,
+                'totally': 1.5, 'completely': 1.5, 'incredibly': 1.8, 'super': 1.4, 'seriously': 1.6}
+NEGATIONS = frozenset({'not', 'no', 'never', 'nothing', 'neither', 'nor', 'without', 'cannot', 'hardly'})
+ACRONYMS = frozenset({'API', 'PDF', 'IOS', 'SMS', 'FAQ', 'URL', 'VPN', 'USD', 'EUR', 'GBP', 'INR',
+                      'IST', 'CSV', 'SSO', 'FYI', 'ASAP', 'APP'})
+
+NEGATION_WINDOW = 3      # words after a negation whose valence is flipped
+NEGATED_DAMPING = 0.5    # "not happy" is milder than "unhappy"
+CAPS_BOOST = 1.5         # multiplier for an all-caps lexicon word
+CAPS_URGENCY = 0.3       # urgency per shouted word
+PUNCT_URGENCY = 0.25     # urgency per run of repeated !/?
+
+# words (not part of codes like ABC-12345) and runs of two or more !/?
+_TOKEN_RE = re.compile(r"(?<![\w\-])[^\W\d_]+(?:['’][^\W\d_]+)?(?![\w\-])|[!?]{2,}")
+
+
+def score_message(text: str) -> Tuple[float, float]:
+    """(urgency 0..1, sentiment -1..1) of a raw message."""
+    valence = urgency = 0.0
+    negate = 0
+    boost = 1.0
+    for tok in _TOKEN_RE.findall(text):
+        if tok[0] in '!?':
+            urgency += PUNCT_URGENCY * (1 + (len(tok) >= 3))
+            continue
+        low = tok.lower()
+        shouted = len(tok) >= 3 and tok.isupper() and tok not in ACRONYMS
+        if shouted:
+            urgency += CAPS_URGENCY
+        if low in NEGATIONS or low.endswith(("n't", "n’t")):
+            negate = NEGATION_WINDOW
+            continue
+        factor = INTENSIFIERS.get(low)
+        if factor is not None:
+            boost *= factor
+            continue
+        entry = LEXICON.get(low)
+        if entry is not None:
+            v, u = entry
+            weight = boost * (CAPS_BOOST if shouted else 1.0)
+            if negate:
+                v, u = -v * NEGATED_DAMPING, 0.0   # "not urgent", "not happy"
+            valence += v * weight
+            urgency += u * weight
+            boost = 1.0
+        if negate:
+            negate -= 1
+    # negative feeling raises urgency; squash both into their ranges
+    urgency += max(0.0, -valence) * 0.5
+    return round(1 - math.exp(-urgency), 3), round(valence / (abs(valence) + 1), 3)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    samples = sys.argv[1:] or [
+        "I was double charged AGAIN!!!",
+        "Hi, could I please get a little more time on my trial? Thanks!",
+        "THIS IS UNACCEPTABLE. I want my money back NOW",
+        "I'm not happy with the new plan",
+        "not urgent, just wondering about your hours",
+        "my account is locked and I have a deadline today, please help asap",
+    ]
+    for s in samples:
+        u, v = score_message(s)
+        print(f"urgency {u:.2f}  sentiment {v:+.2f}  {s}")
+    n = 50000
+    start = time.perf_counter()
+    for i in range(n):
+        score_message(samples[i % len(samples)])
+    print(f"score_message(): {(time.perf_counter() - start) / n * 1e6:.1f} us per message")
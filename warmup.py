@@ -0,0 +1,132 @@
+# warmup.py
+# Cache warming before traffic is accepted: the GUI quick-suggestion texts plus the top-N most
+# frequent historical queries (by canonical key, from the decision logs) are run through the
+# pipeline and cached, within a time budget. The first user asking a common question then gets a
+# cache hit instead of the cold path (regex compilation, lazy spaCy, rule evaluation).
+# chatbot.cache_stats()['warm_coverage'] reports the share of live lookups answered from warmed entries.
+# Usage: python warmup.py --top 200 --budget 2 --logs logs
+import glob
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+QUICK_REPLIES = ["Where is my order?", "Refund status", "Reset my password", "Cancel subscription"]
+TOP_N = 200          # historical queries to warm
+BUDGET_S = 2.0       # stop warming after this long
+MAX_LOG_FILES = 48   # most recent decision-log files scanned for history
+LOG_DIR = "logs"     # same default as decision_log.LOG_DIR (not imported, to keep this module light)
+# Exercises every stage once before serving: each intent's patterns and rules, entity extraction,
+# typo correction, escalation and the no-match fallback (run, then dropped from the cache)
+WARM_QUERIES = [
+    "What's my billing cycle?", "When will my refund arrive?", "Can I get a receipt?",
+    "I want to dispute this $19.99 payment from yesterday", "I forgot my password", "How do I sign up?",
+    "My account is locked", "How do I unsubscribe?", "Can I upgrade to premium?",
+    "Can I downgrade?", "How do I enable 2FA?", "I need to export my data",
+    "Can I have multiple accounts?", "Track my order #ABC-12345", "App keeps closing",
+    "I found a bug", "Is there an iOS version?", "I need API documentation", "What are your prices?",
+    "When are you open?", "Stop sending me emails", "I have a feature request",
+    "Can I extend my free trial?", "were is my oder", "blah blah",
+]
+
+
+def top_queries(log_dir: str = LOG_DIR, n: int = TOP_N, max_files: int = MAX_LOG_FILES) -> List[str]:
+    """Most frequent historical queries, one representative input per canonical key."""
+    if n <= 0:
+        return []
+    counts: Counter = Counter()
+    example: Dict[str, str] = {}
+    paths = sorted(glob.glob(os.path.join(log_dir, "decisions-*.jsonl")), key=os.path.getmtime)
+    for path in paths[-max_files:]:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                    key, text = r['normalized'], r['input']
+                except (ValueError, KeyError, TypeError):
+                    continue   # a line cut short by a crash, or not a decision record
+                counts[key] += 1
+                example.setdefault(key, text)
+    return [example[key] for key, _ in counts.most_common(n)]
+
+
+def warm_texts(top_n: int = TOP_N, log_dir: str = LOG_DIR) -> List[str]:
+    """Quick replies first, then historical queries by frequency."""
+    return QUICK_REPLIES + top_queries(log_dir, top_n)
+
+
+def _cache_size(stats: Dict[str, Any]) -> int:
+    """Entries cached: the host-wide shared cache when one is active, else the in-process LRU."""
+    return stats['host']['used'] if stats['host'] is not None else stats['size']
+
+
+class CacheWarmer:
+    def __init__(self, texts: List[str], budget_s: float = BUDGET_S):
+        self.texts = texts
+        self.budget_s = budget_s
+        self._report: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self) -> Dict[str, Any]:
+        """Warm synchronously; returns the report."""
+        import chatbot
+        start = time.perf_counter()
+        done = primed = 0
+        for text in self.texts:
+            if time.perf_counter() - start >= self.budget_s:
+                break
+            primed += chatbot.prime(text)
+            done += 1
+        self._report = {'requested': len(self.texts), 'warmed': done, 'computed': primed,
+                        'skipped': len(self.texts) - done, 'timed_out': done < len(self.texts),
+                        'duration_s': round(time.perf_counter() - start, 3), 'budget_s': self.budget_s,
+                        'cache_size': _cache_size(chatbot.cache_stats())}
+        return self._report
+
+    def start(self) -> "CacheWarmer":
+        """Warm on a background thread."""
+        self._thread = threading.Thread(target=self.run, name="cache-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self._report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    line = (f"warmed {report['warmed']}/{report['requested']} queries in {report['duration_s']:.2f} s "
+            f"(budget {report['budget_s']:.1f} s)")
+    if report['timed_out']:
+        line += f"; {report['skipped']} skipped"
+    return line
+
+
+if __name__ == "__main__":
+    # Warm, then replay the historical traffic and report how much of it the warm cache covered
+    import argparse
+    parser = argparse.ArgumentParser(description="Cache warm-up and live coverage report")
+    parser.add_argument("--top", type=int, default=TOP_N)
+    parser.add_argument("--budget", type=float, default=BUDGET_S)
+    parser.add_argument("--logs", default=LOG_DIR)
+    parser.add_argument("--replay", type=int, default=10000, help="messages of traffic to replay")
+    args = parser.parse_args()
+
+    import random
+    import chatbot
+    from loadgen import next_message
+    history = top_queries(args.logs, args.top)
+    if not history:
+        # no decision logs yet: use the load-generator mix as stand-in history
+        rng = random.Random(0)
+        history = list(dict.fromkeys(next_message(rng) for _ in range(args.top * 5)))[:args.top]
+    report = CacheWarmer(QUICK_REPLIES + history, args.budget).start().wait()
+    print(format_report(report))
+    rng = random.Random(1)
+    for _ in range(args.replay):
+        chatbot.handle_query(next_message(rng))
+    stats = chatbot.cache_stats()
+    print(f"live traffic: hit rate {stats['hit_rate']:.1%}, answered from warmed entries {stats['warm_coverage']:.1%}")